@@ -0,0 +1,277 @@
+"""Per-tenant admission control and load shedding for evaluation routes.
+
+:class:`AdmissionMiddleware` admits requests under ``/eval`` through an
+:class:`AdmissionController` keyed on the ``x-tenant-id`` header:
+
+* a token bucket limits the rate of requests per tenant;
+* at most ``max_concurrency`` requests per tenant run at a time, including
+  the time spent streaming their response;
+* up to ``max_queue`` more wait for a slot, in arrival order, for at most
+  ``queue_timeout`` seconds.
+
+Anything beyond that is rejected straight away with ``429 Too Many
+Requests`` and a ``Retry-After`` header. A zero limit disables that check.
+Queue depth, running requests and shed requests are published as OpenTelemetry
+metrics.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional
+
+from opentelemetry import metrics
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+TENANT_HEADER = "x-tenant-id"
+ANONYMOUS_TENANT = "anonymous"
+
+SHED_REASONS = ("rate_limited", "queue_full", "queue_timeout")
+
+# Idle tenants are forgotten every this many admissions.
+_SWEEP_INTERVAL = 1024
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Waiter:
+    loop: asyncio.AbstractEventLoop
+    future: "asyncio.Future[None]"
+    granted: bool = False
+
+
+@dataclass
+class _TenantState:
+    tokens: float
+    updated: float
+    active: int = 0
+    waiters: "deque[_Waiter]" = field(default_factory=deque)
+
+
+class AdmissionController:
+    """Concurrency limits, bounded wait queues and token buckets per tenant.
+
+    State is guarded by a lock and waiters are woken on their own event
+    loop, so one controller can serve requests from several loops.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 0,
+        max_queue: int = 0,
+        queue_timeout: float = 1.0,
+        rate: float = 0.0,
+        burst: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._max_concurrency = max_concurrency
+        self._max_queue = max_queue
+        self._queue_timeout = queue_timeout
+        self._rate = rate
+        self._burst = float(burst or max(1, math.ceil(rate)))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, _TenantState] = {}
+        self._admissions = 0
+        self.shed: Dict[str, int] = dict.fromkeys(SHED_REASONS, 0)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._max_concurrency or self._rate)
+
+    @property
+    def queue_depth(self) -> int:
+        """Requests currently waiting for a slot, over every tenant."""
+
+        with self._lock:
+            return sum(len(state.waiters) for state in self._tenants.values())
+
+    @property
+    def active(self) -> int:
+        """Requests currently admitted, over every tenant."""
+
+        with self._lock:
+            return sum(state.active for state in self._tenants.values())
+
+    async def acquire(self, tenant: str) -> None:
+        """Wait for a slot for ``tenant``; raises :class:`AdmissionRejected` when shed."""
+
+        with self._lock:
+            state = self._state(tenant)
+            if self._rate:
+                self._refill(state)
+                if state.tokens < 1:
+                    raise self._reject("rate_limited", (1 - state.tokens) / self._rate)
+                state.tokens -= 1
+            if not self._max_concurrency or state.active < self._max_concurrency:
+                state.active += 1
+                return
+            if len(state.waiters) >= self._max_queue:
+                raise self._reject("queue_full", self._queue_timeout)
+            waiter = _Waiter(asyncio.get_running_loop(), asyncio.get_running_loop().create_future())
+            state.waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(waiter.future, self._queue_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if not waiter.granted:
+                    state.waiters.remove(waiter)
+                    raise self._reject("queue_timeout", self._queue_timeout) from None
+        except asyncio.CancelledError:
+            with self._lock:
+                if not waiter.granted:
+                    state.waiters.remove(waiter)
+                    raise
+            self.release(tenant)
+            raise
+
+    def release(self, tenant: str) -> None:
+        """Return the slot of an admitted request, handing it to the next waiter."""
+
+        with self._lock:
+            state = self._tenants[tenant]
+            if state.waiters:
+                waiter = state.waiters.popleft()
+                waiter.granted = True
+                waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+            else:
+                state.active -= 1
+
+    def _state(self, tenant: str) -> _TenantState:
+        state = self._tenants.get(tenant)
+        if state is None:
+            state = self._tenants[tenant] = _TenantState(tokens=self._burst, updated=self._clock())
+        self._admissions += 1
+        if self._admissions % _SWEEP_INTERVAL == 0:
+            self._sweep(keep=tenant)
+        return state
+
+    def _refill(self, state: _TenantState) -> None:
+        now = self._clock()
+        state.tokens = min(self._burst, state.tokens + (now - state.updated) * self._rate)
+        state.updated = now
+
+    def _sweep(self, keep: str) -> None:
+        # Forgetting a tenant is only invisible once its bucket has refilled.
+        for tenant, state in list(self._tenants.items()):
+            if tenant == keep or state.active or state.waiters:
+                continue
+            if self._rate:
+                self._refill(state)
+                if state.tokens < self._burst:
+                    continue
+            del self._tenants[tenant]
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionRejected:
+        self.shed[reason] += 1
+        return AdmissionRejected(reason, retry_after)
+
+
+def _wake(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting requests under ``path_prefix`` through a controller."""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, path_prefix: str = "/eval") -> None:
+        self.app = app
+        self.controller = controller
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        governed = path == self.path_prefix or path.startswith(self.path_prefix + "/")
+        if scope["type"] != "http" or not governed or not self.controller.enabled:
+            await self.app(scope, receive, send)
+            return
+        tenant = Headers(scope=scope).get(TENANT_HEADER) or ANONYMOUS_TENANT
+        try:
+            await self.controller.acquire(tenant)
+        except AdmissionRejected as exc:
+            response = JSONResponse(
+                {"detail": f"Too many requests for tenant '{tenant}' ({exc.reason})"},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(tenant)
+
+
+def register_admission_metrics(controller: AdmissionController) -> None:
+    """Publish the queue depth, running and shed requests of ``controller``."""
+
+    meter = metrics.get_meter("rules-engine.admission")
+
+    def observe_queue(options: metrics.CallbackOptions) -> Iterable[metrics.Observation]:
+        yield metrics.Observation(controller.queue_depth)
+
+    def observe_active(options: metrics.CallbackOptions) -> Iterable[metrics.Observation]:
+        yield metrics.Observation(controller.active)
+
+    def observe_shed(options: metrics.CallbackOptions) -> Iterable[metrics.Observation]:
+        for reason, count in controller.shed.items():
+            yield metrics.Observation(count, {"reason": reason})
+
+    meter.create_observable_gauge(
+        "rules_engine.admission.queue_depth",
+        callbacks=[observe_queue],
+        unit="{request}",
+        description="Evaluation requests waiting for a tenant slot",
+    )
+    meter.create_observable_gauge(
+        "rules_engine.admission.active",
+        callbacks=[observe_active],
+        unit="{request}",
+        description="Evaluation requests admitted and running",
+    )
+    meter.create_observable_counter(
+        "rules_engine.admission.shed",
+        callbacks=[observe_shed],
+        unit="{request}",
+        description="Evaluation requests rejected with 429, by reason",
+    )
+
+
+_admission_controller: Optional[AdmissionController] = None
+_admission_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Return the admission controller configured in ``Settings``, built on first use."""
+
+    global _admission_controller
+    with _admission_controller_lock:
+        if _admission_controller is None:
+            _admission_controller = AdmissionController(
+                max_concurrency=settings.admission_max_concurrency,
+                max_queue=settings.admission_max_queue,
+                queue_timeout=settings.admission_queue_timeout,
+                rate=settings.admission_rate,
+                burst=settings.admission_burst,
+            )
+            register_admission_metrics(_admission_controller)
+        return _admission_controller
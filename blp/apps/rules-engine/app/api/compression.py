@@ -0,0 +1,158 @@
+"""Negotiated response compression.
+
+:class:`CompressionMiddleware` compresses response bodies with zstd (when the
+optional ``zstandard`` package is installed) or gzip, whichever the client's
+``Accept-Encoding`` header ranks higher. Bodies smaller than the configured
+threshold are sent as is. Longer streaming responses are compressed chunk by
+chunk and flushed after every chunk, so clients can decode a stream while it
+is written.
+"""
+
+from __future__ import annotations
+
+import zlib
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None  # type: ignore[assignment]
+
+_GZIP_MAX_LEVEL = 9
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Return the content codings the middleware can produce, preferred first."""
+
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+def select_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Return the coding to compress with for an ``Accept-Encoding`` header, if any."""
+
+    if not accept_encoding:
+        return None
+    qualities: Dict[str, float] = {}
+    for coding in accept_encoding.split(","):
+        name, *parameters = (part.strip() for part in coding.split(";"))
+        quality = 1.0
+        for parameter in parameters:
+            key, _, value = parameter.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+    wildcard = qualities.get("*", 0.0)
+    best: Optional[str] = None
+    best_quality = 0.0
+    for encoding in available_encodings():
+        quality = qualities.get(encoding, wildcard)
+        # Ties keep the earlier (preferred) coding.
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _Compressor:
+    """Incremental compressor for one response body."""
+
+    def __init__(self, encoding: str, level: int) -> None:
+        if encoding == "zstd":
+            self._zstd = zstandard.ZstdCompressor(level=level).compressobj()
+            self._gzip = None
+        else:
+            self._zstd = None
+            # wbits 16 + MAX_WBITS writes a gzip container.
+            self._gzip = zlib.compressobj(min(level, _GZIP_MAX_LEVEL), zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, *, final: bool) -> bytes:
+        if self._zstd is not None:
+            mode = zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            return self._zstd.compress(data) + self._zstd.flush(mode)
+        mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._gzip.compress(data) + self._gzip.flush(mode)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses in the coding negotiated with the client."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, level: int = 6) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = select_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(send, encoding, self.minimum_size, self.level)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Holds back the response start until enough of the body decides whether to compress."""
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int, level: int) -> None:
+        self._send = send
+        self._encoding = encoding
+        self._minimum_size = minimum_size
+        self._level = level
+        self._start: Optional[Message] = None
+        self._compressor: Optional[_Compressor] = None
+        self._passthrough = False
+        self._buffer = bytearray()
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if "content-encoding" in headers:
+                self._passthrough = True
+                await self._send(message)
+            else:
+                self._start = message
+            return
+        if message["type"] != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+        if self._start is not None:
+            # Wrapping middleware re-chunks every body, so buffer until the
+            # threshold is reached or the body ends before deciding.
+            self._buffer += body
+            if more_body and len(self._buffer) < self._minimum_size:
+                return
+            start, self._start = self._start, None
+            body, self._buffer = bytes(self._buffer), bytearray()
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and (not body or len(body) < self._minimum_size):
+                self._passthrough = True
+                await self._send(start)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            self._compressor = _Compressor(self._encoding, self._level)
+            headers["Content-Encoding"] = self._encoding
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            if not more_body:
+                body = self._compressor.compress(body, final=True)
+                headers["Content-Length"] = str(len(body))
+                await self._send(start)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            await self._send(start)
+
+        assert self._compressor is not None
+        body = self._compressor.compress(body, final=not more_body)
+        await self._send({"type": "http.response.body", "body": body, "more_body": more_body})
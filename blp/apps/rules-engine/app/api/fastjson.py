@@ -0,0 +1,94 @@
+"""Fast JSON decoding and encoding for routes handling large payloads.
+
+Both directions use ``orjson`` when installed and the standard library
+otherwise.
+
+Routers built with ``route_class=FastJSONRoute`` decode request bodies with
+:func:`loads`. Request models still validate the envelope, but fields typed
+``Any`` (evaluation contexts) are passed through as decoded without being
+walked or copied.
+
+Routes returning large evaluation traces skip Pydantic: they assemble the
+payload from the evaluator's raw dictionaries and return a
+:class:`FastJSONResponse`. The route keeps its ``response_model`` so the
+OpenAPI schema is unchanged; FastAPI does not validate responses returned
+directly.
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Coroutine, Type
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore[assignment]
+
+
+def loads(body: bytes) -> Any:
+    """Decode a JSON document; errors are ``json.JSONDecodeError`` either way."""
+
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def dumps(content: Any) -> bytes:
+    """Encode ``content`` as compact UTF-8 JSON the way Pydantic would."""
+
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Integers beyond 64 bits and other values orjson rejects.
+            pass
+    return json.dumps(content, default=json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_default(value: Any) -> Any:
+    """Convert values the encoders do not know natively, as Pydantic's JSON mode does."""
+
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with :func:`dumps` instead of ``json.dumps``."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class FastJSONRequest(Request):
+    """Request whose JSON body is decoded with :func:`loads`."""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = loads(await self.body())
+        return self._json
+
+
+class FastJSONRoute(APIRoute):
+    """Route class decoding request bodies with :class:`FastJSONRequest`."""
+
+    request_class: Type[FastJSONRequest] = FastJSONRequest
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def fast_json_handler(request: Request) -> Response:
+            return await handler(self.request_class(request.scope, request.receive))
+
+        return fast_json_handler
@@ -0,0 +1,182 @@
+"""OpenTelemetry metrics of evaluations, regression runs, proofs and catalogs.
+
+:class:`EvaluationMetrics` records, per rule:
+
+* ``rules_engine.evaluation.duration``: seconds spent evaluating on ``POST /eval``;
+* ``rules_engine.evaluation.trace_steps``: trace steps produced by an evaluation;
+* ``rules_engine.evaluation.errors``: evaluations failing, by ``error.kind``;
+* ``rules_engine.regression.duration``: seconds taken by a regression run.
+
+Rules are identified by the ``rule.stable_id`` and ``rule.version``
+attributes. To keep cardinality bounded, only the first ``max_rule_series``
+distinct rule versions seen get their own series; later ones are reported
+as ``rule.stable_id="_other"``. Inline logic is reported as ``"_inline"``
+unless the request names a rule. Error kinds come from the fixed
+:data:`~app.dsl.errors.EVALUATION_ERROR_KINDS`.
+
+:func:`register_store_metrics` publishes the size of catalogs and proof
+stores, summed into a ``namespace`` of ``base`` or ``tenants`` so the number
+of tenants does not multiply series.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from opentelemetry import metrics
+
+from app.core.config import settings
+from app.dsl.errors import EVALUATION_ERROR_KINDS, EvaluationError
+from app.services.tenants import TenantNamespace, TenantRegistry, get_tenant_registry
+
+OTHER_RULES = "_other"
+INLINE_LOGIC = "_inline"
+
+# Histogram bucket boundaries, applied through views by the MeterProvider.
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REGRESSION_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TRACE_STEP_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+HISTOGRAM_BUCKETS = {
+    "rules_engine.evaluation.duration": DURATION_BUCKETS,
+    "rules_engine.evaluation.trace_steps": TRACE_STEP_BUCKETS,
+    "rules_engine.regression.duration": REGRESSION_DURATION_BUCKETS,
+}
+
+
+class _RuleSeries:
+    """Metric attributes of rule versions, admitting at most ``limit`` distinct ones."""
+
+    def __init__(self, limit: int) -> None:
+        self._limit = limit
+        self._attributes: Dict[Tuple[Optional[str], Optional[int]], Dict[str, Any]] = {}
+        self._overflow: Dict[str, Any] = {"rule.stable_id": OTHER_RULES, "rule.version": 0}
+        self._lock = threading.Lock()
+
+    def attributes(self, stable_id: Optional[str], version: Optional[int]) -> Dict[str, Any]:
+        key = (stable_id, version)
+        attributes = self._attributes.get(key)
+        if attributes is not None:
+            return attributes
+        with self._lock:
+            attributes = self._attributes.get(key)
+            if attributes is None:
+                if len(self._attributes) >= self._limit:
+                    return self._overflow
+                attributes = {"rule.stable_id": stable_id or INLINE_LOGIC, "rule.version": version or 0}
+                self._attributes[key] = attributes
+            return attributes
+
+
+class EvaluationMetrics:
+    """Instruments recording evaluations and regression runs with bounded attributes."""
+
+    def __init__(self, meter: Optional[metrics.Meter] = None, max_rule_series: int = 1000) -> None:
+        meter = meter or metrics.get_meter("rules-engine")
+        self._rules = _RuleSeries(max_rule_series)
+        self._duration = meter.create_histogram(
+            "rules_engine.evaluation.duration", unit="s", description="Time spent evaluating a rule"
+        )
+        self._trace_steps = meter.create_histogram(
+            "rules_engine.evaluation.trace_steps",
+            unit="{step}",
+            description="Trace steps recorded by an evaluation",
+        )
+        self._errors = meter.create_counter(
+            "rules_engine.evaluation.errors", unit="{error}", description="Evaluations failing, by error kind"
+        )
+        self._regression_duration = meter.create_histogram(
+            "rules_engine.regression.duration", unit="s", description="Time taken by a regression run"
+        )
+
+    def record_evaluation(
+        self, stable_id: Optional[str], version: Optional[int], seconds: float, trace: List[Dict[str, Any]]
+    ) -> None:
+        attributes = self._rules.attributes(stable_id, version)
+        self._duration.record(seconds, attributes)
+        self._trace_steps.record(trace_size(trace), attributes)
+
+    def record_error(self, stable_id: Optional[str], version: Optional[int], error: EvaluationError) -> None:
+        kind = error.kind if error.kind in EVALUATION_ERROR_KINDS else EVALUATION_ERROR_KINDS[0]
+        self._errors.add(1, {**self._rules.attributes(stable_id, version), "error.kind": kind})
+
+    def record_regression_run(self, stable_id: str, version: int, seconds: float) -> None:
+        self._regression_duration.record(seconds, self._rules.attributes(stable_id, version))
+
+
+def trace_size(trace: List[Dict[str, Any]]) -> int:
+    """Return the number of steps in a raw evaluation trace, children included."""
+
+    size = 0
+    stack = [trace]
+    while stack:
+        steps = stack.pop()
+        size += len(steps)
+        stack.extend(step["children"] for step in steps if step.get("children"))
+    return size
+
+
+def register_store_metrics(registry: TenantRegistry, meter: Optional[metrics.Meter] = None) -> None:
+    """Publish the size of the catalogs and proof stores of ``registry``."""
+
+    meter = meter or metrics.get_meter("rules-engine")
+
+    def by_namespace() -> Iterable[Tuple[str, List[TenantNamespace]]]:
+        yield "base", [registry.base]
+        yield "tenants", registry.namespaces()
+
+    def observe_rules(options: metrics.CallbackOptions) -> Iterable[metrics.Observation]:
+        for name, namespaces in by_namespace():
+            yield metrics.Observation(sum(ns.catalog.counts()[0] for ns in namespaces), {"namespace": name})
+
+    def observe_rule_versions(options: metrics.CallbackOptions) -> Iterable[metrics.Observation]:
+        for name, namespaces in by_namespace():
+            yield metrics.Observation(sum(ns.catalog.counts()[1] for ns in namespaces), {"namespace": name})
+
+    def observe_proofs(options: metrics.CallbackOptions) -> Iterable[metrics.Observation]:
+        for name, namespaces in by_namespace():
+            yield metrics.Observation(sum(ns.proof_store.size for ns in namespaces), {"namespace": name})
+
+    def observe_proof_bytes(options: metrics.CallbackOptions) -> Iterable[metrics.Observation]:
+        for name, namespaces in by_namespace():
+            yield metrics.Observation(
+                sum(ns.proof_store.estimated_bytes() for ns in namespaces), {"namespace": name}
+            )
+
+    meter.create_observable_gauge(
+        "rules_engine.catalog.rules", callbacks=[observe_rules], unit="{rule}", description="Rules in the catalog"
+    )
+    meter.create_observable_gauge(
+        "rules_engine.catalog.rule_versions",
+        callbacks=[observe_rule_versions],
+        unit="{version}",
+        description="Rule versions in the catalog",
+    )
+    meter.create_observable_gauge(
+        "rules_engine.proof_store.entries",
+        callbacks=[observe_proofs],
+        unit="{proof}",
+        description="Evaluation proofs held in memory",
+    )
+    meter.create_observable_gauge(
+        "rules_engine.proof_store.bytes",
+        callbacks=[observe_proof_bytes],
+        unit="By",
+        description="Estimated JSON size of the evaluation proofs held in memory",
+    )
+
+
+_evaluation_metrics: Optional[EvaluationMetrics] = None
+_evaluation_metrics_lock = threading.Lock()
+
+
+def get_evaluation_metrics() -> EvaluationMetrics:
+    """Return the evaluation instruments, registering the store gauges on first use."""
+
+    global _evaluation_metrics
+    with _evaluation_metrics_lock:
+        if _evaluation_metrics is None:
+            _evaluation_metrics = EvaluationMetrics(max_rule_series=settings.metrics_max_rule_series)
+            register_store_metrics(get_tenant_registry())
+        return _evaluation_metrics
@@ -0,0 +1,169 @@
+"""MessagePack content negotiation for API routes.
+
+Routers built with ``route_class=NegotiatedRoute`` and
+``default_response_class=NegotiatedResponse`` accept ``application/msgpack``
+request bodies and answer in MessagePack when the ``Accept`` header prefers
+it. Both formats run through the same request models, handlers and
+response content; only the bytes on the wire differ:
+
+* a MessagePack body is decoded where FastAPI would decode the JSON one, so
+  request validation and its errors are identical;
+* responses are rendered from the same jsonable content, with datetimes as
+  ISO 8601 strings exactly like the JSON encoding;
+* error responses follow the same negotiation through
+  :func:`negotiated_exception_handler`.
+
+MessagePack needs the optional ``msgpack`` package. Without it MessagePack
+bodies are rejected with 415 and responses stay JSON.
+"""
+
+from __future__ import annotations
+
+import json
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine, Optional
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.exception_handlers import http_exception_handler, request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+
+from app.api.fastjson import FastJSONRequest, FastJSONResponse, FastJSONRoute, json_default
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None  # type: ignore[assignment]
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_MEDIA_TYPES = frozenset({MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"})
+_JSON_MEDIA_RANGES = frozenset({"application/json", "application/*", "*/*"})
+# Scope key marking requests whose body was sent as MessagePack.
+_BODY_FORMAT = "rules_engine.body_format"
+
+_respond_msgpack: ContextVar[bool] = ContextVar("respond_msgpack", default=False)
+
+
+def is_msgpack(content_type: Optional[str]) -> bool:
+    """Return whether a ``Content-Type`` header names MessagePack."""
+
+    return bool(content_type) and content_type.split(";", 1)[0].strip().lower() in _MSGPACK_MEDIA_TYPES
+
+
+def accepts_msgpack(accept: Optional[str]) -> bool:
+    """Return whether an ``Accept`` header prefers MessagePack over JSON."""
+
+    if not accept or msgpack is None:
+        return False
+    msgpack_quality = json_quality = 0.0
+    for media_range in accept.split(","):
+        media_type, *parameters = (part.strip() for part in media_range.split(";"))
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        media_type = media_type.lower()
+        if media_type in _MSGPACK_MEDIA_TYPES:
+            msgpack_quality = max(msgpack_quality, quality)
+        elif media_type in _JSON_MEDIA_RANGES:
+            json_quality = max(json_quality, quality)
+    # An explicit MessagePack entry wins ties with wildcards.
+    return msgpack_quality > 0 and msgpack_quality >= json_quality
+
+
+def body_is_msgpack(request: Request) -> bool:
+    """Return whether the body of ``request`` was sent as MessagePack."""
+
+    return request.scope.get(_BODY_FORMAT) == "msgpack"
+
+
+def packb(content: Any) -> bytes:
+    """Encode jsonable ``content`` as MessagePack."""
+
+    return msgpack.packb(content, default=json_default)
+
+
+def packer() -> "msgpack.Packer":
+    """Return a MessagePack packer encoding values like :func:`packb`, for streamed bodies."""
+
+    return msgpack.Packer(default=json_default)
+
+
+class NegotiatedRequest(FastJSONRequest):
+    """Request decoding MessagePack bodies wherever a JSON body is expected."""
+
+    async def json(self) -> Any:
+        if not body_is_msgpack(self):
+            return await super().json()
+        if not hasattr(self, "_json"):
+            try:
+                self._json = msgpack.unpackb(await self.body(), raw=False)
+            except ValueError as exc:
+                # Reported as the same 422 json_invalid error as a malformed JSON body.
+                raise json.JSONDecodeError(str(exc), "", 0) from exc
+        return self._json
+
+
+class NegotiatedResponse(FastJSONResponse):
+    """JSON response rendered as MessagePack when the request asked for it."""
+
+    def render(self, content: Any) -> bytes:
+        if _respond_msgpack.get():
+            # Starlette derives the content-type header after rendering.
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return packb(content)
+        return super().render(content)
+
+
+class NegotiatedRoute(FastJSONRoute):
+    """Route class adding MessagePack bodies and responses to :class:`FastJSONRoute`."""
+
+    request_class = NegotiatedRequest
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            if is_msgpack(request.headers.get("content-type")):
+                if msgpack is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        detail="MessagePack bodies require the 'msgpack' package",
+                    )
+                # FastAPI only hands JSON bodies to request models, so present
+                # the body as JSON; NegotiatedRequest decodes it as MessagePack.
+                headers = [(name, value) for name, value in request.scope["headers"] if name != b"content-type"]
+                headers.append((b"content-type", b"application/json"))
+                scope = {**request.scope, "headers": headers, _BODY_FORMAT: "msgpack"}
+                request = Request(scope, request.receive)
+            token = _respond_msgpack.set(accepts_msgpack(request.headers.get("accept")))
+            try:
+                return await handler(request)
+            finally:
+                _respond_msgpack.reset(token)
+
+        return negotiated_handler
+
+
+async def negotiated_exception_handler(request: Request, exc: Exception) -> Response:
+    """Render HTTP and validation errors of negotiated routes in the requested format."""
+
+    if isinstance(exc, RequestValidationError):
+        response = await request_validation_exception_handler(request, exc)
+    else:
+        response = await http_exception_handler(request, exc)  # type: ignore[arg-type]
+    negotiated = isinstance(request.scope.get("route"), NegotiatedRoute)
+    if not negotiated or not accepts_msgpack(request.headers.get("accept")) or not response.body:
+        return response
+    headers = {
+        name: value for name, value in response.headers.items() if name not in ("content-length", "content-type")
+    }
+    return Response(
+        packb(json.loads(response.body)),
+        status_code=response.status_code,
+        headers=headers,
+        media_type=MSGPACK_MEDIA_TYPE,
+    )
@@ -2,11 +2,27 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import time
+from functools import partial
+from typing import Any, AsyncIterator, Dict, Literal, Optional, Union
 
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.api.fastjson import dumps
+from app.api.metrics import EvaluationMetrics, get_evaluation_metrics
+from app.api.negotiation import MSGPACK_MEDIA_TYPE, NegotiatedResponse, NegotiatedRoute, accepts_msgpack, packer
+from app.api.tenancy import (
+    get_tenant_catalog,
+    get_tenant_profile_store,
+    get_tenant_proof_store,
+    get_tenant_regression_service,
+)
+from app.core.config import settings
 from app.dsl.operators import EvaluationError
+from app.dsl.profiling import EvaluationProfile
 from app.models.schemas import (
-    EvaluationProof,
     EvaluationRequest,
     EvaluationResponse,
     RegressionRunRequest,
@@ -16,30 +32,56 @@ from app.services.catalog import (
     RuleCatalogService,
     RuleNotFoundError,
     RuleVersionNotFoundError,
-    get_catalog_service,
 )
-from app.services.evaluator import EvaluatorService, get_evaluator_service
-from app.services.proofs import EvaluationProofStore, get_evaluation_proof_store
-from app.services.regression import RegressionService, get_regression_service
+from app.services.evaluator import EvaluatorService, get_evaluator_service, trace_payload
+from app.services.profiling import ProfileStore
+from app.services.proofs import EvaluationProofStore
+from app.services.regression import RegressionReport, RegressionService
+
+# Contexts can be hundreds of kilobytes: decode them on the fast JSON (or
+# MessagePack) path and let the request models validate only the envelope.
+router = APIRouter(
+    prefix="/eval",
+    tags=["evaluation"],
+    route_class=NegotiatedRoute,
+    default_response_class=NegotiatedResponse,
+)
+
 
-router = APIRouter(prefix="/eval", tags=["evaluation"])
+# Handlers are async and await the evaluator's execution backend, so CPU
+# heavy evaluations never occupy the event loop or the default threadpool.
 
 
 @router.post("", response_model=EvaluationResponse)
-def evaluate_rule(
+async def evaluate_rule(
     payload: EvaluationRequest,
-    catalog: RuleCatalogService = Depends(get_catalog_service),
+    profile: bool = Query(
+        default=False,
+        description="Add the time and calls of every operator to the profile of the rule version; "
+        "inline logic is not profiled",
+    ),
+    catalog: RuleCatalogService = Depends(get_tenant_catalog),
     evaluator: EvaluatorService = Depends(get_evaluator_service),
-    proof_store: EvaluationProofStore = Depends(get_evaluation_proof_store),
-) -> EvaluationResponse:
+    proof_store: EvaluationProofStore = Depends(get_tenant_proof_store),
+    metrics: EvaluationMetrics = Depends(get_evaluation_metrics),
+    profiles: ProfileStore = Depends(get_tenant_profile_store),
+) -> NegotiatedResponse:
+    # The response is encoded from the raw trace without building TraceStep
+    # models; response_model only documents its (identical) shape.
     if payload.logic is not None:
         logic = payload.logic
         stable_id = payload.stable_id
         version = payload.version
     else:
         try:
-            rule = catalog.get_rule_version(
-                payload.stable_id, version=payload.version, prefer_latest=payload.prefer_latest
+            # Reads of shared catalogs may reload them from storage: keep them off the event loop.
+            rule = await evaluator.run(
+                partial(
+                    catalog.get_rule_version,
+                    payload.stable_id,
+                    version=payload.version,
+                    prefer_latest=payload.prefer_latest,
+                )
             )
         except RuleNotFoundError:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found") from None
@@ -49,48 +91,166 @@ def evaluate_rule(
         stable_id = rule.stable_id
         version = rule.version
 
+    # Profiles are kept per catalog rule version; inline logic is never attributed to one.
+    profiled = (profile or settings.profiling_enabled) and payload.logic is None
+    evaluation_profile = EvaluationProfile() if profiled else None
+    started = time.perf_counter()
     try:
-        result = evaluator.evaluate(logic, payload.context)
+        result = await evaluator.evaluate_raw_async(
+            logic,
+            payload.context,
+            resolver=catalog,
+            profile=evaluation_profile,
+            transient=payload.logic is not None,
+            rule=(stable_id, version) if payload.logic is None else None,
+        )
     except EvaluationError as exc:
+        metrics.record_error(stable_id, version, exc)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    metrics.record_evaluation(stable_id, version, time.perf_counter() - started, result.trace)
+    if evaluation_profile is not None:
+        profiles.record(stable_id, version, evaluation_profile)
 
-    artifact = proof_store.record(
-        stable_id=stable_id,
-        version=version,
-        logic=logic,
-        context=payload.context,
-        result=result.result,
-        trace=result.trace,
+    artifact = await evaluator.run(
+        partial(
+            proof_store.record,
+            stable_id=stable_id,
+            version=version,
+            logic=logic,
+            context=payload.context,
+            result=result.result,
+            trace=result.trace,
+            # The decoded request body belongs to this request alone.
+            copy_inputs=False,
+        )
     )
 
-    proof = EvaluationProof(
-        id=artifact.id,
-        created_at=artifact.created_at,
-        stable_id=artifact.stable_id,
-        version=artifact.version,
+    return NegotiatedResponse(
+        {
+            "stable_id": stable_id,
+            "version": version,
+            "result": result.result,
+            "trace": trace_payload(result.trace),
+            "proof": {
+                "id": artifact.id,
+                "created_at": artifact.created_at,
+                "stable_id": artifact.stable_id,
+                "version": artifact.version,
+            },
+        }
     )
 
-    return EvaluationResponse(
-        stable_id=stable_id,
-        version=version,
-        result=result.result,
-        trace=result.trace,
-        proof=proof,
-    )
+
+@router.get(
+    "/profile/{stable_id}",
+    response_class=PlainTextResponse,
+    responses={status.HTTP_404_NOT_FOUND: {"description": "No evaluation of the rule version was profiled"}},
+)
+def get_profile(
+    stable_id: str,
+    version: Optional[int] = Query(default=None, ge=1, description="Rule version; the highest profiled one by default"),
+    by: Literal["path", "operator"] = Query(
+        default="path", description="Frame per expression node ('path') or per operator ('operator')"
+    ),
+    weight: Literal["time", "calls"] = Query(
+        default="time", description="Self time in microseconds ('time') or call counts ('calls')"
+    ),
+    profiles: ProfileStore = Depends(get_tenant_profile_store),
+) -> PlainTextResponse:
+    # Collapsed stacks ("frame;frame value" lines) as read by flamegraph.pl and speedscope.
+    try:
+        return PlainTextResponse(profiles.collapsed(stable_id, version, by=by, weight=weight))
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found") from None
 
 
 @router.post("/regressions", response_model=RegressionRunResponse)
-def run_regressions(
+async def run_regressions(
     payload: RegressionRunRequest,
-    regression_service: RegressionService = Depends(get_regression_service),
-) -> RegressionRunResponse:
+    request: Request,
+    stream: bool = Query(
+        default=False,
+        description="Stream the report case by case instead of building it in memory",
+    ),
+    regression_service: RegressionService = Depends(get_tenant_regression_service),
+    metrics: EvaluationMetrics = Depends(get_evaluation_metrics),
+) -> Union[NegotiatedResponse, StreamingResponse]:
+    started = time.perf_counter()
     try:
-        return regression_service.run(payload)
+        if not stream:
+            summary = await regression_service.run_payload(payload)
+            metrics.record_regression_run(summary["stable_id"], summary["version"], time.perf_counter() - started)
+            return NegotiatedResponse(summary)
+        report = await run_in_threadpool(regression_service.stream, payload)
+        results = report.__aiter__()
+        # Evaluate the first case before responding so that errors shared by
+        # every case still produce an error status. A later failure aborts
+        # the stream, leaving a truncated (invalid) document.
+        first = await results.__anext__()
     except RuleNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found") from None
     except RuleVersionNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule version not found") from None
     except EvaluationError as exc:
+        metrics.record_error(payload.stable_id, payload.version, exc)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+    if accepts_msgpack(request.headers.get("accept")):
+        body, media_type = _msgpack_report(report, first, results), MSGPACK_MEDIA_TYPE
+    else:
+        body, media_type = _json_report(report, first, results), "application/json"
+    return StreamingResponse(_timed_report(body, report, metrics, started), media_type=media_type)
+
+
+async def _timed_report(
+    body: AsyncIterator[bytes], report: RegressionReport, metrics: EvaluationMetrics, started: float
+) -> AsyncIterator[bytes]:
+    # Streamed runs are timed until their last case is written; aborted ones are not recorded.
+    async for chunk in body:
+        yield chunk
+    metrics.record_regression_run(report.stable_id, report.version, time.perf_counter() - started)
+
+
+# Streamed reports encode the same document as RegressionRunResponse, with
+# the pass/fail counts written after the cases they count.
+
+
+async def _json_report(
+    report: RegressionReport, first: Dict[str, Any], results: AsyncIterator[Dict[str, Any]]
+) -> AsyncIterator[bytes]:
+    yield b'{"stable_id":%s,"version":%d,"total":%d,"cases":[%s' % (
+        dumps(report.stable_id),
+        report.version,
+        report.total,
+        dumps(first),
+    )
+    async for result in results:
+        yield b"," + dumps(result)
+    yield b'],"passed":%d,"failed":%d}' % (report.passed, report.failed)
+
+
+async def _msgpack_report(
+    report: RegressionReport, first: Dict[str, Any], results: AsyncIterator[Dict[str, Any]]
+) -> AsyncIterator[bytes]:
+    encoder = packer()
+    yield b"".join(
+        (
+            encoder.pack_map_header(6),
+            encoder.pack("stable_id"),
+            encoder.pack(report.stable_id),
+            encoder.pack("version"),
+            encoder.pack(report.version),
+            encoder.pack("total"),
+            encoder.pack(report.total),
+            encoder.pack("cases"),
+            encoder.pack_array_header(report.total),
+            encoder.pack(first),
+        )
+    )
+    async for result in results:
+        yield encoder.pack(result)
+    yield b"".join(
+        (encoder.pack("passed"), encoder.pack(report.passed), encoder.pack("failed"), encoder.pack(report.failed))
+    )
@@ -0,0 +1,49 @@
+"""API routes responsible for managing named reference sets."""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.api.tenancy import get_tenant_catalog
+from app.models.schemas import (
+    ReferenceSetCreateRequest,
+    ReferenceSetListResponse,
+    ReferenceSetVersionResponse,
+)
+from app.services.catalog import (
+    ReferenceSetNotFoundError,
+    RuleCatalogService,
+)
+
+router = APIRouter(prefix="/reference-sets", tags=["reference-sets"])
+
+
+@router.get("", response_model=ReferenceSetListResponse)
+def list_reference_sets(catalog: RuleCatalogService = Depends(get_tenant_catalog)) -> ReferenceSetListResponse:
+    """Return a summary of the reference sets stored in the catalog."""
+
+    return catalog.list_reference_sets()
+
+
+@router.get("/{name}", response_model=ReferenceSetVersionResponse)
+def get_reference_set(
+    name: str,
+    version: Optional[int] = Query(default=None, ge=1),
+    catalog: RuleCatalogService = Depends(get_tenant_catalog),
+) -> ReferenceSetVersionResponse:
+    try:
+        reference_set = catalog.get_reference_set(name, version=version)
+    except ReferenceSetNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reference set not found") from None
+    return ReferenceSetVersionResponse(reference_set=reference_set)
+
+
+@router.post("", response_model=ReferenceSetVersionResponse, status_code=status.HTTP_201_CREATED)
+def create_reference_set_version(
+    payload: ReferenceSetCreateRequest,
+    catalog: RuleCatalogService = Depends(get_tenant_catalog),
+) -> ReferenceSetVersionResponse:
+    reference_set = catalog.create_reference_set_version(payload)
+    return ReferenceSetVersionResponse(reference_set=reference_set)
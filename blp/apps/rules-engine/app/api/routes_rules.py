@@ -2,68 +2,162 @@
 
 from __future__ import annotations
 
-from typing import Optional
+from typing import Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from starlette.concurrency import run_in_threadpool
 
+from app.api.negotiation import NegotiatedResponse, NegotiatedRoute, body_is_msgpack
+from app.api.tenancy import get_tenant_catalog
 from app.dsl.operators import EvaluationError
 from app.models.schemas import (
+    BulkImportResponse,
     RegressionUpsertRequest,
+    RuleChangesResponse,
     RuleCreateRequest,
     RuleListResponse,
     RulePublishRequest,
+    RuleVersion,
     RuleVersionResponse,
 )
+from app.services.bulk import parse_bulk_items, parse_bulk_payloads
 from app.services.catalog import (
+    CatalogQuotaExceededError,
     RuleCatalogService,
     RuleNotFoundError,
     RuleVersionNotFoundError,
-    get_catalog_service,
+    parse_label_selector,
 )
 
-router = APIRouter(prefix="/rules", tags=["rules"])
+router = APIRouter(
+    prefix="/rules",
+    tags=["rules"],
+    route_class=NegotiatedRoute,
+    default_response_class=NegotiatedResponse,
+)
+
+CATALOG_REVISION_HEADER = "X-Catalog-Revision"
 
 
 @router.get("", response_model=RuleListResponse)
-def list_rules(catalog: RuleCatalogService = Depends(get_catalog_service)) -> RuleListResponse:
-    """Return a summary of rules currently stored in the catalog."""
+def list_rules(
+    request: Request,
+    response: Response,
+    labels: Optional[str] = Query(default=None, description="Label selector such as 'product=heloc,channel=retail'"),
+    cursor: Optional[str] = Query(default=None, description="next_cursor value returned by the previous page"),
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    catalog: RuleCatalogService = Depends(get_tenant_catalog),
+) -> Union[RuleListResponse, Response]:
+    """Return a summary of rules currently stored in the catalog.
+
+    The ETag is the catalog revision, so an unchanged catalog is answered
+    with ``304 Not Modified`` before anything is listed or serialized.
+    """
 
-    return catalog.list_rules()
+    try:
+        selector = parse_label_selector(labels)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    revision = catalog.revision
+    headers = {"ETag": f'"r{revision}"', CATALOG_REVISION_HEADER: str(revision)}
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return catalog.list_rules(labels=selector, cursor=cursor, limit=limit)
+
+
+@router.get("/changes", response_model=RuleChangesResponse)
+async def list_rule_changes(
+    response: Response,
+    since: int = Query(ge=0, description="Catalog revision returned by the previous poll"),
+    timeout: float = Query(default=0.0, ge=0, le=60, description="Seconds to wait for a change before answering"),
+    catalog: RuleCatalogService = Depends(get_tenant_catalog),
+) -> RuleChangesResponse:
+    """Long-poll for the rules changed after catalog revision ``since``."""
+
+    await catalog.wait_for_change(since, timeout)
+    # Reads of shared catalogs may reload them from storage: keep them off the event loop.
+    changes = await run_in_threadpool(catalog.changes_since, since)
+    response.headers[CATALOG_REVISION_HEADER] = str(changes.revision)
+    return changes
 
 
 @router.get("/{stable_id}", response_model=RuleVersionResponse)
 def get_rule(
+    request: Request,
+    response: Response,
     stable_id: str,
     version: Optional[int] = Query(default=None, ge=1),
     prefer_latest: bool = Query(default=False),
-    catalog: RuleCatalogService = Depends(get_catalog_service),
-) -> RuleVersionResponse:
+    catalog: RuleCatalogService = Depends(get_tenant_catalog),
+) -> Union[RuleVersionResponse, Response]:
     try:
         rule = catalog.get_rule_version(stable_id, version=version, prefer_latest=prefer_latest)
     except RuleNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found") from None
     except RuleVersionNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule version not found") from None
+    etag = _rule_etag(rule)
+    if _not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return RuleVersionResponse(rule=rule)
 
 
 @router.post("", response_model=RuleVersionResponse, status_code=status.HTTP_201_CREATED)
 def create_rule_version(
     payload: RuleCreateRequest,
-    catalog: RuleCatalogService = Depends(get_catalog_service),
+    catalog: RuleCatalogService = Depends(get_tenant_catalog),
 ) -> RuleVersionResponse:
     try:
         rule = catalog.create_rule_version(payload)
     except EvaluationError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    except CatalogQuotaExceededError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
     return RuleVersionResponse(rule=rule)
 
 
+@router.post(
+    "/bulk",
+    response_model=BulkImportResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": {"$ref": "#/components/schemas/RuleCreateRequest"}}
+                },
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def import_rules(
+    request: Request,
+    publish: bool = Query(default=False, description="Publish the last imported version of every rule"),
+    catalog: RuleCatalogService = Depends(get_tenant_catalog),
+) -> BulkImportResponse:
+    """Validate and store a JSON array or NDJSON stream of rule payloads in one write."""
+
+    try:
+        if body_is_msgpack(request):
+            items = parse_bulk_items(await request.json())
+        else:
+            items = parse_bulk_payloads(await request.body(), request.headers.get("content-type"))
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    try:
+        return await run_in_threadpool(catalog.import_rules, items, publish)
+    except CatalogQuotaExceededError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+
+
 @router.post("/{stable_id}/publish", response_model=RuleVersionResponse)
 def publish_rule_version(
     stable_id: str,
     payload: RulePublishRequest,
-    catalog: RuleCatalogService = Depends(get_catalog_service),
+    catalog: RuleCatalogService = Depends(get_tenant_catalog),
 ) -> RuleVersionResponse:
     try:
         rule = catalog.publish_rule_version(stable_id, payload.version, payload.notes)
@@ -78,7 +172,7 @@ def publish_rule_version(
 def upsert_regressions(
     stable_id: str,
     payload: RegressionUpsertRequest,
-    catalog: RuleCatalogService = Depends(get_catalog_service),
+    catalog: RuleCatalogService = Depends(get_tenant_catalog),
 ) -> RuleVersionResponse:
     try:
         rule = catalog.upsert_regression_cases(stable_id, payload)
@@ -87,3 +181,19 @@ def upsert_regressions(
     except RuleVersionNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule version not found") from None
     return RuleVersionResponse(rule=rule)
+
+
+def _rule_etag(rule: RuleVersion) -> str:
+    # Every change to a version, including status changes, bumps updated_at.
+    return f'"{rule.version}-{rule.updated_at.isoformat()}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """Return whether ``If-None-Match`` already names ``etag``."""
+
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # If-None-Match uses the weak comparison function.
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return "*" in candidates or etag in candidates
@@ -0,0 +1,36 @@
+"""Dependencies resolving the services of the tenant named by ``x-tenant-id``.
+
+Requests without the header use the shared base namespace; see
+:class:`~app.services.tenants.TenantRegistry`.
+"""
+
+from __future__ import annotations
+
+from fastapi import Request
+
+from app.api.admission import TENANT_HEADER
+from app.services.catalog import RuleCatalogService
+from app.services.profiling import ProfileStore
+from app.services.proofs import EvaluationProofStore
+from app.services.regression import RegressionService
+from app.services.tenants import TenantNamespace, get_tenant_registry
+
+
+def get_tenant_namespace(request: Request) -> TenantNamespace:
+    return get_tenant_registry().namespace(request.headers.get(TENANT_HEADER))
+
+
+def get_tenant_catalog(request: Request) -> RuleCatalogService:
+    return get_tenant_namespace(request).catalog
+
+
+def get_tenant_proof_store(request: Request) -> EvaluationProofStore:
+    return get_tenant_namespace(request).proof_store
+
+
+def get_tenant_regression_service(request: Request) -> RegressionService:
+    return get_tenant_namespace(request).regressions
+
+
+def get_tenant_profile_store(request: Request) -> ProfileStore:
+    return get_tenant_namespace(request).profiles
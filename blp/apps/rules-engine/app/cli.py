@@ -0,0 +1,112 @@
+"""Command line helpers for operating a rules engine deployment.
+
+Usage::
+
+    python -m app.cli import rules.ndjson --url http://localhost:8000 --publish
+    python -m app.cli export catalog.blcat --compiled
+
+``import`` sends a JSON array or NDJSON file of ``RuleCreateRequest`` payloads
+to ``POST /rules/bulk`` in batches, prints one line per failed item and a
+summary, and exits non-zero when any item failed.
+
+``export`` writes the catalog of the configured storage backend to a binary
+export that instances load at startup through ``catalog_import_path``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+import httpx
+
+
+def _read_payloads(path: Path) -> List[bytes]:
+    """Return every payload of ``path`` as an encoded JSON document."""
+
+    text = path.read_bytes()
+    if text.lstrip().startswith(b"["):
+        return [json.dumps(item).encode("utf-8") for item in json.loads(text)]
+    return [line for line in text.splitlines() if line.strip()]
+
+
+def _batches(payloads: Sequence[bytes], size: int) -> Iterator[Sequence[bytes]]:
+    for start in range(0, len(payloads), size):
+        yield payloads[start : start + size]
+
+
+def import_rules(
+    path: Path,
+    url: str,
+    publish: bool = False,
+    batch_size: int = 5000,
+    timeout: float = 300.0,
+    client: Optional[httpx.Client] = None,
+) -> int:
+    """Import the payloads of ``path`` and return the number of failed items."""
+
+    payloads = _read_payloads(path)
+    created = failed = 0
+    http = client or httpx.Client(base_url=url, timeout=timeout)
+    try:
+        for offset, batch in enumerate(_batches(payloads, batch_size)):
+            response = http.post(
+                "/rules/bulk",
+                params={"publish": str(publish).lower()},
+                content=b"\n".join(batch),
+                headers={"content-type": "application/x-ndjson"},
+            )
+            response.raise_for_status()
+            report = response.json()
+            created += report["created"]
+            failed += report["failed"]
+            for result in report["results"]:
+                if result["status"] == "failed":
+                    position = offset * batch_size + result["index"]
+                    print(f"item {position} ({result.get('stable_id') or '?'}): {result['error']}", file=sys.stderr)
+    finally:
+        if client is None:
+            http.close()
+    print(f"imported {created} of {len(payloads)} rules, {failed} failed")
+    return failed
+
+
+def export_catalog(path: Path, include_compiled: bool = False) -> int:
+    """Export the catalog held by the configured storage and return the version count."""
+
+    # Imported here so the import command never builds a local catalog.
+    from app.services.catalog import get_catalog_service
+
+    exported = get_catalog_service().export_snapshot(str(path), include_compiled=include_compiled)
+    print(f"exported {exported} rule versions to {path}")
+    return exported
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="Bulk import rules from a JSON array or NDJSON file")
+    importer.add_argument("path", type=Path)
+    importer.add_argument("--url", default="http://localhost:8000", help="Base URL of the rules engine")
+    importer.add_argument("--publish", action="store_true", help="Publish the last imported version of each rule")
+    importer.add_argument("--batch-size", type=int, default=5000, help="Payloads sent per request")
+    importer.add_argument("--timeout", type=float, default=300.0, help="Request timeout in seconds")
+
+    exporter = commands.add_parser("export", help="Write the configured catalog to a binary export")
+    exporter.add_argument("path", type=Path)
+    exporter.add_argument("--compiled", action="store_true", help="Include compiled decision tables")
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        export_catalog(args.path, args.compiled)
+        return 0
+    failed = import_rules(args.path, args.url, args.publish, args.batch_size, args.timeout)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
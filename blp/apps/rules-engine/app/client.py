@@ -0,0 +1,208 @@
+"""In-process client for Python callers co-located with the rules engine.
+
+Usage::
+
+    from app.client import RulesEngineClient
+
+    with RulesEngineClient.from_directory("rules/") as engine:
+        response = engine.evaluate("loan-decision", {"applicant": {"credit_score": 720}})
+
+:class:`RulesEngineClient` wraps its own :class:`RuleCatalogService`,
+:class:`EvaluatorService` and :class:`EvaluationProofStore` and applies the
+same version selection, proofs and validation as the HTTP routes, without
+FastAPI, HTTP or JSON encoding. Errors are raised as the exceptions the
+routes translate into status codes: ``RuleNotFoundError`` and
+``RuleVersionNotFoundError`` (404), ``EvaluationError`` and ``ValueError``
+(400) and ``pydantic.ValidationError`` for invalid requests (422).
+
+Importing this module has no side effects: it neither creates the FastAPI
+app nor configures OpenTelemetry, and the client never touches the service
+singletons configured by ``Settings`` unless they are passed in.
+"""
+
+from __future__ import annotations
+
+from copy import deepcopy
+from typing import Any, Dict, List, Optional
+
+from app.models.schemas import (
+    EvaluationRequest,
+    EvaluationResponse,
+    RegressionCase,
+    RegressionRunRequest,
+    RegressionRunResponse,
+    RuleCreateRequest,
+    RuleListResponse,
+    RuleVersion,
+)
+from app.services.catalog import RuleCatalogService, parse_label_selector
+from app.services.directory_source import DirectoryRuleSource, DirectoryScanReport
+from app.services.evaluator import EvaluatorService, trace_payload
+from app.services.proofs import EvaluationProofArtifact, EvaluationProofStore
+from app.services.regression import RegressionService
+
+__all__ = ["RulesEngineClient"]
+
+
+class RulesEngineClient:
+    """Evaluate rules in process with the semantics of the HTTP API.
+
+    Without arguments the client starts with an empty in-memory catalog and
+    proof store. The in-memory proof store keeps every proof, so long running
+    jobs should pass a store backed by storage, which only caches recent ones.
+    """
+
+    def __init__(
+        self,
+        catalog: RuleCatalogService | None = None,
+        evaluator: EvaluatorService | None = None,
+        proof_store: EvaluationProofStore | None = None,
+    ) -> None:
+        self.catalog = catalog or RuleCatalogService()
+        self.evaluator = evaluator or EvaluatorService()
+        self.proof_store = proof_store or EvaluationProofStore()
+        self._regressions = RegressionService(self.catalog, self.evaluator, self.proof_store)
+        self._source: Optional[DirectoryRuleSource] = None
+        self.directory_report: Optional[DirectoryScanReport] = None
+
+    @classmethod
+    def from_snapshot(cls, path: str, **kwargs: Any) -> "RulesEngineClient":
+        """Return a client whose catalog is loaded from a binary catalog export."""
+
+        client = cls(**kwargs)
+        client.catalog.import_snapshot(path)
+        return client
+
+    @classmethod
+    def from_directory(
+        cls, root: str, *, watch: bool = False, poll_interval: float = 2.0, **kwargs: Any
+    ) -> "RulesEngineClient":
+        """Return a client publishing every rule file under ``root``.
+
+        Files that fail validation are skipped and reported in
+        :attr:`directory_report`. With ``watch`` the directory keeps being
+        polled for changes until :meth:`close`.
+        """
+
+        client = cls(**kwargs)
+        client._source = DirectoryRuleSource(root, catalog=client.catalog, poll_interval=poll_interval)
+        client.directory_report = client._source.start() if watch else client._source.scan()
+        return client
+
+    def close(self) -> None:
+        """Stop watching the rules directory, if any."""
+
+        if self._source is not None:
+            self._source.stop()
+
+    def __enter__(self) -> "RulesEngineClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Catalog
+    # ------------------------------------------------------------------
+    def create_rule(self, payload: RuleCreateRequest | Dict[str, Any]) -> RuleVersion:
+        """Create a new draft version of a rule, as ``POST /rules``."""
+
+        return self.catalog.create_rule_version(RuleCreateRequest.model_validate(payload))
+
+    def publish_rule(self, stable_id: str, version: int, notes: Optional[str] = None) -> RuleVersion:
+        """Publish a rule version, as ``POST /rules/{stable_id}/publish``."""
+
+        return self.catalog.publish_rule_version(stable_id, version, notes)
+
+    def get_rule(self, stable_id: str, version: Optional[int] = None, prefer_latest: bool = False) -> RuleVersion:
+        """Return the rule version an evaluation with the same arguments would use."""
+
+        return self.catalog.get_rule_version(stable_id, version=version, prefer_latest=prefer_latest)
+
+    def list_rules(
+        self, labels: Optional[str] = None, cursor: Optional[str] = None, limit: Optional[int] = None
+    ) -> RuleListResponse:
+        """List rule summaries, as ``GET /rules``."""
+
+        return self.catalog.list_rules(labels=parse_label_selector(labels), cursor=cursor, limit=limit)
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+    def evaluate(
+        self,
+        stable_id: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+        *,
+        version: Optional[int] = None,
+        logic: Optional[Dict[str, Any]] = None,
+        prefer_latest: bool = False,
+    ) -> EvaluationResponse:
+        """Evaluate a catalog rule or inline ``logic`` and record a proof, as ``POST /eval``.
+
+        The proof holds a copy of ``context``, so callers may reuse it.
+        """
+
+        request = EvaluationRequest(
+            stable_id=stable_id,
+            version=version,
+            logic=logic,
+            context=context if context is not None else {},
+            prefer_latest=prefer_latest,
+        )
+        if request.logic is not None:
+            logic = request.logic
+            stable_id = request.stable_id
+            version = request.version
+        else:
+            rule = self.get_rule(request.stable_id, version=request.version, prefer_latest=request.prefer_latest)
+            logic = rule.definition
+            stable_id = rule.stable_id
+            version = rule.version
+
+        result = self.evaluator.evaluate_raw(
+            logic, request.context, resolver=self.catalog, transient=request.logic is not None
+        )
+        artifact = self.proof_store.record(
+            stable_id=stable_id,
+            version=version,
+            logic=logic,
+            context=request.context,
+            result=result.result,
+            trace=result.trace,
+        )
+        return EvaluationResponse.model_validate(
+            {
+                "stable_id": stable_id,
+                "version": version,
+                "result": result.result,
+                "trace": trace_payload(result.trace),
+                "proof": {
+                    "id": artifact.id,
+                    "created_at": artifact.created_at,
+                    "stable_id": artifact.stable_id,
+                    "version": artifact.version,
+                },
+            }
+        )
+
+    def run_regressions(
+        self,
+        stable_id: str,
+        cases: Optional[List[RegressionCase | Dict[str, Any]]] = None,
+        *,
+        version: Optional[int] = None,
+        prefer_latest: bool = False,
+    ) -> RegressionRunResponse:
+        """Run ad-hoc or stored regression cases, as ``POST /eval/regressions``."""
+
+        # The runner records proofs without copying request cases.
+        request = RegressionRunRequest(
+            stable_id=stable_id, version=version, cases=deepcopy(cases) or [], prefer_latest=prefer_latest
+        )
+        return self._regressions.run(request)
+
+    def get_proof(self, artifact_id: str) -> EvaluationProofArtifact:
+        """Return a recorded evaluation proof; raises ``KeyError`` when unknown."""
+
+        return self.proof_store.get(artifact_id)
@@ -1,6 +1,7 @@
 """Configuration settings for the rules engine service."""
 
 from functools import lru_cache
+from typing import Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -12,6 +13,87 @@ class Settings(BaseSettings):
     app_name: str = Field(default="BLP Rules Engine", description="Human readable application name")
     version: str = Field(default="0.1.0", description="Application version exposed via OpenAPI")
     debug: bool = Field(default=False, description="Toggle FastAPI debug mode")
+    storage_backend: str = Field(
+        default="memory",
+        description="Where catalog entries and proofs are kept: 'memory' or 'sqlite'",
+    )
+    sqlite_path: str = Field(default="rules-engine.db", description="Database file used by the sqlite backend")
+    proof_batch_size: int = Field(default=100, ge=1, description="Proofs buffered before a batched write")
+    proof_flush_interval: float = Field(
+        default=1.0, ge=0, description="Maximum seconds a buffered proof waits before being written"
+    )
+    catalog_snapshot_dir: Optional[str] = Field(
+        default=None,
+        description="Directory of memory-mapped catalog snapshots shared by every worker on the host",
+    )
+    redis_url: Optional[str] = Field(
+        default=None,
+        description="Redis holding the catalog shared by every instance; 'memory://' uses an in-process fake",
+    )
+    redis_prefix: str = Field(default="rules-engine", description="Prefix of every Redis key used by the catalog")
+    bulk_validation_workers: int = Field(
+        default=0, ge=0, description="Processes validating bulk imports in parallel; 0 uses every CPU"
+    )
+    rules_directory: Optional[str] = Field(
+        default=None, description="Directory tree of rule JSON files loaded at startup and hot reloaded"
+    )
+    rules_directory_poll_interval: float = Field(
+        default=2.0, gt=0, description="Seconds between scans of the rules directory"
+    )
+    proof_cache_size: int = Field(default=1024, ge=0, description="Recent proofs kept in memory by durable stores")
+    catalog_import_path: Optional[str] = Field(
+        default=None, description="Binary catalog export imported at startup to warm start the catalog"
+    )
+    evaluation_executor: str = Field(
+        default="thread",
+        description="Where async routes run evaluations: 'thread', 'process' or 'inline'",
+    )
+    evaluation_workers: int = Field(
+        default=0, ge=0, description="Threads or processes evaluating concurrently; 0 uses every CPU"
+    )
+    admission_max_concurrency: int = Field(
+        default=0, ge=0, description="Evaluation requests a tenant may run at once; 0 disables the limit"
+    )
+    admission_max_queue: int = Field(
+        default=0, ge=0, description="Evaluation requests a tenant may have waiting for a slot"
+    )
+    admission_queue_timeout: float = Field(
+        default=1.0, ge=0, description="Seconds a queued evaluation request waits before being shed"
+    )
+    admission_rate: float = Field(
+        default=0.0, ge=0, description="Evaluation requests per second allowed per tenant; 0 disables the limit"
+    )
+    admission_burst: int = Field(
+        default=0, ge=0, description="Token bucket size of the per tenant rate limit; 0 allows one second of rate"
+    )
+    tenant_max_namespaces: int = Field(
+        default=1024, ge=0, description="Tenant namespaces kept loaded, least recently used first out; 0 keeps all"
+    )
+    tenant_max_rule_versions: int = Field(
+        default=0, ge=0, description="Rule versions each tenant namespace may hold; 0 disables the limit"
+    )
+    tenant_max_proofs: int = Field(
+        default=10000, ge=0, description="Recent proofs kept per tenant namespace; 0 keeps every proof"
+    )
+    metrics_export_interval: float = Field(
+        default=60.0, gt=0, description="Seconds between exports of OpenTelemetry metrics"
+    )
+    metrics_max_rule_series: int = Field(
+        default=1000, ge=1, description="Distinct rule versions with their own metric series; others share one"
+    )
+    profiling_enabled: bool = Field(
+        default=False, description="Profile every evaluation of a catalog rule, not only those requesting it"
+    )
+    profile_max_rules: int = Field(default=256, ge=1, description="Rule versions whose evaluation profiles are kept")
+    profile_max_stacks: int = Field(
+        default=1024, ge=1, description="Distinct expression stacks kept in the profile of one rule version"
+    )
+    response_compression_min_size: int = Field(
+        default=1024, ge=0, description="Smallest response body in bytes compressed for clients accepting it"
+    )
+    response_compression_level: int = Field(
+        default=6, ge=1, le=22, description="zstd compression level of responses; gzip caps it at 9"
+    )
 
 
 @lru_cache()
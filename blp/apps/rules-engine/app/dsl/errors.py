@@ -0,0 +1,29 @@
+"""Exceptions raised by the rules DSL."""
+
+from typing import Any, Tuple
+
+# Bounded vocabulary of EvaluationError.kind, suitable as a metric attribute.
+EVALUATION_ERROR_KINDS = (
+    "invalid_expression",
+    "type_mismatch",
+    "division_by_zero",
+    "undefined_binding",
+    "unknown_reference",
+    "cyclic_reference",
+    "hit_policy_violation",
+)
+
+
+class EvaluationError(Exception):
+    """Raised when an invalid expression is encountered during evaluation.
+
+    ``kind`` is one of :data:`EVALUATION_ERROR_KINDS`; the message is free text.
+    """
+
+    def __init__(self, message: str = "", kind: str = "invalid_expression") -> None:
+        super().__init__(message)
+        self.kind = kind
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Keep the kind when errors cross process pool boundaries.
+        return (type(self), (str(self), self.kind))
@@ -0,0 +1,173 @@
+"""Structural hashing and hash-consing of JSON-Logic definitions."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.dsl.errors import EvaluationError
+
+
+def structural_hash(expression: Any) -> str:
+    """Return the canonical structural hash of a JSON compatible expression.
+
+    The hash only depends on the structure of the expression: object keys are
+    ordered canonically so ``{"a": 1, "b": 2}`` and ``{"b": 2, "a": 1}`` hash
+    identically, while ``1``, ``1.0`` and ``True`` remain distinct values.
+    """
+
+    _, digest, _ = _canonicalise(expression, None, None)
+    return digest
+
+
+class DefinitionInterner:
+    """Hash-cons rule definitions so identical subtrees share one object.
+
+    Every subtree is hashed exactly once, bottom-up. When a subtree with the
+    same structural hash and the same key order has been seen before the
+    previously stored object is reused instead of the freshly parsed one, so
+    interning never changes the key order an author wrote. Interned objects
+    are shared between rule versions and must therefore be treated as
+    immutable.
+
+    The table keeps the ``max_nodes`` most recently used subtrees; evicting
+    one only means the next identical subtree is stored again instead of
+    being shared.
+    """
+
+    def __init__(self, max_nodes: int = 65536) -> None:
+        self._nodes: "OrderedDict[str, Any]" = OrderedDict()
+        self._max_nodes = max_nodes
+
+    def intern(
+        self,
+        expression: Any,
+        before_commit: Optional[Callable[[Any, str], None]] = None,
+    ) -> Tuple[Any, str]:
+        """Return the canonical shared instance of ``expression`` and its hash.
+
+        ``before_commit`` receives the interned expression and its hash
+        before any new subtree is added to the table; if it raises, the table
+        is unchanged. Callers store the expression from it, so only subtrees
+        of definitions that were actually stored are ever interned.
+        """
+
+        def commit(interned: List[Tuple[Any, str]]) -> None:
+            if before_commit is not None:
+                before_commit(*interned[0])
+
+        return self.intern_many([expression], commit)[0]
+
+    def intern_many(
+        self,
+        expressions: Sequence[Any],
+        before_commit: Optional[Callable[[List[Tuple[Any, str]]], Optional[Iterable[Any]]]] = None,
+    ) -> List[Tuple[Any, str]]:
+        """Intern several expressions at once, sharing subtrees between them.
+
+        ``before_commit`` receives every interned expression with its hash
+        and may return the subset of expressions it stored; only their new
+        subtrees are then added to the table. If it raises, the table is
+        unchanged.
+        """
+
+        pending: Dict[str, Any] = {}
+        interned = [_canonicalise(expression, self._nodes, pending)[:2] for expression in expressions]
+        kept = before_commit(interned) if before_commit is not None else None
+        if kept is not None:
+            pending = _reachable(kept, pending)
+        self._nodes.update(pending)
+        while len(self._nodes) > self._max_nodes:
+            self._nodes.popitem(last=False)
+        return interned
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def clear(self) -> None:
+        """Drop all interned subtrees."""
+
+        self._nodes.clear()
+
+
+def _canonicalise(
+    expression: Any,
+    table: "OrderedDict[str, Any] | None",
+    pending: Dict[str, Any] | None,
+) -> Tuple[Any, str, str]:
+    """Return the interned node, its structural hash and its table key.
+
+    The key equals the structural hash unless the subtree holds an object
+    whose keys are not in canonical order; it then also encodes the order.
+    """
+
+    if isinstance(expression, dict):
+        parts = []
+        ordered = True
+        children: Dict[str, Tuple[Any, str]] = {}
+        for key in sorted(expression):
+            if not isinstance(key, str):
+                raise EvaluationError(f"Object keys must be strings, got {type(key)!r}")
+            child, child_hash, child_key = _canonicalise(expression[key], table, pending)
+            children[key] = (child, child_key)
+            ordered = ordered and child_key == child_hash
+            parts.append(f"{json.dumps(key)}:{child_hash}")
+        digest = _digest("{" + ",".join(parts) + "}")
+        if table is None:
+            return expression, digest, digest
+        node_key = digest
+        if not ordered or list(children) != list(expression):
+            # Prefixed so an order key never collides with a structural hash.
+            ordered_parts = (f"{json.dumps(key)}:{children[key][1]}" for key in expression)
+            node_key = "~" + _digest("{" + ",".join(ordered_parts) + "}")
+        node: Any = expression
+        if any(children[key][0] is not expression[key] for key in expression):
+            node = {key: children[key][0] for key in expression}
+    elif isinstance(expression, list):
+        items = [_canonicalise(item, table, pending) for item in expression]
+        digest = _digest("[" + ",".join(item_hash for _, item_hash, _ in items) + "]")
+        if table is None:
+            return expression, digest, digest
+        node_key = digest
+        if any(item_key != item_hash for _, item_hash, item_key in items):
+            node_key = "~" + _digest("[" + ",".join(item_key for _, _, item_key in items) + "]")
+        node = expression
+        if any(item is not original for (item, _, _), original in zip(items, expression)):
+            node = [item for item, _, _ in items]
+    elif expression is None or isinstance(expression, (str, int, float, bool)):
+        # Scalars are immutable; only their hash is needed to build parents.
+        digest = _digest(json.dumps(expression))
+        return expression, digest, digest
+    else:
+        raise EvaluationError(f"Unsupported value type for hashing: {type(expression)!r}")
+
+    # The first instance of a subtree becomes the canonical one; callers must
+    # not mutate an expression after handing it to the interner.
+    if node_key in table:
+        table.move_to_end(node_key)
+        return table[node_key], digest, node_key
+    assert pending is not None
+    return pending.setdefault(node_key, node), digest, node_key
+
+
+def _reachable(roots: Iterable[Any], pending: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the ``pending`` subtrees reachable from ``roots``."""
+
+    keys = {id(node): key for key, node in pending.items()}
+    kept: Dict[str, Any] = {}
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        key = keys.get(id(node))
+        if key is None or key in kept:
+            # Subtrees already in the table only contain table nodes.
+            continue
+        kept[key] = node
+        stack.extend(node.values() if isinstance(node, dict) else node)
+    return kept
+
+
+def _digest(canonical: str) -> str:
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
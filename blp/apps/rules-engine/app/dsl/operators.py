@@ -2,33 +2,159 @@
 
 from __future__ import annotations
 
-from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from time import perf_counter_ns
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Protocol, Set, Tuple
 
+from app.dsl.errors import EvaluationError
+from app.dsl.profiling import EvaluationProfile, Stack
+from app.dsl.tables import DecisionTable
 
-class EvaluationError(Exception):
-    """Raised when an invalid expression is encountered during evaluation."""
+__all__ = ["DefinitionResolver", "EvaluationError", "ExtendedJsonLogic", "get_json_logic"]
+
+# Upper bound on the number of compiled operator artefacts kept per evaluator.
+_COMPILED_CACHE_SIZE = 4096
+# Arrays at least this long are converted to a set for 'in': literal arrays
+# once per definition, arrays from the context when scanned a second time.
+_SET_CONVERSION_THRESHOLD = 32
 
 
 ArgEvaluator = Callable[[Any, str, Optional[Dict[str, Any]]], Any]
 
 
+class DefinitionResolver(Protocol):
+    """Lookup interface for operators that reference catalog managed data.
+
+    ``revision`` must change whenever resolvable data changes so resolutions
+    can be cached between evaluations.
+    """
+
+    @property
+    def revision(self) -> int:
+        """Monotonic counter bumped on every catalog write."""
+
+    def resolve_rule(self, stable_id: str, version: Optional[int] = None) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Return ``(version, definition)`` for a catalog rule or ``None``."""
+
+    def resolve_reference_set(
+        self, name: str, version: Optional[int] = None
+    ) -> Optional[Tuple[int, FrozenSet[Any]]]:
+        """Return ``(version, members)`` for a named reference set or ``None``."""
+
+
+@dataclass
+class _EvaluationState:
+    """Scratch state shared by all operators during a single evaluation."""
+
+    resolver: Optional[DefinitionResolver] = None
+    lookup_sets: Dict[int, Tuple[Any, Any]] = field(default_factory=dict)
+    bindings: List[Dict[str, Any]] = field(default_factory=list)
+    rule_memo: Dict[Tuple[str, int, int], Tuple[Any, Any]] = field(default_factory=dict)
+    rule_stack: List[str] = field(default_factory=list)
+    # Set while evaluating request scoped logic, whose artefacts are not cached.
+    transient: bool = False
+    compiled: Dict[Tuple[str, int], Tuple[Any, Any]] = field(default_factory=dict)
+
+
+_state: ContextVar[Optional[_EvaluationState]] = ContextVar("json_logic_state", default=None)
+
+_UNSET = object()
+
+# Accepted argument counts for the aggregation operators.
+_AGGREGATION_ARITY: Dict[str, Tuple[int, int]] = {
+    "bl_sum": (1, 2),
+    "bl_count": (1, 2),
+    "bl_filter": (2, 2),
+    "bl_map": (2, 2),
+    "bl_reduce": (3, 3),
+}
+
+
+class _ItemScope:
+    """Lightweight scope exposing the current element of an aggregation.
+
+    ``item``, ``index`` and (for reductions) ``accumulator`` are resolved
+    locally while every other key falls through to the enclosing data, so
+    iterating never copies the evaluation context.
+    """
+
+    __slots__ = ("parent", "item", "index", "accumulator")
+
+    def __init__(self, parent: Any, item: Any, index: int, accumulator: Any = _UNSET) -> None:
+        self.parent = parent
+        self.item = item
+        self.index = index
+        self.accumulator = accumulator
+
+    def lookup(self, key: str) -> tuple[bool, Any]:
+        if key == "item":
+            return True, self.item
+        if key == "index":
+            return True, self.index
+        if key == "accumulator" and self.accumulator is not _UNSET:
+            return True, self.accumulator
+        parent = self.parent
+        if isinstance(parent, _ItemScope):
+            return parent.lookup(key)
+        if isinstance(parent, dict) and key in parent:
+            return True, parent[key]
+        return False, None
+
+    def materialize(self) -> Dict[str, Any]:
+        parent = self.parent
+        merged = parent.materialize() if isinstance(parent, _ItemScope) else dict(parent or {})
+        merged["item"] = self.item
+        merged["index"] = self.index
+        if self.accumulator is not _UNSET:
+            merged["accumulator"] = self.accumulator
+        return merged
+
+
 class ExtendedJsonLogic:
     """Evaluate JSON-Logic expressions with additional domain specific operators."""
 
     def __init__(self) -> None:
         self._operators: Dict[str, Callable[[Any, Dict[str, Any], ArgEvaluator], tuple[Any, Any]]]
         self._operators = {}
+        self._compiled: "OrderedDict[Tuple[Any, ...], Tuple[Any, Any]]" = OrderedDict()
+        self._compiled_lock = threading.Lock()
         self._register_core_operators()
         self._register_custom_operators()
 
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
-    def evaluate(self, expression: Any, data: Dict[str, Any]) -> tuple[Any, List[Dict[str, Any]]]:
-        """Evaluate an expression returning both the result and the explainability trace."""
+    def evaluate(
+        self,
+        expression: Any,
+        data: Dict[str, Any],
+        resolver: Optional[DefinitionResolver] = None,
+        profile: Optional[EvaluationProfile] = None,
+        transient: bool = False,
+    ) -> tuple[Any, List[Dict[str, Any]]]:
+        """Evaluate an expression returning both the result and the explainability trace.
+
+        ``resolver`` provides access to catalog managed data such as named
+        reference sets; expressions that reference such data fail without one.
+        With a ``profile``, the time and calls of every node are added to it.
+        ``transient`` marks ``expression`` as request scoped, such as inline
+        logic: its compiled artefacts are kept for this evaluation only, so
+        they neither evict cached catalog artefacts nor keep the request alive.
+        Catalog rules it references are cached as usual.
+        """
 
         trace: List[Dict[str, Any]] = []
-        result = self._eval(expression, data, trace, path="$")
+        token = _state.set(_EvaluationState(resolver=resolver, transient=transient))
+        try:
+            if profile is None:
+                result = self._eval(expression, data, trace, path="$")
+            else:
+                result = self._eval_profiled(expression, data, trace, "$", (), [0], profile.samples)
+        finally:
+            _state.reset(token)
         return result, trace
 
     def supported_operators(self) -> Set[str]:
@@ -36,6 +162,54 @@ class ExtendedJsonLogic:
 
         return set(self._operators.keys())
 
+    def compile_table(self, args: Any) -> DecisionTable:
+        """Return the compiled decision table for a ``bl_table`` argument object.
+
+        Tables are compiled once per definition object and cached, so the
+        validator warms the cache and evaluations only perform index lookups.
+        Tables of transient expressions are only kept for their evaluation.
+        """
+
+        return self._compiled_artifact("bl_table", args, DecisionTable.compile)
+
+    def literal_members(self, haystack: Any) -> Optional[FrozenSet[Any]]:
+        """Return the members of a large literal ``in`` array, or ``None`` for any other haystack.
+
+        Like decision tables, literal arrays are converted once per definition
+        object and cached, so the validator warms the cache and evaluations
+        only hash the needle.
+        """
+
+        if not isinstance(haystack, list) or len(haystack) < _SET_CONVERSION_THRESHOLD:
+            return None
+        return self._compiled_artifact("in", haystack, _literal_set)
+
+    def compiled_artifacts(self, expression: Any) -> List[Tuple[str, Any, Any]]:
+        """Return ``(operator, args, artifact)`` for every compiled node of ``expression``.
+
+        Missing artefacts are compiled and cached first, so the result covers
+        the whole expression. Catalog exports use it to ship compiled forms.
+        """
+
+        artifacts: List[Tuple[str, Any, Any]] = []
+        stack = [expression]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                if len(node) == 1:
+                    operator, args = next(iter(node.items()))
+                    if operator == "bl_table":
+                        artifacts.append((operator, args, self.compile_table(args)))
+                stack.extend(node.values())
+            elif isinstance(node, list):
+                stack.extend(node)
+        return artifacts
+
+    def preload_artifact(self, operator: str, args: Any, artifact: Any) -> None:
+        """Cache an artefact compiled elsewhere for the ``args`` object it was built from."""
+
+        self._remember((operator, id(args)), args, artifact)
+
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
@@ -73,6 +247,128 @@ class ExtendedJsonLogic:
 
         return expression
 
+    def _eval_profiled(
+        self,
+        expression: Any,
+        data: Dict[str, Any],
+        trace: List[Dict[str, Any]],
+        path: str,
+        stack: Stack,
+        parent_ns: List[int],
+        samples: Dict[Stack, List[int]],
+    ) -> Any:
+        """Evaluate like :meth:`_eval` while timing every node.
+
+        Kept separate from :meth:`_eval` so evaluations that are not profiled
+        pay nothing for it. ``parent_ns`` accumulates the time of the
+        enclosing node's children, from which its self time is derived.
+        """
+
+        if isinstance(expression, dict):
+            if len(expression) != 1:
+                raise EvaluationError("Each JSON-Logic node must contain exactly one operator")
+
+            operator, raw_args = next(iter(expression.items()))
+            fn = self._operators.get(operator)
+            if fn is None:
+                raise EvaluationError(f"Unsupported operator '{operator}'")
+
+            children: List[Dict[str, Any]] = []
+            frames = (*stack, f"{operator}@{path}")
+            child_ns = [0]
+
+            def eval_child(child_expr: Any, child_path: str, scope: Optional[Dict[str, Any]] = None) -> Any:
+                return self._eval_profiled(
+                    child_expr,
+                    scope if scope is not None else data,
+                    children,
+                    f"{path}.{child_path}" if path else child_path,
+                    frames,
+                    child_ns,
+                    samples,
+                )
+
+            started = perf_counter_ns()
+            result, argument_debug = fn(raw_args, data, eval_child)
+            elapsed = perf_counter_ns() - started
+            parent_ns[0] += elapsed
+            sample = samples.get(frames)
+            if sample is None:
+                sample = samples[frames] = [0, 0, 0]
+            sample[0] += 1
+            sample[1] += elapsed - child_ns[0]
+            sample[2] += elapsed
+
+            step: Dict[str, Any] = {"path": path, "operator": operator, "result": result}
+            if argument_debug is not None:
+                step["arguments"] = argument_debug
+            if children:
+                step["children"] = children
+            trace.append(step)
+            return result
+
+        if isinstance(expression, list):
+            return [
+                self._eval_profiled(item, data, trace, f"{path}[{idx}]", stack, parent_ns, samples)
+                for idx, item in enumerate(expression)
+            ]
+
+        return expression
+
+    def _eval_untraced(self, expression: Any, data: Any) -> Any:
+        """Evaluate without building trace steps; used for per-element work."""
+
+        if isinstance(expression, dict):
+            if len(expression) != 1:
+                raise EvaluationError("Each JSON-Logic node must contain exactly one operator")
+            operator, raw_args = next(iter(expression.items()))
+            if operator == "var" and isinstance(raw_args, str):
+                return self._resolve_var(data, raw_args)[1]
+            fn = self._operators.get(operator)
+            if fn is None:
+                raise EvaluationError(f"Unsupported operator '{operator}'")
+
+            def eval_child(child_expr: Any, _: str, scope: Optional[Dict[str, Any]] = None) -> Any:
+                return self._eval_untraced(child_expr, scope if scope is not None else data)
+
+            return fn(raw_args, data, eval_child)[0]
+
+        if isinstance(expression, list):
+            return [self._eval_untraced(item, data) for item in expression]
+
+        return expression
+
+    def _compiled_artifact(self, operator: str, args: Any, factory: Callable[[Any], Any]) -> Any:
+        # Entries hold a reference to ``args`` so its id cannot be recycled
+        # while the compiled artefact is cached.
+        key = (operator, id(args))
+        state = _state.get()
+        if state is not None and state.transient:
+            entry = state.compiled.get(key)
+            if entry is None or entry[0] is not args:
+                entry = state.compiled[key] = (args, factory(args))
+            return entry[1]
+        entry = self._compiled.get(key)
+        if entry is not None and entry[0] is args:
+            self._touch(key)
+            return entry[1]
+        artifact = factory(args)
+        self._remember(key, args, artifact)
+        return artifact
+
+    def _remember(self, key: Tuple[Any, ...], anchor: Any, value: Any) -> None:
+        with self._compiled_lock:
+            self._compiled[key] = (anchor, value)
+            while len(self._compiled) > _COMPILED_CACHE_SIZE:
+                self._compiled.popitem(last=False)
+
+    def _touch(self, key: Tuple[Any, ...]) -> None:
+        """Mark a cache entry as recently used so the least recently used one is evicted first."""
+
+        with self._compiled_lock:
+            if key in self._compiled:
+                self._compiled.move_to_end(key)
+
     def _register(self, name: str, func: Callable[[Any, Dict[str, Any], ArgEvaluator], tuple[Any, Any]]) -> None:
         self._operators[name] = func
 
@@ -82,6 +378,8 @@ class ExtendedJsonLogic:
         self._register("or", self._op_or)
         self._register("!", self._op_not)
         self._register("if", self._op_if)
+        self._register("let", self._op_let)
+        self._register("let_var", self._op_let_var)
         self._register("in", self._op_in)
         self._register("missing", self._op_missing)
         self._register("missing_some", self._op_missing_some)
@@ -102,6 +400,14 @@ class ExtendedJsonLogic:
         self._register("bl_all", self._op_bl_all)
         self._register("bl_any", self._op_bl_any)
         self._register("bl_none", self._op_bl_none)
+        self._register("bl_table", self._op_bl_table)
+        self._register("bl_in_set", self._op_bl_in_set)
+        self._register("bl_rule", self._op_bl_rule)
+        self._register("bl_sum", self._op_bl_sum)
+        self._register("bl_count", self._op_bl_count)
+        self._register("bl_filter", self._op_bl_filter)
+        self._register("bl_map", self._op_bl_map)
+        self._register("bl_reduce", self._op_bl_reduce)
 
     # ------------------------------------------------------------------
     # Operator implementations
@@ -175,15 +481,53 @@ class ExtendedJsonLogic:
         argument_history.append({"default": None})
         return None, argument_history
 
+    def _op_let(self, args: Any, data: Dict[str, Any], eval_child: ArgEvaluator) -> tuple[Any, Any]:
+        bindings, body = self.let_args(args)
+        state = self._require_state("let")
+        frame: Dict[str, Any] = {}
+        # Bindings are sequential: each one can refer to those defined before it.
+        state.bindings.append(frame)
+        try:
+            for name, expression in bindings.items():
+                frame[name] = eval_child(expression, f"bindings.{name}")
+            result = eval_child(body, "body")
+        finally:
+            state.bindings.pop()
+        return result, {"bindings": dict(frame)}
+
+    def _op_let_var(self, args: Any, data: Dict[str, Any], eval_child: ArgEvaluator) -> tuple[Any, Any]:
+        path, default_expr, has_default = self.let_var_args(args)
+        name, _, rest = path.partition(".")
+        state = self._require_state("let_var")
+        for frame in reversed(state.bindings):
+            if name in frame:
+                found, value = self._resolve_var(frame[name], rest) if rest else (True, frame[name])
+                break
+        else:
+            raise EvaluationError(f"Undefined let binding '{name}'", kind="undefined_binding")
+        if not found:
+            value = eval_child(default_expr, "default") if has_default else None
+        return value, {"path": path, "value": value}
+
     def _op_in(self, args: Any, data: Dict[str, Any], eval_child: ArgEvaluator) -> tuple[Any, Any]:
         if not isinstance(args, list) or len(args) != 2:
             raise EvaluationError("'in' operator expects two arguments")
         needle = eval_child(args[0], "needle")
-        haystack = eval_child(args[1], "haystack")
+        members = self.literal_members(args[1])
+        if members is not None:
+            # A literal array evaluates to an equal copy of itself; skip building it.
+            haystack = args[1]
+        else:
+            haystack = eval_child(args[1], "haystack")
         if isinstance(haystack, str):
             result = str(needle) in haystack
         else:
-            result = needle in haystack
+            if members is None:
+                members = self._lookup_set(haystack)
+            try:
+                result = needle in (members if members is not None else haystack)
+            except TypeError:
+                result = needle in haystack
         return result, {"needle": needle, "haystack": haystack}
 
     def _op_missing(self, args: Any, data: Dict[str, Any], _: ArgEvaluator) -> tuple[Any, Any]:
@@ -286,7 +630,7 @@ class ExtendedJsonLogic:
         result = numbers[0]
         for value in numbers[1:]:
             if value == 0:
-                raise EvaluationError("Division by zero is not allowed")
+                raise EvaluationError("Division by zero is not allowed", kind="division_by_zero")
             result /= value
         return result, numbers
 
@@ -306,7 +650,7 @@ class ExtendedJsonLogic:
         sequence_expr, predicate_expr = self._ensure_predicate_args(args, "bl_all")
         sequence = eval_child(sequence_expr, "sequence")
         if isinstance(sequence, (str, bytes)) or not isinstance(sequence, Iterable):
-            raise EvaluationError("'bl_all' expects an iterable sequence")
+            raise EvaluationError("'bl_all' expects an iterable sequence", kind="type_mismatch")
         all_results: List[Dict[str, Any]] = []
         for idx, item in enumerate(sequence):
             scope = self._merge_context(data, {"item": item, "index": idx})
@@ -320,7 +664,7 @@ class ExtendedJsonLogic:
         sequence_expr, predicate_expr = self._ensure_predicate_args(args, "bl_any")
         sequence = eval_child(sequence_expr, "sequence")
         if isinstance(sequence, (str, bytes)) or not isinstance(sequence, Iterable):
-            raise EvaluationError("'bl_any' expects an iterable sequence")
+            raise EvaluationError("'bl_any' expects an iterable sequence", kind="type_mismatch")
         history: List[Dict[str, Any]] = []
         for idx, item in enumerate(sequence):
             scope = self._merge_context(data, {"item": item, "index": idx})
@@ -334,7 +678,7 @@ class ExtendedJsonLogic:
         sequence_expr, predicate_expr = self._ensure_predicate_args(args, "bl_none")
         sequence = eval_child(sequence_expr, "sequence")
         if isinstance(sequence, (str, bytes)) or not isinstance(sequence, Iterable):
-            raise EvaluationError("'bl_none' expects an iterable sequence")
+            raise EvaluationError("'bl_none' expects an iterable sequence", kind="type_mismatch")
         history: List[Dict[str, Any]] = []
         for idx, item in enumerate(sequence):
             scope = self._merge_context(data, {"item": item, "index": idx})
@@ -344,13 +688,118 @@ class ExtendedJsonLogic:
                 return False, history
         return True, history
 
+    def _op_bl_table(self, args: Any, data: Dict[str, Any], eval_child: ArgEvaluator) -> tuple[Any, Any]:
+        table = self.compile_table(args)
+        values = [eval_child(expr, f"inputs[{idx}]") for idx, expr in enumerate(table.inputs)]
+        rows = table.match(values)
+        if table.hit_policy == "unique" and len(rows) > 1:
+            raise EvaluationError(
+                f"'bl_table' unique hit policy matched multiple rules: {rows}", kind="hit_policy_violation"
+            )
+
+        if not rows:
+            result = eval_child(table.default, "default") if table.has_default else None
+        elif table.hit_policy == "collect":
+            result = [eval_child(table.outputs[row], f"rules[{row}].then") for row in rows]
+        else:
+            result = eval_child(table.outputs[rows[0]], f"rules[{rows[0]}].then")
+        return result, {"hit_policy": table.hit_policy, "inputs": values, "matched": rows}
+
+    def _op_bl_sum(self, args: Any, data: Dict[str, Any], eval_child: ArgEvaluator) -> tuple[Any, Any]:
+        items = self.aggregation_args("bl_sum", args)
+        sequence = self._ensure_sequence(eval_child(items[0], "sequence"), "bl_sum")
+        values = sequence if len(items) == 1 else self._project("bl_sum", items[1], sequence, data)
+        total = 0.0
+        for idx, value in enumerate(values):
+            try:
+                total += self._ensure_number(value)
+            except EvaluationError as exc:
+                raise EvaluationError(f"'bl_sum' failed at index {idx}: {exc}", kind=exc.kind) from exc
+        return total, {"size": len(sequence)}
+
+    def _op_bl_count(self, args: Any, data: Dict[str, Any], eval_child: ArgEvaluator) -> tuple[Any, Any]:
+        items = self.aggregation_args("bl_count", args)
+        sequence = self._ensure_sequence(eval_child(items[0], "sequence"), "bl_count")
+        if len(items) == 1:
+            return len(sequence), {"size": len(sequence)}
+        count = 0
+        for matched in self._project("bl_count", items[1], sequence, data):
+            if self._truthy(matched):
+                count += 1
+        return count, {"size": len(sequence), "matched": count}
+
+    def _op_bl_filter(self, args: Any, data: Dict[str, Any], eval_child: ArgEvaluator) -> tuple[Any, Any]:
+        items = self.aggregation_args("bl_filter", args)
+        sequence = self._ensure_sequence(eval_child(items[0], "sequence"), "bl_filter")
+        kept = [
+            item
+            for item, matched in zip(sequence, self._project("bl_filter", items[1], sequence, data))
+            if self._truthy(matched)
+        ]
+        return kept, {"size": len(sequence), "matched": len(kept)}
+
+    def _op_bl_map(self, args: Any, data: Dict[str, Any], eval_child: ArgEvaluator) -> tuple[Any, Any]:
+        items = self.aggregation_args("bl_map", args)
+        sequence = self._ensure_sequence(eval_child(items[0], "sequence"), "bl_map")
+        return list(self._project("bl_map", items[1], sequence, data)), {"size": len(sequence)}
+
+    def _op_bl_reduce(self, args: Any, data: Dict[str, Any], eval_child: ArgEvaluator) -> tuple[Any, Any]:
+        items = self.aggregation_args("bl_reduce", args)
+        sequence = self._ensure_sequence(eval_child(items[0], "sequence"), "bl_reduce")
+        initial = eval_child(items[2], "initial")
+        accumulator = initial
+        reducer = items[1]
+        for idx, item in enumerate(sequence):
+            try:
+                accumulator = self._eval_untraced(reducer, _ItemScope(data, item, idx, accumulator))
+            except EvaluationError as exc:
+                raise EvaluationError(f"'bl_reduce' failed at index {idx}: {exc}", kind=exc.kind) from exc
+        return accumulator, {"size": len(sequence), "initial": initial}
+
+    def _op_bl_in_set(self, args: Any, data: Dict[str, Any], eval_child: ArgEvaluator) -> tuple[Any, Any]:
+        needle_expr, name, version = self.reference_set_args(args)
+        needle = eval_child(needle_expr, "needle")
+        resolved_version, members = self._resolve_reference_set(name, version)
+        try:
+            result = needle in members
+        except TypeError:
+            result = False
+        return result, {"needle": needle, "set": name, "version": resolved_version, "size": len(members)}
+
+    def _op_bl_rule(self, args: Any, data: Dict[str, Any], eval_child: ArgEvaluator) -> tuple[Any, Any]:
+        stable_id, requested_version = self.rule_reference_args(args)
+        state = self._require_state("bl_rule")
+        version, definition = self._resolve_rule(state, stable_id, requested_version)
+        debug = {"stable_id": stable_id, "version": version, "memoized": True}
+
+        # Memo entries keep ``data`` alive so its id identifies the context.
+        memo_key = (stable_id, version, id(data))
+        cached = state.rule_memo.get(memo_key)
+        if cached is not None and cached[0] is data:
+            return cached[1], debug
+
+        if stable_id in state.rule_stack:
+            chain = " -> ".join([*state.rule_stack, stable_id])
+            raise EvaluationError(f"Cyclic rule reference detected: {chain}", kind="cyclic_reference")
+        state.rule_stack.append(stable_id)
+        # Referenced rules are catalog definitions, even inside transient logic.
+        transient, state.transient = state.transient, False
+        try:
+            result = eval_child(definition, "rule")
+        finally:
+            state.rule_stack.pop()
+            state.transient = transient
+        state.rule_memo[memo_key] = (data, result)
+        debug["memoized"] = False
+        return result, debug
+
     # ------------------------------------------------------------------
     # Utility helpers
     # ------------------------------------------------------------------
     def _ensure_iterable(self, value: Any, operator: str) -> Iterable[Any]:
         if isinstance(value, list):
             return value
-        raise EvaluationError(f"Operator '{operator}' expects an array argument")
+        raise EvaluationError(f"Operator '{operator}' expects an array argument", kind="type_mismatch")
 
     def _ensure_string(self, value: Any, message: str) -> str:
         if not isinstance(value, str):
@@ -359,21 +808,25 @@ class ExtendedJsonLogic:
 
     def _ensure_number(self, value: Any) -> float:
         if isinstance(value, bool):
-            raise EvaluationError("Boolean values cannot be coerced into numbers")
+            raise EvaluationError("Boolean values cannot be coerced into numbers", kind="type_mismatch")
         if isinstance(value, (int, float)):
             return float(value)
-        raise EvaluationError(f"Value '{value}' is not numeric")
+        raise EvaluationError(f"Value '{value}' is not numeric", kind="type_mismatch")
 
     def _truthy(self, value: Any) -> bool:
         return bool(value)
 
     def _resolve_var(self, data: Dict[str, Any], path: Optional[str]) -> tuple[bool, Any]:
         if path is None or path == "":
-            return True, data
+            return True, data.materialize() if isinstance(data, _ItemScope) else data
         parts = path.split(".")
         current: Any = data
         for part in parts:
-            if isinstance(current, dict):
+            if isinstance(current, _ItemScope):
+                found, current = current.lookup(part)
+                if not found:
+                    return False, None
+            elif isinstance(current, dict):
                 if part in current:
                     current = current[part]
                 else:
@@ -396,11 +849,170 @@ class ExtendedJsonLogic:
             raise EvaluationError(f"'{operator}' expects a sequence expression and a predicate expression")
         return args[0], args[1]
 
+    def rule_reference_args(self, args: Any) -> tuple[str, Optional[int]]:
+        """Return the stable id and optional pinned version of a ``bl_rule``."""
+
+        if isinstance(args, str):
+            return args, None
+        if not isinstance(args, list) or len(args) not in (1, 2):
+            raise EvaluationError("'bl_rule' expects a stable id and an optional version")
+        stable_id = self._ensure_string(args[0], "'bl_rule' stable id must be a string")
+        version: Optional[int] = None
+        if len(args) == 2:
+            version = args[1]
+            if isinstance(version, bool) or not isinstance(version, int) or version < 1:
+                raise EvaluationError("'bl_rule' version must be a positive integer")
+        return stable_id, version
+
+    def _resolve_rule(
+        self, state: _EvaluationState, stable_id: str, version: Optional[int]
+    ) -> Tuple[int, Any]:
+        resolver = state.resolver
+        if resolver is None:
+            raise EvaluationError(f"Rule '{stable_id}' cannot be resolved without a catalog", kind="unknown_reference")
+        # Resolutions are reused across evaluations until the catalog changes.
+        key = ("bl_rule", id(resolver), stable_id, version)
+        entry = self._compiled.get(key)
+        if entry is not None and entry[0] is resolver and entry[1][0] == resolver.revision:
+            self._touch(key)
+            return entry[1][1]
+        revision = resolver.revision
+        resolved = resolver.resolve_rule(stable_id, version)
+        if resolved is None:
+            label = stable_id if version is None else f"{stable_id}:{version}"
+            raise EvaluationError(f"Unknown rule '{label}'", kind="unknown_reference")
+        self._remember(key, resolver, (revision, resolved))
+        return resolved
+
+    def let_args(self, args: Any) -> tuple[Dict[str, Any], Any]:
+        """Split ``let`` arguments into the binding map and the body expression."""
+
+        if not isinstance(args, list) or len(args) != 2 or not isinstance(args[0], dict):
+            raise EvaluationError("'let' expects an object of bindings and a body expression")
+        for name in args[0]:
+            if not name or "." in name:
+                raise EvaluationError(f"Invalid let binding name '{name}'")
+        return args[0], args[1]
+
+    def let_var_args(self, args: Any) -> tuple[str, Any, bool]:
+        """Return the path, default expression and default flag of a ``let_var``."""
+
+        if isinstance(args, list):
+            if not args or len(args) > 2:
+                raise EvaluationError("'let_var' expects a binding path and an optional default")
+            path = self._ensure_string(args[0], "let_var path must be a string")
+            return path, args[1] if len(args) == 2 else None, len(args) == 2
+        return self._ensure_string(args, "let_var path must be a string"), None, False
+
+    def _require_state(self, operator: str) -> _EvaluationState:
+        state = _state.get()
+        if state is None:
+            raise EvaluationError(f"'{operator}' can only be used through evaluate()")
+        return state
+
+    def aggregation_args(self, operator: str, args: Any) -> List[Any]:
+        """Check the argument count of an aggregation operator."""
+
+        minimum, maximum = _AGGREGATION_ARITY[operator]
+        if not isinstance(args, list) or not minimum <= len(args) <= maximum:
+            expected = str(minimum) if minimum == maximum else f"{minimum} or {maximum}"
+            raise EvaluationError(f"'{operator}' expects {expected} arguments")
+        return args
+
+    def _ensure_sequence(self, value: Any, operator: str) -> List[Any]:
+        if isinstance(value, list):
+            return value
+        if isinstance(value, (str, bytes, dict)) or not isinstance(value, Iterable):
+            raise EvaluationError(f"'{operator}' expects an iterable sequence", kind="type_mismatch")
+        return list(value)
+
+    def _project(self, operator: str, expression: Any, sequence: List[Any], data: Any) -> Iterable[Any]:
+        """Evaluate ``expression`` once per element inside an item scope."""
+
+        for idx, item in enumerate(sequence):
+            try:
+                yield self._eval_untraced(expression, _ItemScope(data, item, idx))
+            except EvaluationError as exc:
+                raise EvaluationError(f"'{operator}' failed at index {idx}: {exc}", kind=exc.kind) from exc
+
+    def reference_set_args(self, args: Any) -> tuple[Any, str, Optional[int]]:
+        """Split ``bl_in_set`` arguments into needle expression, set name and version."""
+
+        if not isinstance(args, list) or len(args) not in (2, 3):
+            raise EvaluationError("'bl_in_set' expects a value, a reference set name and an optional version")
+        name = self._ensure_string(args[1], "'bl_in_set' reference set name must be a string")
+        version: Optional[int] = None
+        if len(args) == 3:
+            version = args[2]
+            if isinstance(version, bool) or not isinstance(version, int) or version < 1:
+                raise EvaluationError("'bl_in_set' version must be a positive integer")
+        return args[0], name, version
+
+    def _resolve_reference_set(self, name: str, version: Optional[int]) -> Tuple[int, FrozenSet[Any]]:
+        state = _state.get()
+        if state is None or state.resolver is None:
+            raise EvaluationError(
+                f"Reference set '{name}' cannot be resolved without a catalog", kind="unknown_reference"
+            )
+        resolved = state.resolver.resolve_reference_set(name, version)
+        if resolved is None:
+            label = name if version is None else f"{name}:{version}"
+            raise EvaluationError(f"Unknown reference set '{label}'", kind="unknown_reference")
+        return resolved
+
+    def _lookup_set(self, haystack: Any) -> Optional[FrozenSet[Any]]:
+        """Return a set view of a large array looked up again in the current evaluation.
+
+        The first lookup of an array only records it, as one linear scan is
+        cheaper than building a set; later lookups of the same array share
+        the set built on the second one.
+        """
+
+        if not isinstance(haystack, list) or len(haystack) < _SET_CONVERSION_THRESHOLD:
+            return None
+        state = _state.get()
+        if state is None:
+            return None
+        # The cached entry keeps the array alive so its id stays unique.
+        entry = state.lookup_sets.get(id(haystack))
+        if entry is None or entry[0] is not haystack:
+            state.lookup_sets[id(haystack)] = (haystack, _UNSET)
+            return None
+        if entry[1] is not _UNSET:
+            return entry[1]
+        try:
+            members: Optional[FrozenSet[Any]] = frozenset(haystack)
+        except TypeError:
+            members = None
+        state.lookup_sets[id(haystack)] = (haystack, members)
+        return members
+
     def _merge_context(self, base: Dict[str, Any], extra: Dict[str, Any]) -> Dict[str, Any]:
         merged: Dict[str, Any]
+        if isinstance(base, _ItemScope):
+            merged = base.materialize()
+            merged.update(extra)
+            return merged
         if isinstance(base, dict):
             merged = dict(base)
             merged.update(extra)
             return merged
         merged = dict(extra)
         return merged
+
+
+def _literal_set(haystack: List[Any]) -> Optional[FrozenSet[Any]]:
+    """Return the members of an array of scalars, or ``None`` when it holds expressions."""
+
+    if all(item is None or isinstance(item, (str, int, float, bool)) for item in haystack):
+        return frozenset(haystack)
+    return None
+
+
+_json_logic = ExtendedJsonLogic()
+
+
+def get_json_logic() -> ExtendedJsonLogic:
+    """Return the evaluator shared by the validator and evaluation services."""
+
+    return _json_logic
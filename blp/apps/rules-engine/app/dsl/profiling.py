@@ -0,0 +1,35 @@
+"""Per-operator profiles of JSON-Logic evaluations."""
+
+from __future__ import annotations
+
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# A stack of "operator@path" frames, root first.
+Stack = Tuple[str, ...]
+
+
+class EvaluationProfile:
+    """Wall time and call counts recorded while profiling evaluations.
+
+    ``samples`` maps every stack of ``operator@path`` frames, root first, to
+    ``[calls, self_ns, total_ns]``: how often the innermost node ran, the
+    nanoseconds spent in it excluding child nodes and including them. Work
+    an operator does per element of an aggregation counts as its own time.
+    """
+
+    __slots__ = ("samples",)
+
+    def __init__(self, samples: Optional[Dict[Stack, List[int]]] = None) -> None:
+        self.samples: Dict[Stack, List[int]] = samples if samples is not None else {}
+
+    def merge(self, samples: Mapping[Stack, List[int]]) -> None:
+        """Add the samples of another profile to this one."""
+
+        for stack, (calls, self_ns, total_ns) in samples.items():
+            sample = self.samples.get(stack)
+            if sample is None:
+                self.samples[stack] = [calls, self_ns, total_ns]
+            else:
+                sample[0] += calls
+                sample[1] += self_ns
+                sample[2] += total_ns
@@ -0,0 +1,263 @@
+"""Indexed decision tables backing the ``bl_table`` operator.
+
+A decision table maps a tuple of input values onto the outputs of the rows
+whose conditions match. Rows are written as::
+
+    {
+        "inputs": [{"var": "applicant.credit_score"}, {"var": "loan.ltv"}],
+        "hit_policy": "first",
+        "rules": [
+            {"when": [{">=": 740}, {"<=": 80}], "then": 0.0},
+            {"when": [{">=": 700, "<": 740}, null], "then": 0.25},
+            {"when": [{"in": [620, 640]}, 95], "then": 1.5}
+        ],
+        "default": 3.0
+    }
+
+Each cell of ``when`` is one of:
+
+* ``null`` – matches any value;
+* a scalar – matches values equal to the scalar;
+* ``{"==": value}`` – explicit equality;
+* ``{"in": [...]}`` – membership in a set of scalars;
+* a range built from ``>``, ``>=``, ``<`` and ``<=`` bounds.
+
+Compilation builds one index per input column: a hash index for equality
+and set cells and a sorted list of interval boundaries for range cells.
+Each index maps a value onto a bitmask of candidate rows, so a lookup costs
+one dictionary probe plus one binary search per column followed by a bitwise
+intersection of the column masks.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.dsl.errors import EvaluationError
+
+HIT_POLICIES = ("first", "unique", "collect")
+
+_LOWER_BOUNDS = (">", ">=")
+_UPPER_BOUNDS = ("<", "<=")
+
+
+@dataclass(frozen=True)
+class _Range:
+    lower: Optional[float]
+    lower_inclusive: bool
+    upper: Optional[float]
+    upper_inclusive: bool
+
+
+class _ColumnIndex:
+    """Hash and interval index for a single input column."""
+
+    def __init__(self) -> None:
+        self.wildcard = 0
+        self.equals: Dict[Any, int] = {}
+        self.ranges: List[Tuple[_Range, int]] = []
+        self.bounds: List[float] = []
+        self.region_masks: List[int] = []
+
+    def add_equal(self, value: Any, bit: int) -> None:
+        self.equals[_hash_key(value)] = self.equals.get(_hash_key(value), 0) | bit
+
+    def build(self) -> None:
+        """Sweep the range cells into per-region row masks."""
+
+        if not self.ranges:
+            return
+        points = set()
+        for cell, _ in self.ranges:
+            if cell.lower is not None:
+                points.add(cell.lower)
+            if cell.upper is not None:
+                points.add(cell.upper)
+        self.bounds = sorted(points)
+        positions = {bound: idx for idx, bound in enumerate(self.bounds)}
+        # Regions alternate between open gaps and boundary points:
+        # (-inf, b0), [b0], (b0, b1), [b1], ..., [bk], (bk, +inf)
+        regions = 2 * len(self.bounds) + 1
+        toggles = [0] * (regions + 1)
+        for cell, bit in self.ranges:
+            if cell.lower is None:
+                start = 0
+            else:
+                position = 2 * positions[cell.lower] + 1
+                start = position if cell.lower_inclusive else position + 1
+            if cell.upper is None:
+                end = regions - 1
+            else:
+                position = 2 * positions[cell.upper] + 1
+                end = position if cell.upper_inclusive else position - 1
+            if start <= end:
+                toggles[start] ^= bit
+                toggles[end + 1] ^= bit
+        mask = 0
+        self.region_masks = []
+        for region in range(regions):
+            mask ^= toggles[region]
+            self.region_masks.append(mask)
+
+    def candidates(self, value: Any) -> int:
+        mask = self.wildcard
+        if self.equals:
+            try:
+                mask |= self.equals.get(_hash_key(value), 0)
+            except TypeError:
+                pass
+        if self.region_masks and isinstance(value, (int, float)) and not isinstance(value, bool):
+            position = bisect_left(self.bounds, value)
+            if position < len(self.bounds) and self.bounds[position] == value:
+                mask |= self.region_masks[2 * position + 1]
+            else:
+                mask |= self.region_masks[2 * position]
+        return mask
+
+
+class DecisionTable:
+    """Compiled, immutable representation of a ``bl_table`` expression."""
+
+    def __init__(
+        self,
+        inputs: List[Any],
+        outputs: List[Any],
+        columns: List[_ColumnIndex],
+        hit_policy: str,
+        default: Any,
+        has_default: bool,
+    ) -> None:
+        self.inputs = inputs
+        self.outputs = outputs
+        self.hit_policy = hit_policy
+        self.default = default
+        self.has_default = has_default
+        self._columns = columns
+        self._all_rows = (1 << len(outputs)) - 1
+
+    @classmethod
+    def compile(cls, args: Any) -> "DecisionTable":
+        """Validate the table definition and build its column indexes."""
+
+        if not isinstance(args, dict):
+            raise EvaluationError("'bl_table' expects an object with 'inputs' and 'rules'")
+        unknown = set(args) - {"inputs", "rules", "hit_policy", "default"}
+        if unknown:
+            raise EvaluationError(f"'bl_table' does not support keys: {', '.join(sorted(unknown))}")
+
+        inputs = args.get("inputs")
+        if not isinstance(inputs, list) or not inputs:
+            raise EvaluationError("'bl_table' requires a non-empty 'inputs' array")
+        rules = args.get("rules")
+        if not isinstance(rules, list) or not rules:
+            raise EvaluationError("'bl_table' requires a non-empty 'rules' array")
+        hit_policy = args.get("hit_policy", "first")
+        if hit_policy not in HIT_POLICIES:
+            raise EvaluationError(
+                f"'bl_table' hit_policy must be one of {', '.join(HIT_POLICIES)}"
+            )
+
+        columns = [_ColumnIndex() for _ in inputs]
+        outputs: List[Any] = []
+        for row, rule in enumerate(rules):
+            if not isinstance(rule, dict) or set(rule) != {"when", "then"}:
+                raise EvaluationError(f"'bl_table' rule {row} must contain exactly 'when' and 'then'")
+            cells = rule["when"]
+            if not isinstance(cells, list) or len(cells) != len(inputs):
+                raise EvaluationError(
+                    f"'bl_table' rule {row} must provide {len(inputs)} conditions in 'when'"
+                )
+            bit = 1 << row
+            for column, cell in zip(columns, cells):
+                _index_cell(column, cell, bit, row)
+            outputs.append(rule["then"])
+
+        for column in columns:
+            column.build()
+        return cls(inputs, outputs, columns, hit_policy, args.get("default"), "default" in args)
+
+    def match(self, values: List[Any]) -> List[int]:
+        """Return the indexes of the rows matching ``values`` in table order."""
+
+        mask = self._all_rows
+        for column, value in zip(self._columns, values):
+            mask &= column.candidates(value)
+            if not mask:
+                return []
+        if self.hit_policy == "first":
+            return [(mask & -mask).bit_length() - 1]
+        return list(_iter_bits(mask))
+
+    def output_expressions(self) -> Iterator[Tuple[str, Any]]:
+        """Yield every output expression together with its relative path."""
+
+        for row, output in enumerate(self.outputs):
+            yield f"rules[{row}].then", output
+        if self.has_default:
+            yield "default", self.default
+
+
+def _index_cell(column: _ColumnIndex, cell: Any, bit: int, row: int) -> None:
+    if cell is None:
+        column.wildcard |= bit
+        return
+    if not isinstance(cell, (dict, list)):
+        column.add_equal(cell, bit)
+        return
+    if not isinstance(cell, dict) or not cell:
+        raise EvaluationError(f"'bl_table' rule {row} contains an unsupported condition: {cell!r}")
+
+    if set(cell) == {"=="}:
+        _ensure_scalar(cell["=="], row)
+        column.add_equal(cell["=="], bit)
+        return
+    if set(cell) == {"in"}:
+        members = cell["in"]
+        if not isinstance(members, list):
+            raise EvaluationError(f"'bl_table' rule {row} expects an array for 'in'")
+        for member in members:
+            _ensure_scalar(member, row)
+            column.add_equal(member, bit)
+        return
+
+    lower = [key for key in cell if key in _LOWER_BOUNDS]
+    upper = [key for key in cell if key in _UPPER_BOUNDS]
+    if len(lower) > 1 or len(upper) > 1 or len(lower) + len(upper) != len(cell):
+        raise EvaluationError(
+            f"'bl_table' rule {row} ranges accept at most one lower and one upper bound"
+        )
+    bounds = {key: _ensure_bound(cell[key], row) for key in cell}
+    cell_range = _Range(
+        lower=bounds[lower[0]] if lower else None,
+        lower_inclusive=bool(lower) and lower[0] == ">=",
+        upper=bounds[upper[0]] if upper else None,
+        upper_inclusive=bool(upper) and upper[0] == "<=",
+    )
+    column.ranges.append((cell_range, bit))
+
+
+def _ensure_scalar(value: Any, row: int) -> None:
+    if isinstance(value, (dict, list)):
+        raise EvaluationError(f"'bl_table' rule {row} equality values must be scalars")
+
+
+def _ensure_bound(value: Any, row: int) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise EvaluationError(f"'bl_table' rule {row} range bounds must be numeric")
+    return float(value)
+
+
+def _hash_key(value: Any) -> Any:
+    # Keep booleans apart from 0/1 so ``true`` never matches a ``1`` cell.
+    if isinstance(value, bool):
+        return (bool, value)
+    return value
+
+
+def _iter_bits(mask: int) -> Iterator[int]:
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
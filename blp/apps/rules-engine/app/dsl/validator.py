@@ -2,28 +2,65 @@
 
 from __future__ import annotations
 
-from typing import Any, Iterable
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Optional, Set, Tuple
 
-from app.dsl.operators import EvaluationError, ExtendedJsonLogic
+from app.dsl.operators import DefinitionResolver, EvaluationError, ExtendedJsonLogic, get_json_logic
+
+
+@dataclass
+class _ValidationScope:
+    """Per-call state threaded through a single validation pass."""
+
+    resolver: Optional[DefinitionResolver] = None
+    bindings: FrozenSet[str] = frozenset()
+    # Chain of stable ids whose definitions are being validated.
+    rules: Tuple[str, ...] = ()
+    checked_rules: Set[Tuple[str, int]] = field(default_factory=set)
 
 
 class LogicValidator:
     """Validate JSON-Logic expressions before persisting them in the catalog."""
 
     def __init__(self, evaluator: ExtendedJsonLogic | None = None) -> None:
-        self._evaluator = evaluator or ExtendedJsonLogic()
+        self._evaluator = evaluator or get_json_logic()
         self._operators = self._evaluator.supported_operators()
+        # Operators whose arguments are not plain expression lists.
+        self._special_forms: Dict[str, Callable[[Any, str, _ValidationScope], None]] = {
+            "bl_table": self._validate_table,
+            "in": self._validate_in,
+            "let": self._validate_let,
+            "let_var": self._validate_let_var,
+            "bl_in_set": self._validate_reference_set,
+            "bl_rule": self._validate_rule_reference,
+            "bl_sum": self._validate_aggregation("bl_sum"),
+            "bl_count": self._validate_aggregation("bl_count"),
+            "bl_filter": self._validate_aggregation("bl_filter"),
+            "bl_map": self._validate_aggregation("bl_map"),
+            "bl_reduce": self._validate_aggregation("bl_reduce"),
+        }
 
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
-    def validate(self, expression: Any) -> None:
+    def validate(
+        self,
+        expression: Any,
+        resolver: Optional[DefinitionResolver] = None,
+        stable_id: Optional[str] = None,
+    ) -> None:
         """Validate the provided JSON-Logic expression.
 
         Parameters
         ----------
         expression:
             Arbitrary JSON compatible data representing a JSON-Logic expression.
+        resolver:
+            Optional catalog used to check that referenced catalog data exists.
+            Without it only the structure of such references is validated.
+        stable_id:
+            Identifier of the rule being validated, used to detect ``bl_rule``
+            reference cycles that lead back to it.
 
         Raises
         ------
@@ -31,12 +68,13 @@ class LogicValidator:
             If the expression contains structural mistakes or unsupported operators.
         """
 
-        self._validate_node(expression, path="$")
+        rules = (stable_id,) if stable_id else ()
+        self._validate_node(expression, "$", _ValidationScope(resolver=resolver, rules=rules))
 
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
-    def _validate_node(self, expression: Any, path: str) -> None:
+    def _validate_node(self, expression: Any, path: str, scope: _ValidationScope) -> None:
         if isinstance(expression, dict):
             if len(expression) != 1:
                 raise EvaluationError(
@@ -47,12 +85,16 @@ class LogicValidator:
             if operator not in self._operators:
                 raise EvaluationError(f"Unsupported operator '{operator}'")
 
-            self._validate_arguments(args, f"{path}.{operator}")
+            special_form = self._special_forms.get(operator)
+            if special_form is not None:
+                special_form(args, f"{path}.{operator}", scope)
+            else:
+                self._validate_arguments(args, f"{path}.{operator}", scope)
             return
 
         if isinstance(expression, list):
             for idx, item in enumerate(expression):
-                self._validate_node(item, f"{path}[{idx}]")
+                self._validate_node(item, f"{path}[{idx}]", scope)
             return
 
         if self._is_scalar(expression):
@@ -60,15 +102,15 @@ class LogicValidator:
 
         raise EvaluationError(f"Unsupported value type at {path}: {type(expression)!r}")
 
-    def _validate_arguments(self, args: Any, path: str) -> None:
+    def _validate_arguments(self, args: Any, path: str, scope: _ValidationScope) -> None:
         if isinstance(args, list):
             for idx, item in enumerate(args):
-                self._validate_node(item, f"{path}[{idx}]")
+                self._validate_node(item, f"{path}[{idx}]", scope)
             return
 
         if isinstance(args, dict):
             for key, value in args.items():
-                self._validate_node(value, f"{path}.{key}")
+                self._validate_node(value, f"{path}.{key}", scope)
             return
 
         if self._is_scalar(args):
@@ -76,6 +118,71 @@ class LogicValidator:
 
         raise EvaluationError(f"Unsupported argument type at {path}: {type(args)!r}")
 
+    def _validate_table(self, args: Any, path: str, scope: _ValidationScope) -> None:
+        table = self._evaluator.compile_table(args)
+        for idx, expression in enumerate(table.inputs):
+            self._validate_node(expression, f"{path}.inputs[{idx}]", scope)
+        for output_path, expression in table.output_expressions():
+            self._validate_node(expression, f"{path}.{output_path}", scope)
+
+    def _validate_in(self, args: Any, path: str, scope: _ValidationScope) -> None:
+        self._validate_arguments(args, path, scope)
+        if isinstance(args, list) and len(args) == 2:
+            # Convert a literal haystack ahead of the first evaluation.
+            self._evaluator.literal_members(args[1])
+
+    def _validate_let(self, args: Any, path: str, scope: _ValidationScope) -> None:
+        bindings, body = self._evaluator.let_args(args)
+        for name, expression in bindings.items():
+            self._validate_node(expression, f"{path}.bindings.{name}", scope)
+            scope = replace(scope, bindings=scope.bindings | {name})
+        self._validate_node(body, f"{path}.body", scope)
+
+    def _validate_let_var(self, args: Any, path: str, scope: _ValidationScope) -> None:
+        binding_path, default, has_default = self._evaluator.let_var_args(args)
+        name = binding_path.partition(".")[0]
+        if name not in scope.bindings:
+            raise EvaluationError(f"Undefined let binding '{name}' at {path}", kind="undefined_binding")
+        if has_default:
+            self._validate_node(default, f"{path}.default", scope)
+
+    def _validate_aggregation(self, operator: str) -> Callable[[Any, str, _ValidationScope], None]:
+        def validate(args: Any, path: str, scope: _ValidationScope) -> None:
+            self._evaluator.aggregation_args(operator, args)
+            self._validate_arguments(args, path, scope)
+
+        return validate
+
+    def _validate_reference_set(self, args: Any, path: str, scope: _ValidationScope) -> None:
+        needle, name, version = self._evaluator.reference_set_args(args)
+        self._validate_node(needle, f"{path}.needle", scope)
+        if scope.resolver is not None and scope.resolver.resolve_reference_set(name, version) is None:
+            label = name if version is None else f"{name}:{version}"
+            raise EvaluationError(f"Unknown reference set '{label}' at {path}", kind="unknown_reference")
+
+    def _validate_rule_reference(self, args: Any, path: str, scope: _ValidationScope) -> None:
+        stable_id, version = self._evaluator.rule_reference_args(args)
+        if stable_id in scope.rules:
+            chain = " -> ".join([*scope.rules, stable_id])
+            raise EvaluationError(f"Cyclic rule reference at {path}: {chain}", kind="cyclic_reference")
+        if scope.resolver is None:
+            return
+        resolved = scope.resolver.resolve_rule(stable_id, version)
+        if resolved is None:
+            label = stable_id if version is None else f"{stable_id}:{version}"
+            raise EvaluationError(f"Unknown rule '{label}' at {path}", kind="unknown_reference")
+        resolved_version, definition = resolved
+        if (stable_id, resolved_version) in scope.checked_rules:
+            return
+        # Walk the referenced definition to find cycles through other rules.
+        nested = _ValidationScope(
+            resolver=scope.resolver,
+            rules=(*scope.rules, stable_id),
+            checked_rules=scope.checked_rules,
+        )
+        self._validate_node(definition, f"{path}<{stable_id}:{resolved_version}>", nested)
+        scope.checked_rules.add((stable_id, resolved_version))
+
     def _is_scalar(self, value: Any) -> bool:
         scalar_types: Iterable[type[Any]] = (str, int, float, bool, type(None))
         return isinstance(value, scalar_types)
@@ -3,28 +3,48 @@
 from __future__ import annotations
 
 import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
 from fastapi import FastAPI, Request
-from opentelemetry import trace
+from fastapi.exceptions import RequestValidationError
+from opentelemetry import metrics, trace
+from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.asgi import OpenTelemetryMiddleware
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+from opentelemetry.sdk.metrics.view import ExplicitBucketHistogramAggregation, View
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.semconv.resource import ResourceAttributes
+from starlette.exceptions import HTTPException as StarletteHTTPException
 
+from app.api.admission import AdmissionMiddleware, get_admission_controller
+from app.api.compression import CompressionMiddleware
+from app.api.metrics import HISTOGRAM_BUCKETS
+from app.api.negotiation import negotiated_exception_handler
 from app.api.routes_eval import router as eval_router
+from app.api.routes_reference_sets import router as reference_sets_router
 from app.api.routes_rules import router as rules_router
 from app.core.config import settings
 from app.core.logging import configure_logging
+from app.services.catalog import get_catalog_service
+from app.services.directory_source import get_directory_source
+from app.services.evaluator import get_evaluator_service
+from app.services.storage import get_storage
+
+_meter_provider: Optional[MeterProvider] = None
 
 
 def configure_observability(app: FastAPI) -> None:
-    """Configure OpenTelemetry tracing for the FastAPI app."""
+    """Configure OpenTelemetry tracing and metrics for the FastAPI app."""
 
     collector = os.getenv("OTEL_COLLECTOR_ENDPOINT", "http://otel-collector:4318")
     endpoint = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT", f"{collector}/v1/traces")
+    metrics_endpoint = os.getenv("OTEL_EXPORTER_OTLP_METRICS_ENDPOINT", f"{collector}/v1/metrics")
     resource = Resource.create(
         {
             ResourceAttributes.SERVICE_NAME: "rules-engine",
@@ -38,15 +58,53 @@ def configure_observability(app: FastAPI) -> None:
     provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
     trace.set_tracer_provider(provider)
 
-    FastAPIInstrumentor.instrument_app(app, tracer_provider=provider)
-    app.add_middleware(OpenTelemetryMiddleware, tracer_provider=provider)
+    global _meter_provider
+    if _meter_provider is None:
+        # The global meter provider can only be set once; apps created later share it.
+        reader = PeriodicExportingMetricReader(
+            OTLPMetricExporter(endpoint=metrics_endpoint),
+            export_interval_millis=settings.metrics_export_interval * 1000,
+        )
+        _meter_provider = MeterProvider(
+            resource=resource,
+            metric_readers=[reader],
+            views=[
+                View(instrument_name=name, aggregation=ExplicitBucketHistogramAggregation(boundaries))
+                for name, boundaries in HISTOGRAM_BUCKETS.items()
+            ],
+        )
+        metrics.set_meter_provider(_meter_provider)
+    meter_provider = _meter_provider
+
+    FastAPIInstrumentor.instrument_app(app, tracer_provider=provider, meter_provider=meter_provider)
+    app.add_middleware(OpenTelemetryMiddleware, tracer_provider=provider, meter_provider=meter_provider)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Load the catalog and start evaluation workers on startup; stop them and flush writes on shutdown."""
+
+    if settings.catalog_import_path:
+        get_catalog_service().import_snapshot(settings.catalog_import_path)
+    source = get_directory_source()
+    if source is not None:
+        source.start()
+    evaluator = get_evaluator_service()
+    evaluator.start(get_catalog_service())
+    yield
+    if source is not None:
+        source.stop()
+    evaluator.close()
+    storage = get_storage()
+    if storage is not None:
+        storage.close()
 
 
 def create_app() -> FastAPI:
     """Create and configure the FastAPI application instance."""
 
     configure_logging()
-    app = FastAPI(title=settings.app_name, version=settings.version)
+    app = FastAPI(title=settings.app_name, version=settings.version, lifespan=lifespan)
     configure_observability(app)
 
     @app.middleware("http")
@@ -62,7 +120,16 @@ def create_app() -> FastAPI:
                 span.set_attribute("vendor.id", vendor_id)
         return response
 
+    app.add_middleware(AdmissionMiddleware, controller=get_admission_controller())
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.response_compression_min_size,
+        level=settings.response_compression_level,
+    )
+    app.add_exception_handler(StarletteHTTPException, negotiated_exception_handler)
+    app.add_exception_handler(RequestValidationError, negotiated_exception_handler)
     app.include_router(rules_router)
+    app.include_router(reference_sets_router)
     app.include_router(eval_router)
     return app
 
@@ -3,9 +3,19 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    StrictBool,
+    StrictFloat,
+    StrictInt,
+    StrictStr,
+    field_validator,
+    model_validator,
+)
 
 
 class RegressionCase(BaseModel):
@@ -45,6 +55,9 @@ class RuleVersion(BaseModel):
     description: Optional[str] = None
     labels: Dict[str, str] = Field(default_factory=dict)
     definition: Dict[str, Any]
+    definition_hash: Optional[str] = Field(
+        default=None, description="Canonical structural hash of the rule definition"
+    )
     status: str
     created_at: datetime
     updated_at: datetime
@@ -126,6 +139,22 @@ class RuleListResponse(BaseModel):
 
     total: int
     rules: List[RuleSummary]
+    next_cursor: Optional[str] = Field(
+        default=None, description="Cursor for the next page when more rules match"
+    )
+
+
+class RuleChangesResponse(BaseModel):
+    """Rules changed after a catalog revision."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    revision: int = Field(description="Current catalog revision, passed as 'since' by the next poll")
+    reset: bool = Field(
+        default=False,
+        description="The changes since the requested revision are unknown and the catalog must be reloaded",
+    )
+    rules: List[RuleSummary] = Field(default_factory=list)
 
 
 class RuleVersionResponse(BaseModel):
@@ -136,6 +165,83 @@ class RuleVersionResponse(BaseModel):
     rule: RuleVersion
 
 
+class BulkImportItemResult(BaseModel):
+    """Outcome of a single payload within a bulk import."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    index: int = Field(..., description="Position of the payload in the submitted batch")
+    stable_id: Optional[str] = None
+    status: Literal["created", "published", "failed"]
+    version: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkImportResponse(BaseModel):
+    """Per-item report returned by the bulk import endpoint."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    total: int
+    created: int
+    failed: int
+    results: List[BulkImportItemResult]
+
+
+ReferenceValue = Union[StrictStr, StrictInt, StrictFloat, StrictBool]
+
+
+class ReferenceSetCreateRequest(BaseModel):
+    """Payload for uploading a new version of a named reference set."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    name: str = Field(..., min_length=3, max_length=64, pattern=r"^[A-Za-z0-9][A-Za-z0-9_-]+$")
+    description: Optional[str] = Field(default=None)
+    values: List[ReferenceValue] = Field(..., description="Members of the reference set")
+
+
+class ReferenceSetVersion(BaseModel):
+    """Represents an immutable version of a named reference set."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    name: str
+    version: int
+    description: Optional[str] = None
+    size: int
+    values: List[ReferenceValue] = Field(default_factory=list)
+    created_at: datetime
+
+
+class ReferenceSetSummary(BaseModel):
+    """Summary view used when listing reference sets."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    name: str
+    description: Optional[str] = None
+    latest_version: int
+    size: int
+
+
+class ReferenceSetListResponse(BaseModel):
+    """Response schema when listing reference sets."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    total: int
+    sets: List[ReferenceSetSummary]
+
+
+class ReferenceSetVersionResponse(BaseModel):
+    """Response schema returning a concrete reference set version."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    reference_set: ReferenceSetVersion
+
+
 class EvaluationRequest(BaseModel):
     """Payload sent to the evaluator endpoint."""
 
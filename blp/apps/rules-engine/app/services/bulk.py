@@ -0,0 +1,118 @@
+"""Parsing and parallel structural validation for bulk rule imports."""
+
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.dsl.operators import EvaluationError
+from app.dsl.validator import get_logic_validator
+from app.models.schemas import RuleCreateRequest
+
+# Operators whose validity depends on catalog contents rather than structure.
+CATALOG_REFERENCE_OPERATORS = frozenset({"bl_rule", "bl_in_set"})
+
+# Below this many payloads a process pool costs more than it saves.
+_PARALLEL_THRESHOLD = 256
+
+# A bulk item is either a parsed payload or the error explaining why it is not.
+BulkItem = Union[RuleCreateRequest, str]
+
+
+def parse_bulk_payloads(body: bytes, content_type: Optional[str]) -> List[BulkItem]:
+    """Decode a JSON array or NDJSON body into rule payloads.
+
+    Malformed items are returned as error strings so that one bad line is
+    reported in place instead of rejecting the whole batch. A body that is
+    not an array or NDJSON at all raises ``ValueError``.
+    """
+
+    if content_type and "ndjson" in content_type:
+        raw: List[Any] = []
+        for number, line in enumerate(body.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                raw.append(json.loads(line))
+            except json.JSONDecodeError as exc:
+                raw.append(ValueError(f"line {number}: {exc.msg}"))
+    else:
+        try:
+            raw = json.loads(body)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Invalid JSON body: {exc.msg}") from exc
+    return parse_bulk_items(raw)
+
+
+def parse_bulk_items(raw: Any) -> List[BulkItem]:
+    """Validate an already decoded array of rule payloads.
+
+    Decoding errors carried as ``ValueError`` items are reported in place;
+    anything but a list raises ``ValueError``.
+    """
+
+    if not isinstance(raw, list):
+        raise ValueError("Expected a JSON array of rule payloads or an NDJSON body")
+
+    items: List[BulkItem] = []
+    for value in raw:
+        if isinstance(value, ValueError):
+            items.append(str(value))
+            continue
+        try:
+            items.append(RuleCreateRequest.model_validate(value))
+        except ValidationError as exc:
+            items.append(describe_validation_error(exc))
+    return items
+
+
+def check_definitions(definitions: Sequence[Any], workers: Optional[int] = None) -> List[Tuple[Optional[str], bool]]:
+    """Validate the structure of many definitions, in parallel for large batches.
+
+    Returns ``(error, uses_catalog)`` per definition. Checks that depend on
+    the catalog (referenced rules and reference sets) are left to the caller
+    for the definitions flagged with ``uses_catalog``.
+    """
+
+    workers = workers if workers is not None else settings.bulk_validation_workers or os.cpu_count() or 1
+    if workers <= 1 or len(definitions) < _PARALLEL_THRESHOLD:
+        return [check_definition(definition) for definition in definitions]
+    chunksize = max(1, len(definitions) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(check_definition, definitions, chunksize=chunksize))
+
+
+def check_definition(definition: Any) -> Tuple[Optional[str], bool]:
+    """Structurally validate one definition; runs inside pool workers."""
+
+    try:
+        get_logic_validator().validate(definition)
+    except EvaluationError as exc:
+        return str(exc), False
+    return None, _uses_catalog(definition)
+
+
+def _uses_catalog(expression: Any) -> bool:
+    stack = [expression]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if CATALOG_REFERENCE_OPERATORS.intersection(node):
+                return True
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return False
+
+
+def describe_validation_error(exc: ValidationError) -> str:
+    """Flatten a pydantic error into a single line for per-item reports."""
+
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'payload'}: {error['msg']}" for error in exc.errors()
+    )
@@ -1,20 +1,57 @@
-"""In-memory catalog responsible for managing rule definitions."""
+"""Catalog service responsible for managing rule definitions and reference sets."""
 
 from __future__ import annotations
 
+import asyncio
+import heapq
+import json
+import threading
+import time
+from collections import ChainMap, deque
+from bisect import bisect_right
+from contextlib import contextmanager
 from copy import deepcopy
+from dataclasses import dataclass, field, replace
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+from pydantic import ValidationError
 
 from app.models.schemas import (
+    BulkImportItemResult,
+    BulkImportResponse,
+    ReferenceSetCreateRequest,
+    ReferenceSetListResponse,
+    ReferenceSetSummary,
+    ReferenceSetVersion,
     RegressionCase,
     RegressionUpsertRequest,
+    RuleChangesResponse,
     RuleCreateRequest,
     RuleListResponse,
     RuleSummary,
     RuleVersion,
 )
+from app.dsl.errors import EvaluationError
+from app.dsl.hashing import DefinitionInterner
+from app.dsl.operators import get_json_logic
 from app.dsl.validator import LogicValidator, get_logic_validator
+from app.services.bulk import BulkItem, check_definitions, describe_validation_error
+from app.services.exports import (
+    construct_reference_set,
+    construct_rule_version,
+    load_compiled_artifacts,
+    read_catalog_export,
+    write_catalog_export,
+)
+from app.services.redis_catalog import Invalidation, RedisCatalogStore, get_redis_catalog_store
+from app.services.snapshots import MappedSection, SnapshotStore, encode_section, get_snapshot_store
+from app.services.storage import CatalogStorage, get_storage
+
+# Writes remembered for change feeds; older revisions require a full reload.
+_CHANGE_LOG_SIZE = 4096
+# Workers sharing snapshots or a database are not told about each other's writes.
+_POLL_INTERVAL = 0.5
 
 
 class RuleNotFoundError(Exception):
@@ -25,17 +62,121 @@ class RuleVersionNotFoundError(Exception):
     """Raised when the requested rule version does not exist."""
 
 
+class ReferenceSetNotFoundError(Exception):
+    """Raised when a named reference set or one of its versions does not exist."""
+
+
+class CatalogQuotaExceededError(Exception):
+    """Raised when a write would take a catalog over its rule version limit."""
+
+
+@dataclass(frozen=True)
+class _RuleEntry:
+    """Indexes kept for every version of a single stable id."""
+
+    versions: Dict[int, RuleVersion] = field(default_factory=dict)
+    latest: Optional[RuleVersion] = None
+    published: Optional[RuleVersion] = None
+    summary: Optional[RuleSummary] = None
+
+
+@dataclass(frozen=True)
+class _ReferenceEntry:
+    """Every version of a named reference set with its member sets."""
+
+    versions: Tuple[ReferenceSetVersion, ...] = ()
+    members: Tuple[FrozenSet[Any], ...] = ()
+
+
+@dataclass(frozen=True)
+class _CatalogSnapshot:
+    """Immutable view of the catalog published to readers.
+
+    Writers never modify a snapshot (or the entries and versions it refers
+    to) after it has been published; they copy the parts they change and
+    swap the new snapshot in with a single attribute assignment.
+    """
+
+    revision: int = 0
+    rules: Mapping[str, _RuleEntry] = field(default_factory=dict)
+    sorted_ids: Tuple[str, ...] = ()
+    label_index: Dict[Tuple[str, str], FrozenSet[str]] = field(default_factory=dict)
+    reference_sets: Mapping[str, _ReferenceEntry] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class CatalogExportMark:
+    """The catalog content written by :meth:`RuleCatalogService.export_changes`.
+
+    Passed back as ``since`` so the next export only holds what changed.
+    ``complete`` tells whether the export held the whole catalog.
+    """
+
+    snapshot: _CatalogSnapshot
+    base: Optional[_CatalogSnapshot]
+    complete: bool
+
+
+def parse_label_selector(selector: Optional[str]) -> Dict[str, str]:
+    """Parse a ``key=value,key=value`` label selector into a mapping."""
+
+    labels: Dict[str, str] = {}
+    if not selector:
+        return labels
+    for term in selector.split(","):
+        key, separator, value = term.partition("=")
+        if not separator or not key.strip():
+            raise ValueError(f"Invalid label selector term '{term}', expected key=value")
+        labels[key.strip()] = value.strip()
+    return labels
+
+
 class RuleCatalogService:
-    """Simple in-memory rule catalog.
+    """Catalog of rule versions, reference sets and their regression fixtures.
 
-    The service keeps track of rule versions, publication metadata and associated
-    regression fixtures. It is intentionally in-memory for the purposes of the
-    kata but mirrors the behaviour of a persistent catalog.
+    Reads are served from an immutable :class:`_CatalogSnapshot` of indexes
+    that writers, serialized by a lock, replace atomically; readers never lock
+    and never see a partial write. The catalog lives in memory alone or is
+    shared through ``storage``, ``snapshots`` or ``redis``, whose modules
+    describe how workers and hosts stay in sync. Every installed snapshot is
+    logged with the stable ids it changed to answer change feeds.
+
+    A catalog with a ``base`` is a namespace layered on top of it, as used
+    for tenants: entries it does not define are read from the base, its own
+    shadow them, and ``max_rule_versions`` caps the versions it holds itself.
     """
 
-    def __init__(self, validator: LogicValidator | None = None) -> None:
-        self._store: Dict[str, List[RuleVersion]] = {}
+    def __init__(
+        self,
+        validator: LogicValidator | None = None,
+        storage: CatalogStorage | None = None,
+        snapshots: SnapshotStore | None = None,
+        redis: RedisCatalogStore | None = None,
+        base: "RuleCatalogService | None" = None,
+        max_rule_versions: int = 0,
+    ) -> None:
+        if snapshots is not None and redis is not None:
+            raise ValueError("A catalog can be shared through snapshots or Redis, not both")
+        self._base = base
+        self._max_rule_versions = max_rule_versions
+        # ((revision, base revision), stable ids of the namespace and its base)
+        self._merged_ids: Optional[Tuple[Tuple[int, int], Tuple[str, ...]]] = None
+        self._snapshot = _CatalogSnapshot()
+        self._write_lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._snapshots = snapshots
+        self._redis = redis
         self._validator = validator or get_logic_validator()
+        self._interner = DefinitionInterner()
+        self._storage = storage
+        self._loaded = storage is None and redis is None
+        # Storage revision the snapshot was loaded at, and when reads last compared it.
+        self._storage_revision = -1
+        self._storage_checked = 0.0
+        # (previous revision, revision, changed stable ids or None when unknown)
+        self._changes: "deque[Tuple[int, int, Optional[FrozenSet[str]]]]" = deque(maxlen=_CHANGE_LOG_SIZE)
+        self._changes_lock = threading.Lock()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]] = []
 
     # ------------------------------------------------------------------
     # CRUD operations
@@ -43,71 +184,106 @@ class RuleCatalogService:
     def create_rule_version(self, payload: RuleCreateRequest) -> RuleVersion:
         """Create a new rule version from the provided payload."""
 
-        self._validator.validate(payload.definition)
-        versions = self._store.setdefault(payload.stable_id, [])
-        version_number = versions[-1].version + 1 if versions else 1
-        timestamp = datetime.utcnow()
-        version = RuleVersion(
-            stable_id=payload.stable_id,
-            version=version_number,
-            name=payload.name,
-            description=payload.description,
-            labels=deepcopy(payload.labels),
-            definition=deepcopy(payload.definition),
-            status="draft",
-            created_at=timestamp,
-            updated_at=timestamp,
-            revision_notes=payload.revision_notes,
-            regression_tests=[RegressionCase.model_validate(case.model_dump()) for case in payload.regression_tests],
-        )
-        versions.append(version)
-        return version
-
-    def list_rules(self) -> RuleListResponse:
-        """Return summaries for all rules stored in the catalog."""
-
-        summaries: List[RuleSummary] = []
-        for stable_id, versions in self._store.items():
-            latest = versions[-1]
-            published = next((v for v in reversed(versions) if v.status == "published"), None)
-            summaries.append(
-                RuleSummary(
-                    stable_id=stable_id,
-                    name=latest.name,
-                    description=latest.description,
-                    labels=deepcopy(latest.labels),
-                    latest_version=latest.version,
-                    published_version=published.version if published else None,
-                    status=latest.status,
-                )
+        self._ensure_loaded()
+        created: List[RuleVersion] = []
+
+        def commit(definition: Dict[str, Any], definition_hash: str) -> None:
+            # Runs before the interner keeps any subtree, so a definition that
+            # fails validation or the quota leaves nothing behind.
+            self._validator.validate(definition, resolver=self, stable_id=payload.stable_id)
+            entry = snapshot.rules.get(payload.stable_id)
+            latest = entry.latest.version if entry and entry.latest else 0
+            if self._storage is not None:
+                latest = max(latest, self._storage.latest_rule_version(payload.stable_id))
+            timestamp = datetime.utcnow()
+            version = RuleVersion(
+                stable_id=payload.stable_id,
+                version=latest + 1,
+                name=payload.name,
+                description=payload.description,
+                labels=deepcopy(payload.labels),
+                definition=definition,
+                definition_hash=definition_hash,
+                status="draft",
+                created_at=timestamp,
+                updated_at=timestamp,
+                revision_notes=payload.revision_notes,
+                regression_tests=[
+                    RegressionCase.model_validate(case.model_dump()) for case in payload.regression_tests
+                ],
             )
-        summaries.sort(key=lambda summary: summary.stable_id)
-        return RuleListResponse(total=len(summaries), rules=summaries)
+            # Validation copied the definition; keep the interned, shared one.
+            version.definition = definition
+            self._publish(_with_versions(snapshot, [version]), versions=[version])
+            created.append(version)
+
+        with self._writing() as snapshot:
+            self._interner.intern(payload.definition, before_commit=commit)
+        return created[0]
+
+    def list_rules(
+        self,
+        labels: Optional[Dict[str, str]] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> RuleListResponse:
+        """Return rule summaries ordered by stable id.
+
+        ``labels`` restricts the result to rules whose latest version carries
+        every given label. ``cursor`` is the last stable id of the previous
+        page and ``limit`` caps the page size; ``total`` always counts every
+        matching rule.
+        """
+
+        snapshot = self._read()
+        if self._base is None:
+            rules: Mapping[str, _RuleEntry] = snapshot.rules
+            candidates = sorted(_match_labels(snapshot, labels)) if labels else snapshot.sorted_ids
+        else:
+            base = self._base._read()
+            rules = ChainMap(snapshot.rules, base.rules)  # type: ignore[arg-type]
+            if labels:
+                inherited = (stable_id for stable_id in _match_labels(base, labels) if stable_id not in snapshot.rules)
+                candidates = sorted(_match_labels(snapshot, labels).union(inherited))
+            else:
+                candidates = self._merged_sorted_ids(snapshot, base)
+
+        start = bisect_right(candidates, cursor) if cursor is not None else 0
+        stop = len(candidates) if limit is None else min(start + limit, len(candidates))
+        page = [rules[stable_id].summary for stable_id in candidates[start:stop]]
+        next_cursor = candidates[stop - 1] if stop < len(candidates) and page else None
+        return RuleListResponse(total=len(candidates), rules=page, next_cursor=next_cursor)
 
     def publish_rule_version(self, stable_id: str, version: int, notes: Optional[str] = None) -> RuleVersion:
         """Publish a specific rule version."""
 
-        versions = self._store.get(stable_id)
-        if not versions:
-            raise RuleNotFoundError(stable_id)
+        self._ensure_loaded()
+        with self._writing() as snapshot:
+            entry = snapshot.rules.get(stable_id)
+            if entry is None:
+                raise RuleNotFoundError(stable_id)
 
-        target = next((v for v in versions if v.version == version), None)
-        if not target:
-            raise RuleVersionNotFoundError(f"{stable_id}:{version}")
+            current = entry.versions.get(version)
+            if current is None:
+                raise RuleVersionNotFoundError(f"{stable_id}:{version}")
 
-        # Unpublish other versions
-        for existing in versions:
-            if existing.status == "published":
-                existing.status = "draft"
-                existing.published_at = None
+            changed = []
+            timestamp = datetime.utcnow()
+            # Unpublish the previously published version
+            if entry.published is not None and entry.published is not current:
+                changed.append(
+                    entry.published.model_copy(
+                        update={"status": "draft", "published_at": None, "updated_at": timestamp}
+                    )
+                )
 
-        timestamp = datetime.utcnow()
-        target.status = "published"
-        target.updated_at = timestamp
-        target.published_at = timestamp
-        if notes:
-            target.revision_notes = notes
-        return target
+            update: Dict[str, Any] = {"status": "published", "updated_at": timestamp, "published_at": timestamp}
+            if notes:
+                update["revision_notes"] = notes
+            target = current.model_copy(update=update)
+            changed.append(target)
+            self._publish(_with_versions(snapshot, changed), versions=changed)
+            return target
 
     def get_rule_version(
         self,
@@ -122,42 +298,971 @@ class RuleCatalogService:
         ``prefer_latest`` is explicitly ``True``.
         """
 
-        versions = self._store.get(stable_id)
-        if not versions:
-            raise RuleNotFoundError(stable_id)
+        snapshot = self._read()
+        if self._base is not None and stable_id not in snapshot.rules:
+            return self._base.get_rule_version(stable_id, version=version, prefer_latest=prefer_latest)
+        return _select_version(snapshot, stable_id, version, prefer_latest)
 
-        if version is not None:
-            match = next((v for v in versions if v.version == version), None)
-            if not match:
-                raise RuleVersionNotFoundError(f"{stable_id}:{version}")
-            return match
+    def upsert_regression_cases(self, stable_id: str, request: RegressionUpsertRequest) -> RuleVersion:
+        """Replace the stored regression cases for the provided rule version."""
 
-        if prefer_latest:
-            return versions[-1]
+        self._ensure_loaded()
+        with self._writing() as snapshot:
+            current = _select_version(snapshot, stable_id, request.version, prefer_latest=True)
+            version = current.model_copy(
+                update={
+                    "regression_tests": [
+                        RegressionCase.model_validate(case.model_dump()) for case in request.cases
+                    ],
+                    "updated_at": datetime.utcnow(),
+                }
+            )
+            self._publish(_with_versions(snapshot, [version]), versions=[version])
+            return version
 
-        published = next((v for v in reversed(versions) if v.status == "published"), None)
-        return published or versions[-1]
+    def import_rules(self, items: Sequence[BulkItem], publish: bool = False) -> BulkImportResponse:
+        """Create many rule versions in one catalog write.
 
-    def upsert_regression_cases(self, stable_id: str, request: RegressionUpsertRequest) -> RuleVersion:
-        """Replace the stored regression cases for the provided rule version."""
+        ``items`` are parsed payloads or the parse error of a payload. Their
+        definitions are validated structurally in parallel first; rules that
+        reference other rules or reference sets are then checked against the
+        catalog as it will look after the import, so a batch may reference
+        rules it creates itself. Every valid payload is stored in a single
+        write and, with ``publish``, the last imported version of each stable
+        id is published as part of it. Invalid payloads are reported per item
+        and never block the rest of the batch.
+        """
 
-        version = self.get_rule_version(stable_id, request.version, prefer_latest=True)
-        version.regression_tests = [
-            RegressionCase.model_validate(case.model_dump()) for case in request.cases
+        results: Dict[int, BulkImportItemResult] = {}
+        payloads = [(index, item) for index, item in enumerate(items) if isinstance(item, RuleCreateRequest)]
+        for index, item in enumerate(items):
+            if isinstance(item, str):
+                results[index] = BulkImportItemResult(index=index, status="failed", error=item)
+
+        accepted: List[Tuple[int, RuleCreateRequest, bool]] = []
+        checks = check_definitions([payload.definition for _, payload in payloads])
+        for (index, payload), (error, uses_catalog) in zip(payloads, checks):
+            if error is not None:
+                results[index] = BulkImportItemResult(
+                    index=index, stable_id=payload.stable_id, status="failed", error=error
+                )
+            else:
+                accepted.append((index, payload, uses_catalog))
+
+        self._ensure_loaded()
+        created: Dict[int, RuleVersion] = {}
+
+        def commit(interned: List[Tuple[Any, str]]) -> List[Any]:
+            # Runs before the interner keeps any subtree; only the definitions
+            # of versions that were actually stored are interned.
+            nonlocal accepted, created
+            definitions = {index: definition for (index, _, _), definition in zip(accepted, interned)}
+            while True:
+                staged, changed, created = _stage_import(snapshot, accepted, definitions, publish)
+                resolver = _SnapshotResolver(staged, self._base)
+                rejected: Dict[int, str] = {}
+                for index, payload, uses_catalog in accepted:
+                    if not uses_catalog:
+                        continue
+                    try:
+                        self._validator.validate(
+                            created[index].definition, resolver=resolver, stable_id=payload.stable_id
+                        )
+                    except EvaluationError as exc:
+                        rejected[index] = str(exc)
+                if not rejected:
+                    break
+                # Dropping a rule can break rules referencing it; stage again.
+                for index, payload, _ in accepted:
+                    if index in rejected:
+                        results[index] = BulkImportItemResult(
+                            index=index, stable_id=payload.stable_id, status="failed", error=rejected[index]
+                        )
+                accepted = [item for item in accepted if item[0] not in rejected]
+
+            if changed:
+                self._publish(staged, versions=changed)
+            return [version.definition for version in created.values()]
+
+        with self._writing() as snapshot:
+            self._interner.intern_many([payload.definition for _, payload, _ in accepted], before_commit=commit)
+
+        for index, version in created.items():
+            results[index] = BulkImportItemResult(
+                index=index,
+                stable_id=version.stable_id,
+                status="published" if version.status == "published" else "created",
+                version=version.version,
+            )
+        ordered = [results[index] for index in range(len(items))]
+        return BulkImportResponse(
+            total=len(ordered),
+            created=len(created),
+            failed=len(ordered) - len(created),
+            results=ordered,
+        )
+
+    @property
+    def revision(self) -> int:
+        """Counter incremented on every catalog write (and every base catalog write).
+
+        Catalogs sharing storage, snapshots or Redis take it from there, so
+        every worker and restart reports the same revision for the same content.
+        """
+
+        return self._read().revision + self._base_revision()
+
+    def counts(self) -> Tuple[int, int]:
+        """Return the number of rules and rule versions held by this catalog itself, not its base."""
+
+        snapshot = self._read()
+        return len(snapshot.rules), sum(len(entry.versions) for entry in snapshot.rules.values())
+
+    def changes_since(self, since: int) -> RuleChangesResponse:
+        """Return summaries of the rules changed after revision ``since``.
+
+        ``reset`` is set instead when ``since`` is older than the change log,
+        newer than the catalog, when a write replaced the whole catalog, or
+        when revisions are missing from the log, as base catalog writes are.
+        """
+
+        snapshot = self._read()
+        revision = snapshot.revision + self._base_revision()
+        if since == revision:
+            return RuleChangesResponse(revision=since)
+        with self._changes_lock:
+            entries = sorted(entry for entry in self._changes if since < entry[1] <= revision)
+        chained = (
+            bool(entries)
+            and entries[0][0] <= since
+            and entries[-1][1] == revision
+            and all(entry[0] == previous[1] for previous, entry in zip(entries, entries[1:]))
+        )
+        if not chained or any(stable_ids is None for _, _, stable_ids in entries):
+            return RuleChangesResponse(revision=revision, reset=True)
+        changed = sorted(set().union(*(stable_ids for _, _, stable_ids in entries)))
+        return RuleChangesResponse(
+            revision=revision,
+            rules=[snapshot.rules[stable_id].summary for stable_id in changed if stable_id in snapshot.rules],
+        )
+
+    async def wait_for_change(self, since: int, timeout: float) -> None:
+        """Return once the revision differs from ``since`` or ``timeout`` seconds passed."""
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # Reading the revision may reload a shared catalog; do it off the event loop.
+        while await asyncio.to_thread(getattr, self, "revision") == since:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            waiter = (loop, loop.create_future())
+            with self._changes_lock:
+                if self._snapshot.revision + self._base_revision() != since:
+                    return
+                self._waiters.append(waiter)
+            if self._snapshots is not None or self._storage is not None or self._base is not None:
+                # Writes of other workers and base catalog writes do not
+                # wake waiters; poll for them.
+                remaining = min(remaining, _POLL_INTERVAL)
+            try:
+                await asyncio.wait_for(waiter[1], remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._changes_lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+    def resolve_rule(self, stable_id: str, version: Optional[int] = None) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Resolve a rule definition for ``bl_rule`` references.
+
+        Unpinned references follow the same selection as evaluation requests:
+        the published version, or the latest draft when nothing is published.
+        """
+
+        snapshot = self._read()
+        if self._base is not None and stable_id not in snapshot.rules:
+            return self._base.resolve_rule(stable_id, version)
+        return _resolve_rule(snapshot, stable_id, version)
+
+    # ------------------------------------------------------------------
+    # Reference sets
+    # ------------------------------------------------------------------
+    def create_reference_set_version(self, payload: ReferenceSetCreateRequest) -> ReferenceSetVersion:
+        """Store a new immutable version of a named reference set."""
+
+        self._ensure_loaded()
+        with self._writing() as snapshot:
+            values = list(dict.fromkeys(payload.values))
+            entry = snapshot.reference_sets.get(payload.name)
+            latest = entry.versions[-1].version if entry is not None else 0
+            if self._storage is not None:
+                latest = max(latest, self._storage.latest_reference_set_version(payload.name))
+            reference_set = ReferenceSetVersion(
+                name=payload.name,
+                version=latest + 1,
+                description=payload.description,
+                size=len(values),
+                values=values,
+                created_at=datetime.utcnow(),
+            )
+            self._publish(_with_reference_sets(snapshot, [reference_set]), reference_sets=[reference_set])
+            return reference_set
+
+    def get_reference_set(self, name: str, version: Optional[int] = None) -> ReferenceSetVersion:
+        """Return a reference set version, defaulting to the latest one."""
+
+        entry = self._read().reference_sets.get(name)
+        if entry is None:
+            if self._base is not None:
+                return self._base.get_reference_set(name, version)
+            raise ReferenceSetNotFoundError(name)
+        versions = entry.versions
+        if version is None:
+            return versions[-1]
+        if not 1 <= version <= len(versions):
+            raise ReferenceSetNotFoundError(f"{name}:{version}")
+        return versions[version - 1]
+
+    def list_reference_sets(self) -> ReferenceSetListResponse:
+        """Return summaries for all reference sets stored in the catalog."""
+
+        reference_sets: Mapping[str, _ReferenceEntry] = self._read().reference_sets
+        if self._base is not None:
+            reference_sets = ChainMap(reference_sets, self._base._read().reference_sets)  # type: ignore[arg-type]
+        latest = [reference_sets[name].versions[-1] for name in sorted(reference_sets)]
+        summaries = [
+            ReferenceSetSummary(
+                name=reference_set.name,
+                description=reference_set.description,
+                latest_version=reference_set.version,
+                size=reference_set.size,
+            )
+            for reference_set in latest
         ]
-        version.updated_at = datetime.utcnow()
-        return version
+        return ReferenceSetListResponse(total=len(summaries), sets=summaries)
+
+    def resolve_reference_set(
+        self, name: str, version: Optional[int] = None
+    ) -> Optional[Tuple[int, FrozenSet[Any]]]:
+        """Resolve the members of a reference set for the DSL evaluator."""
+
+        snapshot = self._read()
+        if self._base is not None and name not in snapshot.reference_sets:
+            return self._base.resolve_reference_set(name, version)
+        return _resolve_reference_set(snapshot, name, version)
 
     def clear(self) -> None:
         """Utility used during testing to reset the catalog state."""
 
-        self._store.clear()
+        with self._writing():
+            if self._storage is not None:
+                self._storage.clear_catalog()
+                self._loaded = True
+            self._interner.clear()
+            self._publish(_CatalogSnapshot(), reset=True)
+
+    def close(self) -> None:
+        """Release the storage and Redis subscription of a catalog owning them, such as a tenant's.
+
+        Shared backends are closed by whoever opened them; the catalog must
+        not be used afterwards.
+        """
+
+        if self._storage is not None:
+            self._storage.close()
+        if self._redis is not None:
+            self._redis.close()
+
+    # ------------------------------------------------------------------
+    # Exports
+    # ------------------------------------------------------------------
+    def export_snapshot(self, path: str, include_compiled: bool = False) -> int:
+        """Write every rule and reference set version to a binary export.
+
+        With ``include_compiled`` the compiled forms of the definitions are
+        added so an importing instance starts with a warm evaluator cache.
+        Returns the number of exported rule versions.
+        """
 
+        snapshot = self._read()
+        base = self._base._read() if self._base is not None else None
+        return self._export(path, snapshot, base, None, include_compiled)
 
-catalog_service = RuleCatalogService()
+    def export_changes(
+        self, path: str, since: Optional[CatalogExportMark] = None, include_compiled: bool = False
+    ) -> CatalogExportMark:
+        """Write the rules and reference sets changed since the export marked ``since``.
+
+        Every version of a changed rule or reference set is written, so
+        importing the file with ``merge=True`` into a catalog holding the
+        earlier export replaces those entries. Without ``since``, or when the
+        changes cannot be told (entries were removed or the catalog was
+        replaced), everything is written as by :meth:`export_snapshot` and the
+        returned mark is ``complete``.
+        """
+
+        snapshot = self._read()
+        base = self._base._read() if self._base is not None else None
+        changes: Optional[Tuple[Set[str], Set[str]]] = None
+        if since is not None:
+            layers = [(since.snapshot, snapshot)]
+            if base is not None and since.base is not None:
+                layers.append((since.base, base))
+            changes = (set(), set())
+            for previous, current in layers:
+                stable_ids = _changed_keys(previous.rules, current.rules)
+                names = _changed_keys(previous.reference_sets, current.reference_sets)
+                if stable_ids is None or names is None:
+                    changes = None
+                    break
+                changes[0].update(stable_ids)
+                changes[1].update(names)
+        self._export(path, snapshot, base, changes, include_compiled)
+        return CatalogExportMark(snapshot=snapshot, base=base, complete=changes is None)
+
+    def _export(
+        self,
+        path: str,
+        snapshot: _CatalogSnapshot,
+        base: Optional[_CatalogSnapshot],
+        changes: Optional[Tuple[Set[str], Set[str]]],
+        include_compiled: bool,
+    ) -> int:
+        """Write the entries named in ``changes``, or every entry, returning the number of rule versions."""
+
+        rules: Mapping[str, _RuleEntry] = snapshot.rules
+        stable_ids: Sequence[str] = snapshot.sorted_ids
+        sets: Mapping[str, _ReferenceEntry] = snapshot.reference_sets
+        if base is not None:
+            # Namespaces export everything they resolve, inherited entries included.
+            rules = ChainMap(snapshot.rules, base.rules)  # type: ignore[arg-type]
+            stable_ids = self._merged_sorted_ids(snapshot, base)
+            sets = ChainMap(snapshot.reference_sets, base.reference_sets)  # type: ignore[arg-type]
+        names: Iterable[str] = sorted(sets)
+        if changes is not None:
+            stable_ids, names = sorted(changes[0]), sorted(changes[1])
+        versions = [version for stable_id in stable_ids for _, version in sorted(rules[stable_id].versions.items())]
+        reference_sets = [reference_set for name in names for reference_set in sets[name].versions]
+        compiled = None
+        if include_compiled:
+            logic = get_json_logic()
+            unique = {
+                id(entry[1]): entry for version in versions for entry in logic.compiled_artifacts(version.definition)
+            }
+            compiled = list(unique.values())
+        write_catalog_export(path, versions, reference_sets, compiled)
+        return len(versions)
+
+    def import_snapshot(self, path: str, merge: bool = False) -> int:
+        """Replace the catalog with the content of an export.
+
+        When the checksum matches, versions are rebuilt without validation and
+        any compiled artefacts are installed in the evaluator cache. Otherwise
+        every version is validated as if it was created through the API and
+        the compiled section is ignored. The whole catalog is swapped in with
+        a single write. With ``merge``, only the rules and reference sets the
+        export holds are replaced, as written by :meth:`export_changes`; this
+        is limited to catalogs kept in memory. Returns the number of imported
+        rule versions.
+        """
+
+        if merge and (self._storage is not None or self._redis is not None or self._snapshots is not None):
+            raise ValueError("Exports can only be merged into catalogs kept in memory")
+        export = read_catalog_export(path)
+        if export.verified:
+            versions = [construct_rule_version(record) for record in export.rules]
+            reference_sets = [construct_reference_set(record) for record in export.reference_sets]
+        else:
+            try:
+                versions = [RuleVersion.model_validate(record) for record in export.rules]
+                reference_sets = [ReferenceSetVersion.model_validate(record) for record in export.reference_sets]
+            except ValidationError as exc:
+                raise ValueError(f"{path} holds invalid catalog data: {describe_validation_error(exc)}") from exc
+
+        if self._redis is not None:
+            self._redis.subscribe(self._invalidate)
+        with self._writing() as current:
+            if merge:
+                stable_ids = {version.stable_id for version in versions}
+                names = {reference_set.name for reference_set in reference_sets}
+                snapshot = _without_entries(current, stable_ids, names)
+            else:
+                self._interner.clear()
+                snapshot = _CatalogSnapshot()
+            snapshot = _with_reference_sets(_with_versions(snapshot, versions), reference_sets)
+            if export.verified:
+                if export.compiled is not None:
+                    logic = get_json_logic()
+                    for operator, args, artifact in load_compiled_artifacts(export.compiled, versions):
+                        logic.preload_artifact(operator, args, artifact)
+            resolver = _SnapshotResolver(snapshot)
+
+            def commit(interned: List[Tuple[Any, str]]) -> None:
+                for version, (definition, _) in zip(versions, interned):
+                    version.definition = definition
+                    try:
+                        self._validator.validate(definition, resolver=resolver, stable_id=version.stable_id)
+                    except EvaluationError as exc:
+                        raise ValueError(f"{path}: rule '{version.stable_id}' v{version.version}: {exc}") from exc
+                if self._storage is not None:
+                    self._storage.clear_catalog()
+                self._loaded = True
+                self._publish(snapshot, versions=versions, reference_sets=reference_sets, reset=not merge)
+
+            # Verified exports are published as written; others are interned and validated first.
+            unverified = [] if export.verified else [version.definition for version in versions]
+            self._interner.intern_many(unverified, before_commit=commit)
+        return len(versions)
+
+    # ------------------------------------------------------------------
+    # Snapshots and storage
+    # ------------------------------------------------------------------
+    def _base_revision(self) -> int:
+        return self._base.revision if self._base is not None else 0
+
+    def _merged_sorted_ids(self, snapshot: _CatalogSnapshot, base: _CatalogSnapshot) -> Tuple[str, ...]:
+        """Return the stable ids of a namespace and its base, built once per pair of revisions."""
+
+        key = (snapshot.revision, base.revision)
+        merged = self._merged_ids
+        if merged is None or merged[0] != key:
+            inherited = (stable_id for stable_id in base.sorted_ids if stable_id not in snapshot.rules)
+            merged = self._merged_ids = (key, tuple(heapq.merge(snapshot.sorted_ids, inherited)))
+        return merged[1]
+
+    def _read(self) -> _CatalogSnapshot:
+        self._ensure_loaded()
+        if self._snapshots is not None:
+            self._sync()
+        elif self._storage is not None and self._redis is None:
+            self._poll_storage()
+        return self._snapshot
+
+    @contextmanager
+    def _writing(self) -> Iterator[_CatalogSnapshot]:
+        """Serialize a write and yield the snapshot it must be based on."""
+
+        with self._write_lock:
+            if self._snapshots is not None:
+                with self._snapshots.lock():
+                    self._sync()
+                    yield self._snapshot
+            elif self._redis is not None:
+                with self._redis.lock():
+                    if self._redis.revision() != self._snapshot.revision:
+                        # Writes from other instances have not reached us yet.
+                        self._reload_from_redis()
+                    yield self._snapshot
+            elif self._storage is not None:
+                with self._storage.transaction():
+                    if self._storage.revision() != self._storage_revision:
+                        # Other workers sharing the storage wrote since we loaded it.
+                        self._reload_from_storage()
+                    yield self._snapshot
+                    self._storage_revision = self._storage.revision()
+            else:
+                yield self._snapshot
+
+    def _publish(
+        self,
+        snapshot: _CatalogSnapshot,
+        versions: List[RuleVersion] | Tuple[RuleVersion, ...] = (),
+        reference_sets: List[ReferenceSetVersion] | Tuple[ReferenceSetVersion, ...] = (),
+        reset: bool = False,
+        stored_revision: Optional[int] = None,
+    ) -> None:
+        """Install ``snapshot``; ``stored_revision`` is the storage revision of one reloaded from storage."""
+
+        if self._max_rule_versions and versions:
+            held = sum(len(entry.versions) for entry in snapshot.rules.values())
+            if held > self._max_rule_versions:
+                raise CatalogQuotaExceededError(
+                    f"The catalog is limited to {self._max_rule_versions} rule versions"
+                )
+        # Revisions keep increasing across clear() so resolver caches never
+        # mistake a rebuilt catalog for the one they were filled from.
+        revision = self._snapshot.revision + 1
+        if self._storage is not None:
+            if versions:
+                created: List[RuleVersion] = []
+                updated: List[RuleVersion] = []
+                for version in versions:
+                    entry = self._snapshot.rules.get(version.stable_id)
+                    stored = not reset and entry is not None and version.version in entry.versions
+                    (updated if stored else created).append(version)
+                self._storage.save_rule_versions(created, updated)
+            for reference_set in reference_sets:
+                self._storage.save_reference_set(reference_set)
+            if self._snapshots is None and self._redis is None:
+                # Every worker and restart sharing the database names its content by the same
+                # revision; reloading it, which writes nothing, keeps the revision as is.
+                revision = self._storage.revision() if stored_revision is None else stored_revision
+        if self._redis is not None:
+            self._redis.commit(revision, versions, reference_sets, reset=reset)
+        if self._snapshots is not None:
+            self._snapshots.write(
+                revision,
+                {
+                    "rules": encode_section(snapshot.rules, _encode_rule_entry, _rule_meta),
+                    "reference_sets": encode_section(
+                        snapshot.reference_sets, _encode_reference_entry, lambda _: None
+                    ),
+                },
+            )
+            snapshot = self._open_generation(revision, snapshot)
+        with self._sync_lock:
+            previous, self._snapshot = self._snapshot.revision, replace(snapshot, revision=revision)
+        if revision == previous:
+            return
+        # The change log is kept in (composite) revisions as reported to clients.
+        offset = self._base_revision()
+        self._record_change(
+            previous + offset, revision + offset, None if reset else [version.stable_id for version in versions]
+        )
+
+    def _record_change(self, previous: int, revision: int, stable_ids: Optional[Iterable[str]]) -> None:
+        """Log the stable ids changed by an installed snapshot and wake change feed waiters."""
+
+        with self._changes_lock:
+            self._changes.append((previous, revision, None if stable_ids is None else frozenset(stable_ids)))
+            waiters, self._waiters = self._waiters, []
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # The waiting request's event loop is gone.
+                pass
+
+    def _sync(self) -> None:
+        """Switch to the latest shared generation if another worker published one."""
+
+        assert self._snapshots is not None
+        while True:
+            generation = self._snapshots.generation
+            if generation <= self._snapshot.revision:
+                return
+            try:
+                snapshot = self._open_generation(generation, self._snapshot)
+            except FileNotFoundError:
+                # Pruned by a newer publish while we were catching up; retry.
+                continue
+            with self._sync_lock:
+                if generation <= self._snapshot.revision:
+                    continue
+                previous, self._snapshot = self._snapshot, snapshot
+            rules = snapshot.rules
+            changed = rules.changed_keys(previous.rules) if isinstance(rules, MappedSection) else None
+            self._record_change(previous.revision, generation, changed)
+
+    def _open_generation(self, generation: int, previous: _CatalogSnapshot) -> _CatalogSnapshot:
+        assert self._snapshots is not None
+        mapped = self._snapshots.open(generation)
+        rule_index = mapped.section("rules")
+        label_index: Dict[Tuple[str, str], Set[str]] = {}
+        for stable_id, (_, _, _, labels) in rule_index.items():
+            for label in labels.items():
+                label_index.setdefault(label, set()).add(stable_id)
+        return _CatalogSnapshot(
+            revision=generation,
+            rules=MappedSection(mapped.buffer, rule_index, _decode_rule_entry, previous.rules),
+            sorted_ids=tuple(sorted(rule_index)),
+            label_index={label: frozenset(ids) for label, ids in label_index.items()},
+            reference_sets=MappedSection(
+                mapped.buffer,
+                mapped.section("reference_sets"),
+                _decode_reference_entry,
+                previous.reference_sets,
+            ),
+        )
+
+    def _reload_from_redis(self, message: Optional[Invalidation] = None) -> None:
+        """Refresh the entries named in ``message``, or the whole near-cache, from Redis."""
+
+        assert self._redis is not None
+        stable_ids = message.rules if message is not None else None
+        reference_sets = message.reference_sets if message is not None else None
+        revision, versions, sets = self._redis.load(stable_ids, reference_sets)
+        if message is not None:
+            # Later writes may already be visible; their own messages reload
+            # the entries they touched, so only advance to this message.
+            revision = message.revision
+        for version in versions:
+            # Interning keeps unchanged subtrees, and their compiled forms, shared.
+            version.definition, _ = self._interner.intern(version.definition)
+        if message is None:
+            snapshot = _CatalogSnapshot()
+        else:
+            # Reference set versions are appended on load, so drop the stale entries first.
+            stale = set(reference_sets or ())
+            snapshot = replace(
+                self._snapshot,
+                reference_sets={
+                    name: entry for name, entry in self._snapshot.reference_sets.items() if name not in stale
+                },
+            )
+        snapshot = _with_reference_sets(_with_versions(snapshot, versions), sets)
+        with self._sync_lock:
+            previous = self._snapshot.revision
+            self._snapshot = replace(snapshot, revision=revision)
+        self._record_change(previous, revision, stable_ids)
+
+    def _invalidate(self, message: Invalidation) -> None:
+        """Apply an invalidation received from another instance."""
+
+        with self._write_lock:
+            current = self._snapshot.revision
+            if message.revision <= current and not message.reset:
+                return
+            if message.reset or message.revision != current + 1:
+                with self._redis.lock():
+                    self._reload_from_redis()
+            else:
+                self._reload_from_redis(message)
+
+    def _poll_storage(self) -> None:
+        """Reload the cache if another worker wrote to the storage, checked at most every poll interval."""
+
+        assert self._storage is not None
+        now = time.monotonic()
+        if now - self._storage_checked < _POLL_INTERVAL:
+            return
+        self._storage_checked = now
+        if self._storage.revision() == self._storage_revision:
+            return
+        # Reload outside a storage transaction, so readers never wait for other workers' writes.
+        with self._write_lock:
+            if self._storage.revision() != self._storage_revision:
+                self._reload_from_storage()
+
+    def _reload_from_storage(self) -> None:
+        """Load the stored catalog, read again if another worker wrote while it was read."""
+
+        assert self._storage is not None
+        while True:
+            revision = self._storage.revision()
+            versions = self._storage.load_rule_versions()
+            reference_sets = self._storage.load_reference_sets()
+            if self._storage.revision() == revision:
+                break
+
+        def commit(interned: List[Tuple[Any, str]]) -> None:
+            # Stored definitions were validated when written; only re-intern them.
+            for version, (definition, _) in zip(versions, interned):
+                version.definition = definition
+            loaded = _with_versions(_CatalogSnapshot(), versions)
+            self._publish(_with_reference_sets(loaded, reference_sets), reset=True, stored_revision=revision)
+            self._storage_revision = revision
+
+        self._interner.intern_many([version.definition for version in versions], before_commit=commit)
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        if self._redis is not None:
+            # Subscribe first so no write can slip between the load and the subscription.
+            self._redis.subscribe(self._invalidate)
+        with self._writing() as snapshot:
+            if self._loaded:
+                return
+            self._loaded = True
+            if self._snapshots is None:
+                # _writing() already brought the near-cache or storage cache up to date.
+                return
+            if snapshot.revision:
+                # Another worker already published the shared catalog.
+                return
+            self._reload_from_storage()
+
+
+def _wake(waiter: "asyncio.Future[None]") -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def _select_version(
+    snapshot: _CatalogSnapshot,
+    stable_id: str,
+    version: Optional[int],
+    prefer_latest: bool,
+) -> RuleVersion:
+    entry = snapshot.rules.get(stable_id)
+    if entry is None or entry.latest is None:
+        raise RuleNotFoundError(stable_id)
+
+    if version is not None:
+        match = entry.versions.get(version)
+        if match is None:
+            raise RuleVersionNotFoundError(f"{stable_id}:{version}")
+        return match
+
+    if prefer_latest:
+        return entry.latest
+
+    return entry.published or entry.latest
+
+
+def _resolve_rule(
+    snapshot: _CatalogSnapshot, stable_id: str, version: Optional[int]
+) -> Optional[Tuple[int, Dict[str, Any]]]:
+    try:
+        rule = _select_version(snapshot, stable_id, version, prefer_latest=False)
+    except (RuleNotFoundError, RuleVersionNotFoundError):
+        return None
+    return rule.version, rule.definition
+
+
+def _resolve_reference_set(
+    snapshot: _CatalogSnapshot, name: str, version: Optional[int]
+) -> Optional[Tuple[int, FrozenSet[Any]]]:
+    entry = snapshot.reference_sets.get(name)
+    if entry is None or (version is not None and not 1 <= version <= len(entry.versions)):
+        return None
+    resolved = len(entry.versions) if version is None else version
+    return resolved, entry.members[resolved - 1]
+
+
+class _SnapshotResolver:
+    """Resolve references against a staged, not yet published snapshot and its base catalog."""
+
+    def __init__(self, snapshot: _CatalogSnapshot, base: Optional[RuleCatalogService] = None) -> None:
+        self._snapshot = snapshot
+        self._base = base
+
+    @property
+    def revision(self) -> int:
+        return self._snapshot.revision + (self._base.revision if self._base is not None else 0)
+
+    def resolve_rule(self, stable_id: str, version: Optional[int] = None) -> Optional[Tuple[int, Dict[str, Any]]]:
+        if self._base is not None and stable_id not in self._snapshot.rules:
+            return self._base.resolve_rule(stable_id, version)
+        return _resolve_rule(self._snapshot, stable_id, version)
+
+    def resolve_reference_set(
+        self, name: str, version: Optional[int] = None
+    ) -> Optional[Tuple[int, FrozenSet[Any]]]:
+        if self._base is not None and name not in self._snapshot.reference_sets:
+            return self._base.resolve_reference_set(name, version)
+        return _resolve_reference_set(self._snapshot, name, version)
+
+
+def _stage_import(
+    snapshot: _CatalogSnapshot,
+    accepted: Sequence[Tuple[int, RuleCreateRequest, bool]],
+    definitions: Dict[int, Tuple[Any, str]],
+    publish: bool,
+) -> Tuple[_CatalogSnapshot, List[RuleVersion], Dict[int, RuleVersion]]:
+    """Build the versions of a bulk import and the snapshot containing them."""
+
+    timestamp = datetime.utcnow()
+    created: Dict[int, RuleVersion] = {}
+    last_created: Dict[str, int] = {}
+    next_version: Dict[str, int] = {}
+    for index, payload, _ in accepted:
+        stable_id = payload.stable_id
+        if stable_id not in next_version:
+            entry = snapshot.rules.get(stable_id)
+            next_version[stable_id] = entry.latest.version + 1 if entry and entry.latest else 1
+        definition, definition_hash = definitions[index]
+        created[index] = RuleVersion(
+            stable_id=stable_id,
+            version=next_version[stable_id],
+            name=payload.name,
+            description=payload.description,
+            labels=deepcopy(payload.labels),
+            definition=definition,
+            definition_hash=definition_hash,
+            status="draft",
+            created_at=timestamp,
+            updated_at=timestamp,
+            revision_notes=payload.revision_notes,
+            regression_tests=[RegressionCase.model_validate(case.model_dump()) for case in payload.regression_tests],
+        )
+        # Validation copied the definition; keep the interned, shared one.
+        created[index].definition = definition
+        next_version[stable_id] += 1
+        last_created[stable_id] = index
+
+    changed: List[RuleVersion] = []
+    if publish:
+        for stable_id, index in last_created.items():
+            entry = snapshot.rules.get(stable_id)
+            if entry is not None and entry.published is not None:
+                changed.append(
+                    entry.published.model_copy(
+                        update={"status": "draft", "published_at": None, "updated_at": timestamp}
+                    )
+                )
+            created[index] = created[index].model_copy(update={"status": "published", "published_at": timestamp})
+    changed.extend(created.values())
+    return _with_versions(snapshot, changed), changed, created
+
+
+def _with_versions(snapshot: _CatalogSnapshot, versions: Iterable[RuleVersion]) -> _CatalogSnapshot:
+    """Return a copy of ``snapshot`` with ``versions`` added or replaced."""
+
+    rules: Dict[str, _RuleEntry] = {}
+    label_index = dict(snapshot.label_index)
+    new_ids: List[str] = []
+    for version in versions:
+        entry = rules.get(version.stable_id) or snapshot.rules.get(version.stable_id)
+        if entry is None:
+            entry = _RuleEntry()
+            new_ids.append(version.stable_id)
+        latest = entry.latest
+        if latest is None or version.version >= latest.version:
+            if latest is not None:
+                _unindex_labels(label_index, version.stable_id, latest.labels)
+            _index_labels(label_index, version.stable_id, version.labels)
+            latest = version
+        published = entry.published
+        if version.status == "published":
+            published = version
+        elif published is not None and published.version == version.version:
+            published = None
+        entry = _RuleEntry(
+            versions={**entry.versions, version.version: version},
+            latest=latest,
+            published=published,
+        )
+        rules[version.stable_id] = replace(entry, summary=_summarise(entry))
+
+    sorted_ids = snapshot.sorted_ids
+    if new_ids:
+        sorted_ids = tuple(sorted(set(sorted_ids).union(new_ids)))
+    return replace(snapshot, rules=snapshot.rules | rules, sorted_ids=sorted_ids, label_index=label_index)
+
+
+def _with_reference_sets(
+    snapshot: _CatalogSnapshot, reference_sets: Iterable[ReferenceSetVersion]
+) -> _CatalogSnapshot:
+    """Return a copy of ``snapshot`` with new reference set versions appended."""
+
+    entries: Dict[str, _ReferenceEntry] = {}
+    for reference_set in reference_sets:
+        entry = entries.get(reference_set.name) or snapshot.reference_sets.get(reference_set.name) or _ReferenceEntry()
+        entries[reference_set.name] = _ReferenceEntry(
+            versions=(*entry.versions, reference_set),
+            members=(*entry.members, frozenset(reference_set.values)),
+        )
+    return replace(snapshot, reference_sets=snapshot.reference_sets | entries)
+
+
+def _without_entries(snapshot: _CatalogSnapshot, stable_ids: Set[str], names: Set[str]) -> _CatalogSnapshot:
+    """Return a copy of ``snapshot`` without the rules ``stable_ids`` and reference sets ``names``."""
+
+    label_index = dict(snapshot.label_index)
+    for stable_id in stable_ids:
+        entry = snapshot.rules.get(stable_id)
+        if entry is not None and entry.latest is not None:
+            _unindex_labels(label_index, stable_id, entry.latest.labels)
+    return replace(
+        snapshot,
+        rules={key: entry for key, entry in snapshot.rules.items() if key not in stable_ids},
+        sorted_ids=tuple(stable_id for stable_id in snapshot.sorted_ids if stable_id not in stable_ids),
+        label_index=label_index,
+        reference_sets={key: entry for key, entry in snapshot.reference_sets.items() if key not in names},
+    )
+
+
+def _changed_keys(previous: Mapping[str, Any], current: Mapping[str, Any]) -> Optional[Set[str]]:
+    """Return the keys whose entries differ between two snapshots; ``None`` when keys were removed.
+
+    Writers only replace the entries they change, so unchanged entries are
+    the very same objects in both snapshots.
+    """
+
+    if isinstance(current, MappedSection):
+        return current.changed_keys(previous)
+    if any(key not in current for key in previous):
+        return None
+    return {key for key, entry in current.items() if previous.get(key) is not entry}
+
+
+def _encode_rule_entry(entry: _RuleEntry) -> bytes:
+    return _encode_versions(entry.versions.values())
+
+
+def _encode_reference_entry(entry: _ReferenceEntry) -> bytes:
+    return _encode_versions(entry.versions)
+
+
+def _encode_versions(versions: Iterable[Any]) -> bytes:
+    payload = [version.model_dump(mode="json") for version in versions]
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _rule_meta(entry: _RuleEntry) -> Dict[str, str]:
+    assert entry.latest is not None
+    return entry.latest.labels
+
+
+def _decode_rule_entry(blob: bytes) -> _RuleEntry:
+    versions = {data["version"]: RuleVersion.model_validate(data) for data in json.loads(blob)}
+    latest = versions[max(versions)]
+    published = next((version for version in versions.values() if version.status == "published"), None)
+    entry = _RuleEntry(versions=versions, latest=latest, published=published)
+    return replace(entry, summary=_summarise(entry))
+
+
+def _decode_reference_entry(blob: bytes) -> _ReferenceEntry:
+    versions = tuple(ReferenceSetVersion.model_validate(data) for data in json.loads(blob))
+    return _ReferenceEntry(versions=versions, members=tuple(frozenset(version.values) for version in versions))
+
+
+def _summarise(entry: _RuleEntry) -> RuleSummary:
+    latest = entry.latest
+    assert latest is not None
+    return RuleSummary(
+        stable_id=latest.stable_id,
+        name=latest.name,
+        description=latest.description,
+        labels=deepcopy(latest.labels),
+        latest_version=latest.version,
+        published_version=entry.published.version if entry.published else None,
+        status=latest.status,
+    )
+
+
+def _index_labels(index: Dict[Tuple[str, str], FrozenSet[str]], stable_id: str, labels: Dict[str, str]) -> None:
+    for label in labels.items():
+        index[label] = index.get(label, frozenset()) | {stable_id}
+
+
+def _unindex_labels(index: Dict[Tuple[str, str], FrozenSet[str]], stable_id: str, labels: Dict[str, str]) -> None:
+    for label in labels.items():
+        members = index.get(label, frozenset()) - {stable_id}
+        if members:
+            index[label] = members
+        else:
+            index.pop(label, None)
+
+
+def _match_labels(snapshot: _CatalogSnapshot, labels: Dict[str, str]) -> Set[str]:
+    postings = [snapshot.label_index.get(label, frozenset()) for label in labels.items()]
+    postings.sort(key=len)
+    matches = set(postings[0])
+    for posting in postings[1:]:
+        matches &= posting
+    return matches
+
+
+_catalog_service: Optional[RuleCatalogService] = None
+_catalog_service_lock = threading.Lock()
 
 
 def get_catalog_service() -> RuleCatalogService:
-    """Return the singleton catalog service used by the API layer."""
+    """Return the singleton catalog service used by the API layer.
 
-    return catalog_service
+    It is built on first use, so importing this module never opens storage,
+    snapshot files or Redis connections.
+    """
+
+    global _catalog_service
+    with _catalog_service_lock:
+        if _catalog_service is None:
+            _catalog_service = RuleCatalogService(
+                storage=get_storage(), snapshots=get_snapshot_store(), redis=get_redis_catalog_store()
+            )
+        return _catalog_service
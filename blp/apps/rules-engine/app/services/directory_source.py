@@ -0,0 +1,212 @@
+"""Load and hot reload catalog rules from a directory of JSON files.
+
+Every ``*.json`` file below the root holds one ``RuleCreateRequest`` payload;
+``stable_id`` defaults to the file name without its extension. Files are
+read in parallel and parsed once per content change: a cache keyed by path
+remembers the modification time, size and digest of every file, so a scan
+of an unchanged tree only costs one ``stat`` per file.
+
+Changed rules are handed to :meth:`RuleCatalogService.import_rules` with
+``publish=True``, which validates them and swaps them in with a single
+catalog write. A file that fails to parse or validate is reported and
+skipped; the version published before keeps serving evaluations.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.dsl.errors import EvaluationError
+from app.dsl.hashing import structural_hash
+from app.models.schemas import RuleCreateRequest
+from app.services.bulk import BulkItem, describe_validation_error
+from app.services.catalog import RuleCatalogService, RuleNotFoundError, get_catalog_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CachedFile:
+    mtime_ns: int
+    size: int
+    digest: str
+    item: BulkItem
+
+
+@dataclass
+class DirectoryScanReport:
+    """Outcome of a single directory scan."""
+
+    loaded: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    removed: List[str] = field(default_factory=list)
+
+
+class DirectoryRuleSource:
+    """Keep the catalog in sync with a directory tree of rule files."""
+
+    def __init__(
+        self,
+        root: str,
+        catalog: RuleCatalogService | None = None,
+        poll_interval: float = 2.0,
+        workers: int = 8,
+    ) -> None:
+        self._root = Path(root)
+        self._catalog = catalog or get_catalog_service()
+        self._poll_interval = poll_interval
+        self._workers = workers
+        self._cache: Dict[Path, _CachedFile] = {}
+        # Files rejected by validation are retried when other files change,
+        # since they may depend on a rule defined elsewhere.
+        self._rejected: Dict[Path, str] = {}
+        self._scan_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def scan(self) -> DirectoryScanReport:
+        """Load every new or modified file and publish the rules that changed."""
+
+        with self._scan_lock:
+            report = DirectoryScanReport()
+            paths = sorted(self._root.rglob("*.json"))
+            with ThreadPoolExecutor(max_workers=self._workers) as pool:
+                refreshed = list(pool.map(self._refresh, paths))
+
+            for path in set(self._cache) - set(paths):
+                # The catalog keeps every version; the last published one stays live.
+                del self._cache[path]
+                self._rejected.pop(path, None)
+                report.removed.append(str(path))
+
+            changed = [path for path, updated in zip(paths, refreshed) if updated]
+            if changed:
+                changed.extend(path for path in self._rejected if path not in changed)
+            candidates: List[Tuple[Path, RuleCreateRequest]] = []
+            owners: Dict[str, Path] = {}
+            for path in paths:
+                item = self._cache[path].item
+                if isinstance(item, RuleCreateRequest):
+                    owner = owners.setdefault(item.stable_id, path)
+                    if owner != path and path in changed:
+                        report.failed[str(path)] = f"Duplicate stable_id '{item.stable_id}', also defined in {owner}"
+                        continue
+                if path not in changed:
+                    continue
+                if isinstance(item, str):
+                    report.failed[str(path)] = item
+                elif not self._is_current(item):
+                    candidates.append((path, item))
+
+            if candidates:
+                response = self._catalog.import_rules([item for _, item in candidates], publish=True)
+                for (path, item), result in zip(candidates, response.results):
+                    if result.status == "failed":
+                        report.failed[str(path)] = result.error or "Invalid rule"
+                    else:
+                        self._rejected.pop(path, None)
+                        report.loaded.append(item.stable_id)
+            for path, error in report.failed.items():
+                self._rejected[Path(path)] = error
+                logger.error("Skipping rule file %s: %s", path, error)
+            if report.loaded:
+                logger.info("Published %d rule(s) from %s", len(report.loaded), self._root)
+            return report
+
+    def start(self) -> DirectoryScanReport:
+        """Load the directory and keep polling it from a background thread."""
+
+        report = self.scan()
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._poll, name="rules-directory", daemon=True)
+            self._thread.start()
+        return report
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self._poll_interval):
+            try:
+                self.scan()
+            except Exception:
+                # Never let a scan failure stop hot reloading.
+                logger.exception("Scanning rule directory %s failed", self._root)
+
+    def _refresh(self, path: Path) -> bool:
+        """Update the cache entry of ``path`` and return whether its content changed."""
+
+        stat = path.stat()
+        cached = self._cache.get(path)
+        if cached is not None and (cached.mtime_ns, cached.size) == (stat.st_mtime_ns, stat.st_size):
+            return False
+        content = path.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()
+        if cached is not None and cached.digest == digest:
+            cached.mtime_ns, cached.size = stat.st_mtime_ns, stat.st_size
+            return False
+        self._cache[path] = _CachedFile(stat.st_mtime_ns, stat.st_size, digest, _parse(path, content))
+        return True
+
+    def _is_current(self, payload: RuleCreateRequest) -> bool:
+        """Return whether the published version already matches ``payload``."""
+
+        try:
+            current = self._catalog.get_rule_version(payload.stable_id)
+        except RuleNotFoundError:
+            return False
+        try:
+            definition_hash = structural_hash(payload.definition)
+        except EvaluationError:
+            return False
+        return current.status == "published" and (
+            current.definition_hash,
+            current.name,
+            current.description,
+            current.labels,
+            current.regression_tests,
+        ) == (definition_hash, payload.name, payload.description, payload.labels, payload.regression_tests)
+
+
+def _parse(path: Path, content: bytes) -> BulkItem:
+    try:
+        data = json.loads(content)
+    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+        return f"Invalid JSON: {exc}"
+    if not isinstance(data, dict):
+        return "Expected a JSON object holding one rule"
+    data.setdefault("stable_id", path.stem)
+    try:
+        return RuleCreateRequest.model_validate(data)
+    except ValidationError as exc:
+        return describe_validation_error(exc)
+
+
+_directory_source: Optional[DirectoryRuleSource] = None
+
+
+def get_directory_source() -> Optional[DirectoryRuleSource]:
+    """Return the directory source configured in ``Settings`` or ``None``."""
+
+    global _directory_source
+    if not settings.rules_directory:
+        return None
+    if _directory_source is None:
+        _directory_source = DirectoryRuleSource(
+            settings.rules_directory, poll_interval=settings.rules_directory_poll_interval
+        )
+    return _directory_source
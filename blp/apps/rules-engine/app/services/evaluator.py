@@ -2,12 +2,41 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, List
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, Union
 
-from app.dsl.operators import ExtendedJsonLogic
+from app.core.config import settings
+from app.dsl.errors import EvaluationError
+from app.dsl.operators import DefinitionResolver, ExtendedJsonLogic, get_json_logic
+from app.dsl.profiling import EvaluationProfile, Stack
 from app.models.schemas import TraceStep
 
+T = TypeVar("T")
+
+EXECUTOR_BACKENDS = ("inline", "thread", "process")
+
+# Superseded catalog exports kept for process workers; they may still be queued.
+_EXPORTS_KEPT = 4
+
+# Incremental exports applied on top of a complete one before a new complete export.
+_DELTAS_KEPT = 16
+
+# A complete catalog export followed by the incremental exports to merge into it, in order.
+CatalogExport = Tuple[str, Tuple[str, ...]]
+
+# Catalogs each process worker keeps loaded, one per namespace in use.
+_WORKER_CATALOGS = 8
+
 
 @dataclass
 class EvaluationResult:
@@ -17,18 +46,176 @@ class EvaluationResult:
     trace: List[TraceStep]
 
 
+@dataclass
+class RawEvaluationResult:
+    """Evaluation result with the trace as produced by the evaluator."""
+
+    result: Any
+    trace: List[Dict[str, Any]]
+
+
 class EvaluatorService:
-    """Wrapper around :class:`ExtendedJsonLogic` providing structured results."""
+    """Wrapper around :class:`ExtendedJsonLogic` providing structured results.
+
+    The synchronous methods evaluate on the calling thread. Async callers
+    await :meth:`evaluate_raw_async` and :meth:`run`, which hand the work to
+    the configured execution backend so that the event loop stays free:
+
+    * ``inline`` runs everything on the calling thread;
+    * ``thread`` runs on a dedicated pool of ``workers`` threads, separate
+      from the server's default threadpool;
+    * ``process`` evaluates in a pool of ``workers`` processes, using every
+      core without contending on the GIL. Workers resolve rule and reference
+      set references from a binary catalog export with compiled decision
+      tables; when the catalog revision changes, only the changed rules and
+      reference sets are exported and merged into it. Other work
+      passed to :meth:`run` uses a thread pool of the same size.
+    """
+
+    def __init__(
+        self,
+        evaluator: ExtendedJsonLogic | None = None,
+        executor: str = "inline",
+        workers: int = 0,
+    ) -> None:
+        if executor not in EXECUTOR_BACKENDS:
+            raise ValueError(f"Unsupported evaluation executor '{executor}'")
+        self._dsl = evaluator or get_json_logic()
+        self._executor = executor
+        self._workers = workers or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._exports: Optional[_CatalogExports] = None
+
+    @property
+    def concurrency(self) -> int:
+        """Number of evaluations the backend runs at the same time."""
 
-    def __init__(self, evaluator: ExtendedJsonLogic | None = None) -> None:
-        self._dsl = evaluator or ExtendedJsonLogic()
+        return 1 if self._executor == "inline" else self._workers
 
-    def evaluate(self, logic: Dict[str, Any], context: Dict[str, Any]) -> EvaluationResult:
+    def evaluate(
+        self,
+        logic: Dict[str, Any],
+        context: Dict[str, Any],
+        resolver: Optional[DefinitionResolver] = None,
+    ) -> EvaluationResult:
         """Evaluate the expression and convert traces into Pydantic models."""
 
-        value, raw_trace = self._dsl.evaluate(logic, context)
-        trace = self._convert_trace(raw_trace)
-        return EvaluationResult(result=value, trace=trace)
+        raw = self.evaluate_raw(logic, context, resolver=resolver)
+        return EvaluationResult(result=raw.result, trace=self._convert_trace(raw.trace))
+
+    def evaluate_raw(
+        self,
+        logic: Dict[str, Any],
+        context: Dict[str, Any],
+        resolver: Optional[DefinitionResolver] = None,
+        profile: Optional[EvaluationProfile] = None,
+        transient: bool = False,
+    ) -> RawEvaluationResult:
+        """Evaluate the expression and keep the trace as plain dictionaries.
+
+        Used by routes that encode the trace straight to JSON; pass the trace
+        through :func:`trace_payload` to give it the ``TraceStep`` shape.
+        With a ``profile``, the time and calls of every node are added to it.
+        Request scoped logic is evaluated ``transient`` so it is not cached.
+        """
+
+        value, trace = self._dsl.evaluate(logic, context, resolver=resolver, profile=profile, transient=transient)
+        return RawEvaluationResult(result=value, trace=trace)
+
+    async def evaluate_raw_async(
+        self,
+        logic: Dict[str, Any],
+        context: Dict[str, Any],
+        resolver: Optional[DefinitionResolver] = None,
+        profile: Optional[EvaluationProfile] = None,
+        transient: bool = False,
+        rule: Optional[Tuple[str, int]] = None,
+    ) -> RawEvaluationResult:
+        """Evaluate like :meth:`evaluate_raw` on the execution backend.
+
+        ``rule`` names the stable id and version of the catalog rule ``logic``
+        is the definition of. Process workers then evaluate the definition of
+        their own catalog, whose compiled forms stay cached, instead of a copy.
+        """
+
+        # Process workers only know the shared evaluator and catalog exports.
+        if self._executor != "process" or self._dsl is not get_json_logic():
+            return await self.run(self.evaluate_raw, logic, context, resolver, profile, transient)
+        export: Optional[CatalogExport] = None
+        if resolver is not None:
+            if not hasattr(resolver, "export_changes"):
+                return await self.run(self.evaluate_raw, logic, context, resolver, profile, transient)
+            export = await self.run(self._catalog_exports().current, resolver)
+        task: Union[Dict[str, Any], Tuple[str, int]] = logic
+        if rule is not None and export is not None and not transient:
+            task = rule
+        loop = asyncio.get_running_loop()
+        value, trace, samples = await loop.run_in_executor(
+            self._process_pool(export), _evaluate_in_worker, export, task, context, profile is not None
+        )
+        if profile is not None:
+            profile.merge(samples)
+        return RawEvaluationResult(result=value, trace=trace)
+
+    async def run(self, function: Callable[..., T], *args: Any) -> T:
+        """Run a blocking ``function`` off the event loop, unless the backend is inline."""
+
+        if self._executor == "inline":
+            return function(*args)
+        loop = asyncio.get_running_loop()
+        # Keep context variables, such as the current trace span, in the worker thread.
+        call = partial(contextvars.copy_context().run, function, *args)
+        return await loop.run_in_executor(self._thread_pool(), call)
+
+    def start(self, resolver: Optional[DefinitionResolver] = None) -> None:
+        """Create the worker pools ahead of the first request.
+
+        Process workers preload the catalog of ``resolver`` when given.
+        """
+
+        if self._executor == "inline":
+            return
+        self._thread_pool()
+        if self._executor == "process":
+            export = None
+            if resolver is not None and hasattr(resolver, "export_changes"):
+                export = self._catalog_exports().current(resolver)
+            self._process_pool(export)
+
+    def close(self) -> None:
+        """Shut the worker pools down; they are recreated on next use."""
+
+        with self._lock:
+            pools = (self._threads, self._processes)
+            self._threads = self._processes = None
+            exports, self._exports = self._exports, None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+        if exports is not None:
+            exports.close()
+
+    def _thread_pool(self) -> Executor:
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="evaluation")
+            return self._threads
+
+    def _process_pool(self, export: Optional[CatalogExport]) -> Executor:
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self._workers, initializer=_load_worker_catalog, initargs=(export,)
+                )
+            return self._processes
+
+    def _catalog_exports(self) -> "_CatalogExports":
+        with self._lock:
+            if self._exports is None:
+                self._exports = _CatalogExports()
+            return self._exports
 
     def _convert_trace(self, steps: List[Dict[str, Any]]) -> List[TraceStep]:
         converted: List[TraceStep] = []
@@ -40,7 +227,159 @@ class EvaluatorService:
         return converted
 
 
-_evaluator_service = EvaluatorService()
+def trace_payload(steps: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Return raw trace steps with every ``TraceStep`` field, as Pydantic would dump them."""
+
+    return [
+        {
+            "path": step["path"],
+            "operator": step["operator"],
+            "result": step["result"],
+            "arguments": step.get("arguments"),
+            "children": trace_payload(step["children"]) if "children" in step else [],
+        }
+        for step in steps
+    ]
+
+
+class _ExportChain:
+    """Exports of one catalog: the current one and superseded ones workers may still have queued."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.revision = -1
+        self.mark: Any = None
+        self.export: Optional[CatalogExport] = None
+        self.superseded: List[CatalogExport] = []
+
+    def supersede(self) -> None:
+        if self.export is not None:
+            self.superseded.append(self.export)
+        while len(self.superseded) > _EXPORTS_KEPT:
+            _remove_export(self.superseded.pop(0))
+
+    def remove(self) -> None:
+        for export in (*self.superseded, *((self.export,) if self.export is not None else ())):
+            _remove_export(export)
+        self.superseded, self.export = [], None
+
+
+def _remove_export(export: CatalogExport) -> None:
+    base, deltas = export
+    for path in (base, *deltas):
+        Path(path).unlink(missing_ok=True)
+
+
+class _CatalogExports:
+    """Catalog exports with compiled tables, written once per catalog and revision.
+
+    The first export of a catalog is complete; later revisions only write
+    the rules and reference sets that changed, which workers merge into the
+    catalog they loaded. After ``_DELTAS_KEPT`` of them, or when the changes
+    cannot be told, a complete export starts a new chain. Catalogs are held
+    weakly: the exports of one dropped, such as an evicted tenant's, are
+    removed with it. Each catalog writes its exports under its own lock.
+    """
+
+    def __init__(self) -> None:
+        self._directory = tempfile.TemporaryDirectory(prefix="rules-engine-eval-")
+        self._lock = threading.Lock()
+        self._chains: "weakref.WeakKeyDictionary[Any, _ExportChain]" = weakref.WeakKeyDictionary()
+        self._written = 0
+
+    def current(self, resolver: Any) -> CatalogExport:
+        """Return an export of ``resolver`` at its current revision or later."""
+
+        with self._lock:
+            chain = self._chains.get(resolver)
+            if chain is None:
+                chain = self._chains[resolver] = _ExportChain()
+                weakref.finalize(resolver, chain.remove)
+        with chain.lock:
+            revision = resolver.revision
+            if chain.export is None or chain.revision != revision:
+                path = self._next_path()
+                since = chain.mark if chain.export is not None and len(chain.export[1]) < _DELTAS_KEPT else None
+                mark = resolver.export_changes(path, since, include_compiled=True)
+                if mark.complete:
+                    chain.supersede()
+                    chain.export = (path, ())
+                else:
+                    assert chain.export is not None
+                    chain.export = (chain.export[0], (*chain.export[1], path))
+                chain.revision, chain.mark = revision, mark
+            return chain.export
+
+    def close(self) -> None:
+        self._directory.cleanup()
+
+    def _next_path(self) -> str:
+        with self._lock:
+            self._written += 1
+            return str(Path(self._directory.name) / f"catalog.{self._written:016d}.blcat")
+
+
+# Catalogs loaded by the current process pool worker with the number of incremental
+# exports merged into them, by complete export path, least recently used first.
+_worker_catalogs: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+
+
+def _load_worker_catalog(export: Optional[CatalogExport]) -> Any:
+    """Load the catalog export ``export`` into this worker, merging the incremental exports not seen yet."""
+
+    if export is None:
+        return None
+    path, deltas = export
+    loaded = _worker_catalogs.get(path)
+    if loaded is None:
+        # Imported here: the catalog module is only needed inside workers.
+        from app.services.catalog import RuleCatalogService
+
+        catalog = RuleCatalogService()
+        catalog.import_snapshot(path)
+        loaded = (catalog, 0)
+        while len(_worker_catalogs) >= _WORKER_CATALOGS:
+            _worker_catalogs.popitem(last=False)
+    else:
+        _worker_catalogs.move_to_end(path)
+    catalog, merged = loaded
+    # Tasks may arrive out of order; a catalog ahead of the task is still current enough.
+    for delta in deltas[merged:]:
+        catalog.import_snapshot(delta, merge=True)
+    _worker_catalogs[path] = (catalog, max(merged, len(deltas)))
+    return catalog
+
+
+def _evaluate_in_worker(
+    export: Optional[CatalogExport],
+    task: Union[Dict[str, Any], Tuple[str, int]],
+    context: Dict[str, Any],
+    profiled: bool = False,
+) -> Tuple[Any, List[Dict[str, Any]], Dict[Stack, List[int]]]:
+    """Evaluate inside a process pool worker, returning profile samples when ``profiled``.
+
+    ``task`` is either the ``(stable_id, version)`` of a rule of the catalog
+    export, evaluated from the worker's catalog so its compiled forms are
+    reused, or inline logic. Inline logic arrives as a fresh copy with every
+    task, so it is evaluated as transient.
+    """
+
+    catalog = _load_worker_catalog(export)
+    if isinstance(task, tuple):
+        stable_id, version = task
+        resolved = catalog.resolve_rule(stable_id, version) if catalog is not None else None
+        if resolved is None:
+            message = f"Rule '{stable_id}' version {version} is not in the catalog"
+            raise EvaluationError(message, kind="unknown_reference")
+        logic, transient = resolved[1], False
+    else:
+        logic, transient = task, True
+    profile = EvaluationProfile() if profiled else None
+    value, trace = get_json_logic().evaluate(logic, context, resolver=catalog, profile=profile, transient=transient)
+    return value, trace, profile.samples if profile is not None else {}
+
+
+_evaluator_service = EvaluatorService(executor=settings.evaluation_executor, workers=settings.evaluation_workers)
 
 
 def get_evaluator_service() -> EvaluatorService:
@@ -0,0 +1,210 @@
+"""Binary exports of the whole rule catalog.
+
+An export is a single file built for fast warm starts::
+
+    header   magic, flags, producer, blake2b checksum, section lengths (``<8sIHBB16s32sQQ``)
+    data     zlib compressed ``marshal`` dump of every rule and reference set version
+    compiled optional zlib compressed pickle of compiled artefacts
+
+Versions are stored as plain dictionaries. ``marshal`` keeps objects that
+are referenced more than once shared, so definition subtrees interned by the
+catalog are written once and come back as shared objects, which keeps the
+memory footprint of the imported catalog and its compiled forms identical.
+
+The producer is the ``marshal`` format, Python and application versions
+that wrote the file: neither ``marshal`` data nor the pickled compiled
+artefacts are guaranteed to read back the same under other versions.
+
+The checksum covers both sections. A file whose checksum matches, written
+by the same producer, comes from :func:`write_catalog_export` and its
+versions were validated before they were exported, so importers may skip
+validation; otherwise they must validate everything and ignore the compiled
+section. Exports are deployment artefacts like the storage database: the
+compiled section is a pickle and must only be loaded from trusted files.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import marshal
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.models.schemas import ReferenceSetVersion, RegressionCase, RuleVersion
+
+_MAGIC = b"BLPCAT\x00\x02"
+_HEADER = struct.Struct("<8sIHBB16s32sQQ")
+_FLAG_COMPILED = 0x1
+
+# ``(operator, args, artifact)`` as cached by the JSON-Logic evaluator.
+CompiledArtifact = Tuple[str, Any, Any]
+
+
+@dataclass
+class CatalogExport:
+    """Decoded content of an export file."""
+
+    rules: List[Dict[str, Any]]
+    reference_sets: List[Dict[str, Any]]
+    # True when the checksum and producer matched, i.e. the content may be trusted as written.
+    verified: bool
+    compiled: Optional[bytes] = None
+
+
+def write_catalog_export(
+    path: str,
+    versions: Sequence[RuleVersion],
+    reference_sets: Sequence[ReferenceSetVersion],
+    compiled: Optional[Sequence[CompiledArtifact]] = None,
+) -> None:
+    """Atomically write an export of ``versions`` and ``reference_sets`` to ``path``."""
+
+    data = zlib.compress(
+        marshal.dumps(
+            {
+                "rules": [_rule_record(version) for version in versions],
+                "reference_sets": [_reference_set_record(reference_set) for reference_set in reference_sets],
+            }
+        ),
+        1,
+    )
+    blob = b""
+    if compiled is not None:
+        nodes = {id(node): index for index, node in enumerate(_definition_nodes(versions))}
+        buffer = io.BytesIO()
+        pickler = pickle.Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL)
+        # Definition objects are written as references so that artefacts
+        # point into the imported definitions instead of private copies.
+        pickler.persistent_id = lambda obj: nodes.get(id(obj)) if isinstance(obj, (dict, list)) else None
+        pickler.dump(list(compiled))
+        blob = zlib.compress(buffer.getvalue(), 1)
+
+    checksum = hashlib.blake2b(data + blob, digest_size=32).digest()
+    flags = _FLAG_COMPILED if compiled is not None else 0
+    header = _HEADER.pack(_MAGIC, flags, *_producer(), checksum, len(data), len(blob))
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix=".export-")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(header)
+            handle.write(data)
+            handle.write(blob)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def read_catalog_export(path: str) -> CatalogExport:
+    """Read an export, raising ``ValueError`` when it cannot be decoded at all."""
+
+    with open(path, "rb") as handle:
+        content = handle.read()
+    if len(content) < _HEADER.size:
+        raise ValueError(f"{path} is not a catalog export")
+    magic, flags, *producer, checksum, data_length, compiled_length = _HEADER.unpack_from(content)
+    if magic != _MAGIC:
+        raise ValueError(f"{path} is not a catalog export")
+    payload = memoryview(content)[_HEADER.size :]
+    verified = (
+        tuple(producer) == _producer()
+        and len(payload) == data_length + compiled_length
+        and hashlib.blake2b(payload, digest_size=32).digest() == checksum
+    )
+    try:
+        data = marshal.loads(zlib.decompress(payload[:data_length]))
+        rules, reference_sets = data["rules"], data["reference_sets"]
+    except (EOFError, KeyError, TypeError, ValueError, zlib.error) as exc:
+        raise ValueError(f"{path} is corrupted: {exc}") from exc
+    compiled = None
+    if verified and flags & _FLAG_COMPILED:
+        compiled = bytes(payload[data_length:])
+    return CatalogExport(rules=rules, reference_sets=reference_sets, verified=verified, compiled=compiled)
+
+
+def load_compiled_artifacts(blob: bytes, versions: Sequence[RuleVersion]) -> List[CompiledArtifact]:
+    """Decode the compiled section against the definitions of the imported ``versions``."""
+
+    nodes = _definition_nodes(versions)
+    unpickler = pickle.Unpickler(io.BytesIO(zlib.decompress(blob)))
+    unpickler.persistent_load = nodes.__getitem__
+    return unpickler.load()
+
+
+def construct_rule_version(record: Dict[str, Any]) -> RuleVersion:
+    """Rebuild a version from a verified record without running validation."""
+
+    record = _parse_timestamps(record, ("created_at", "updated_at", "published_at"))
+    record["regression_tests"] = [RegressionCase.model_construct(**case) for case in record["regression_tests"]]
+    return RuleVersion.model_construct(**record)
+
+
+def construct_reference_set(record: Dict[str, Any]) -> ReferenceSetVersion:
+    """Rebuild a reference set version from a verified record without running validation."""
+
+    return ReferenceSetVersion.model_construct(**_parse_timestamps(record, ("created_at",)))
+
+
+def _producer() -> Tuple[int, int, int, bytes]:
+    """Return the ``marshal``, Python and application versions recorded in export headers."""
+
+    major, minor = sys.version_info[:2]
+    return marshal.version, major, minor, settings.version.encode()[:16].ljust(16, b"\x00")
+
+
+def _rule_record(version: RuleVersion) -> Dict[str, Any]:
+    # Read attributes directly instead of model_dump() so the definition
+    # objects, and the subtrees they share, are the ones marshal sees.
+    record = {name: getattr(version, name) for name in RuleVersion.model_fields}
+    record["regression_tests"] = [case.model_dump() for case in version.regression_tests]
+    return _format_timestamps(record, ("created_at", "updated_at", "published_at"))
+
+
+def _reference_set_record(reference_set: ReferenceSetVersion) -> Dict[str, Any]:
+    record = {name: getattr(reference_set, name) for name in ReferenceSetVersion.model_fields}
+    return _format_timestamps(record, ("created_at",))
+
+
+def _format_timestamps(record: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    for name in fields:
+        if record[name] is not None:
+            record[name] = record[name].isoformat()
+    return record
+
+
+def _parse_timestamps(record: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    record = dict(record)
+    for name in fields:
+        if record.get(name) is not None:
+            record[name] = datetime.fromisoformat(record[name])
+    return record
+
+
+def _definition_nodes(versions: Sequence[RuleVersion]) -> List[Any]:
+    """Return every distinct container of the definitions in a stable order.
+
+    Exporter and importer walk structurally identical definitions, so the
+    position of a node in this list identifies it on both sides.
+    """
+
+    nodes: List[Any] = []
+    seen = set()
+    stack = [version.definition for version in reversed(versions)]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, (dict, list)) or id(node) in seen:
+            continue
+        seen.add(id(node))
+        nodes.append(node)
+        children = list(node.values()) if isinstance(node, dict) else node
+        stack.extend(reversed(children))
+    return nodes
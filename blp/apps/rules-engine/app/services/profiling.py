@@ -0,0 +1,107 @@
+"""Aggregation of evaluation profiles per rule version."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.dsl.profiling import EvaluationProfile, Stack
+
+PROFILE_GROUPINGS = ("path", "operator")
+PROFILE_WEIGHTS = ("time", "calls")
+
+# Stack receiving the samples of stacks beyond a rule's limit.
+_OTHER_STACK: Stack = ("[other]",)
+
+
+class ProfileStore:
+    """Evaluation profiles aggregated per rule version across evaluations, bounded in memory.
+
+    Profiles of at most ``max_rules`` rule versions are kept, evicting the
+    least recently profiled one first. Each holds at most ``max_stacks``
+    distinct stacks; samples of further stacks are added to a single
+    ``[other]`` stack instead.
+    """
+
+    def __init__(self, max_rules: int = 256, max_stacks: int = 1024) -> None:
+        self._profiles: "OrderedDict[Tuple[str, int], EvaluationProfile]" = OrderedDict()
+        self._max_rules = max_rules
+        self._max_stacks = max_stacks
+        self._lock = threading.Lock()
+
+    def record(self, stable_id: str, version: int, profile: EvaluationProfile) -> None:
+        """Add the samples of one evaluation of version ``version`` of ``stable_id``."""
+
+        key = (stable_id, version)
+        with self._lock:
+            aggregate = self._profiles.get(key)
+            if aggregate is None:
+                aggregate = self._profiles[key] = EvaluationProfile()
+                while len(self._profiles) > self._max_rules:
+                    self._profiles.popitem(last=False)
+            else:
+                self._profiles.move_to_end(key)
+            samples = aggregate.samples
+            for stack, sample in profile.samples.items():
+                if stack not in samples and len(samples) >= self._max_stacks:
+                    stack = _OTHER_STACK
+                aggregate.merge({stack: sample})
+
+    def collapsed(
+        self, stable_id: str, version: Optional[int] = None, by: str = "path", weight: str = "time"
+    ) -> str:
+        """Return the profile of a rule version in collapsed stack format; ``KeyError`` when unknown.
+
+        Without ``version``, the highest profiled version of ``stable_id`` is
+        used. Every line holds ``;`` separated frames, root first, and the
+        self time in microseconds or the call count of the innermost frame,
+        as read by flame graph tools. ``by="operator"`` drops the expression
+        paths from the frames, merging nodes with the same operator stack.
+        """
+
+        if by not in PROFILE_GROUPINGS:
+            raise ValueError(f"Unsupported profile grouping '{by}'")
+        if weight not in PROFILE_WEIGHTS:
+            raise ValueError(f"Unsupported profile weight '{weight}'")
+        with self._lock:
+            if version is None:
+                version = max((key[1] for key in self._profiles if key[0] == stable_id), default=0)
+            samples = dict(self._profiles[(stable_id, version)].samples)
+        values: Dict[str, int] = {}
+        for stack, (calls, self_ns, _) in samples.items():
+            frames = stack if by == "path" else tuple(frame.partition("@")[0] for frame in stack)
+            key = ";".join(frames)
+            values[key] = values.get(key, 0) + (calls if weight == "calls" else self_ns)
+        if weight == "time":
+            values = {key: value // 1000 for key, value in values.items()}
+        return "".join(f"{key} {value}\n" for key, value in sorted(values.items()))
+
+    def rules(self) -> List[Tuple[str, int]]:
+        """Return the stable ids and versions with a profile, least recently profiled first."""
+
+        with self._lock:
+            return list(self._profiles)
+
+    def clear(self) -> None:
+        """Drop every profile."""
+
+        with self._lock:
+            self._profiles.clear()
+
+
+_profile_store: Optional[ProfileStore] = None
+_profile_store_lock = threading.Lock()
+
+
+def get_profile_store() -> ProfileStore:
+    """Return the singleton profile store of the base namespace, built on first use."""
+
+    global _profile_store
+    with _profile_store_lock:
+        if _profile_store is None:
+            _profile_store = ProfileStore(
+                max_rules=settings.profile_max_rules, max_stacks=settings.profile_max_stacks
+            )
+        return _profile_store
@@ -2,13 +2,21 @@
 
 from __future__ import annotations
 
+import json
+import threading
+from collections import OrderedDict
 from copy import deepcopy
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, Iterable, List, Optional
+from functools import cached_property
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Union
 from uuid import uuid4
 
+from app.core.config import settings
 from app.models.schemas import TraceStep
+from app.services.evaluator import trace_payload
+from app.services.storage import CatalogStorage, get_storage
 
 
 @dataclass
@@ -21,15 +29,56 @@ class EvaluationProofArtifact:
     logic: Dict[str, Any]
     context: Dict[str, Any]
     result: Any
-    trace: List[TraceStep]
+    # Trace steps as plain dictionaries, as produced by the evaluator or stored.
+    steps: List[Dict[str, Any]]
     created_at: datetime
 
+    @cached_property
+    def trace(self) -> List[TraceStep]:
+        """The trace as ``TraceStep`` models, built on first access."""
 
-class EvaluationProofStore:
-    """In-memory storage of evaluation runs for audit and debugging."""
+        return [TraceStep.model_validate(step) for step in self.steps]
+
+    def to_record(self) -> Dict[str, Any]:
+        """Return a JSON compatible representation for durable storage."""
+
+        return {
+            "id": self.id,
+            "stable_id": self.stable_id,
+            "version": self.version,
+            "logic": self.logic,
+            "context": self.context,
+            "result": self.result,
+            "trace": trace_payload(self.steps),
+            "created_at": self.created_at.isoformat(),
+        }
 
-    def __init__(self) -> None:
-        self._artifacts: Dict[str, EvaluationProofArtifact] = {}
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "EvaluationProofArtifact":
+        fields = {**record, "created_at": datetime.fromisoformat(record["created_at"])}
+        return cls(steps=fields.pop("trace"), **fields)
+
+
+class EvaluationProofStore:
+    """Storage of evaluation runs for audit and debugging.
+
+    Without a backing :class:`~app.services.storage.CatalogStorage` every
+    artefact is kept in memory, up to ``max_artifacts`` (unbounded when 0)
+    after which the oldest are dropped. With one, artefacts are written
+    through to storage and only the ``cache_size`` most recent ones stay in
+    memory.
+    """
+
+    def __init__(
+        self, storage: CatalogStorage | None = None, cache_size: int = 1024, max_artifacts: int = 0
+    ) -> None:
+        self._artifacts: "OrderedDict[str, EvaluationProofArtifact]" = OrderedDict()
+        # Artefact ids per stable id, in recording order, for list_for_rule.
+        self._by_rule: Dict[Optional[str], Dict[str, None]] = {}
+        self._storage = storage
+        self._cache_size = cache_size
+        self._max_artifacts = max_artifacts
+        self._lock = threading.Lock()
 
     def record(
         self,
@@ -39,46 +88,123 @@ class EvaluationProofStore:
         logic: Dict[str, Any],
         context: Dict[str, Any],
         result: Any,
-        trace: Iterable[TraceStep],
+        trace: Iterable[Union[TraceStep, Dict[str, Any]]],
+        copy_inputs: bool = True,
     ) -> EvaluationProofArtifact:
-        """Persist a new evaluation artefact and return it."""
+        """Persist a new evaluation artefact and return it.
+
+        ``trace`` holds ``TraceStep`` models or the raw steps produced by the
+        evaluator, which are kept as is; the models of the artefact's
+        ``trace`` are only built when it is read. The logic, context, result
+        and trace are copied unless ``copy_inputs`` is false, which callers
+        pass when nothing will mutate them afterwards, such as a freshly
+        decoded request body.
+        """
+
+        clone = deepcopy if copy_inputs else _identity
 
         artifact_id = str(uuid4())
         artifact = EvaluationProofArtifact(
             id=artifact_id,
             stable_id=stable_id,
             version=version,
-            logic=deepcopy(logic),
-            context=deepcopy(context),
-            result=deepcopy(result),
-            trace=[TraceStep.model_validate(step.model_dump()) for step in trace],
+            logic=clone(logic),
+            context=clone(context),
+            result=clone(result),
+            steps=[step.model_dump() if isinstance(step, TraceStep) else clone(step) for step in trace],
             created_at=datetime.utcnow(),
         )
-        self._artifacts[artifact_id] = artifact
+        if self._storage is not None:
+            self._storage.add_proof(artifact.to_record())
+        self._cache(artifact)
         return artifact
 
     def get(self, artifact_id: str) -> EvaluationProofArtifact:
         """Retrieve a previously recorded artefact."""
 
-        if artifact_id not in self._artifacts:
+        with self._lock:
+            artifact = self._artifacts.get(artifact_id)
+            if artifact is not None:
+                self._artifacts.move_to_end(artifact_id)
+                return artifact
+        record = self._storage.load_proof(artifact_id) if self._storage is not None else None
+        if record is None:
             raise KeyError(f"Unknown artefact id '{artifact_id}'")
-        return self._artifacts[artifact_id]
+        artifact = EvaluationProofArtifact.from_record(record)
+        self._cache(artifact)
+        return artifact
 
     def list_for_rule(self, stable_id: str) -> List[EvaluationProofArtifact]:
         """Return all artefacts recorded for a rule."""
 
-        return [artifact for artifact in self._artifacts.values() if artifact.stable_id == stable_id]
+        if self._storage is not None:
+            return [EvaluationProofArtifact.from_record(record) for record in self._storage.list_proofs(stable_id)]
+        with self._lock:
+            return [self._artifacts[artifact_id] for artifact_id in self._by_rule.get(stable_id, ())]
 
     def clear(self) -> None:
         """Remove all stored artefacts."""
 
-        self._artifacts.clear()
-
-
-_proof_store = EvaluationProofStore()
+        with self._lock:
+            self._artifacts.clear()
+            self._by_rule.clear()
+        if self._storage is not None:
+            self._storage.clear_proofs()
+
+    @property
+    def size(self) -> int:
+        """Number of artefacts held in memory."""
+
+        with self._lock:
+            return len(self._artifacts)
+
+    def estimated_bytes(self, sample: int = 32) -> int:
+        """Estimate the memory held by in-memory artefacts from their ``sample`` most recent ones.
+
+        The estimate is the JSON size of the sampled records times the number
+        of artefacts, so it is cheap enough for periodic metric collection.
+        """
+
+        with self._lock:
+            entries = len(self._artifacts)
+            recent = list(islice(reversed(self._artifacts.values()), sample))
+        if not recent:
+            return 0
+        sampled = sum(len(json.dumps(artifact.to_record(), default=str)) for artifact in recent)
+        return sampled * entries // len(recent)
+
+    def _cache(self, artifact: EvaluationProofArtifact) -> None:
+        with self._lock:
+            self._artifacts[artifact.id] = artifact
+            self._artifacts.move_to_end(artifact.id)
+            if self._storage is None:
+                # The in-memory store is the only copy, so only evict past its cap.
+                self._by_rule.setdefault(artifact.stable_id, {})[artifact.id] = None
+                limit = self._max_artifacts or None
+            else:
+                limit = self._cache_size
+            while limit is not None and len(self._artifacts) > limit:
+                _, evicted = self._artifacts.popitem(last=False)
+                if self._storage is None:
+                    ids = self._by_rule[evicted.stable_id]
+                    del ids[evicted.id]
+                    if not ids:
+                        del self._by_rule[evicted.stable_id]
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+_proof_store: Optional[EvaluationProofStore] = None
+_proof_store_lock = threading.Lock()
 
 
 def get_evaluation_proof_store() -> EvaluationProofStore:
-    """Return the singleton proof store instance used by the API layer."""
+    """Return the singleton proof store instance used by the API layer, built on first use."""
 
-    return _proof_store
+    global _proof_store
+    with _proof_store_lock:
+        if _proof_store is None:
+            _proof_store = EvaluationProofStore(storage=get_storage(), cache_size=settings.proof_cache_size)
+        return _proof_store
@@ -0,0 +1,376 @@
+"""Redis backed catalog shared between rules engine instances.
+
+Every instance keeps the whole catalog in its local snapshot (the near-cache)
+and serves reads, including the compiled expressions cached for the stored
+definitions, without talking to Redis. Redis holds the authoritative copy::
+
+    {prefix}:revision                 counter bumped by every catalog write
+    {prefix}:rule_ids                 set of stable ids
+    {prefix}:rules:{stable_id}        hash of version -> RuleVersion JSON
+    {prefix}:reference_set_names      set of reference set names
+    {prefix}:reference_sets:{name}    hash of version -> ReferenceSetVersion JSON
+    {prefix}:invalidations            pub/sub channel announcing every write
+
+Tenant namespaces keep their catalogs under ``{prefix}:tenants:{tenant}``.
+
+Writers hold ``{prefix}:lock`` and apply their change, the revision bump and
+the invalidation message in one ``MULTI`` transaction. Subscribers reload
+only the entries named in a message; a gap in revisions, a reset or a lost
+connection triggers a full reload instead.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.models.schemas import ReferenceSetVersion, RuleVersion
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Invalidation:
+    """Catalog change announced to every subscribed instance."""
+
+    revision: int
+    rules: Tuple[str, ...] = ()
+    reference_sets: Tuple[str, ...] = ()
+    # The catalog was cleared or the subscriber may have missed messages.
+    reset: bool = False
+
+
+class RedisCatalogStore:
+    """Catalog persistence and change notification on top of a Redis client.
+
+    ``client`` is a ``redis.Redis`` created with ``decode_responses=True`` or
+    an :class:`InMemoryRedis` instance.
+    """
+
+    def __init__(self, client: Any, prefix: str = "rules-engine", lock_timeout: float = 30.0) -> None:
+        self._client = client
+        self._prefix = prefix
+        self._lock_timeout = lock_timeout
+        self._listener: Optional[threading.Thread] = None
+        self._listener_lock = threading.Lock()
+        self._pubsub: Any = None
+        self._closed = False
+
+    def namespace(self, name: str) -> "RedisCatalogStore":
+        """Return a store on the same client keeping the separate catalog ``name`` under ``{prefix}:tenants:{name}``."""
+
+        return RedisCatalogStore(self._client, prefix=self._key("tenants", name), lock_timeout=self._lock_timeout)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def revision(self) -> int:
+        return int(self._client.get(self._key("revision")) or 0)
+
+    def load(
+        self,
+        stable_ids: Optional[Iterable[str]] = None,
+        reference_sets: Optional[Iterable[str]] = None,
+    ) -> Tuple[int, List[RuleVersion], List[ReferenceSetVersion]]:
+        """Return the revision with the named entries, or everything when omitted.
+
+        Full loads must run under :meth:`lock` so the sets of ids and the
+        hashes they name are read consistently.
+        """
+
+        if stable_ids is None:
+            stable_ids = self._client.smembers(self._key("rule_ids"))
+        if reference_sets is None:
+            reference_sets = self._client.smembers(self._key("reference_set_names"))
+        stable_ids, reference_sets = sorted(stable_ids), sorted(reference_sets)
+
+        with self._client.pipeline(transaction=True) as pipe:
+            pipe.get(self._key("revision"))
+            for stable_id in stable_ids:
+                pipe.hgetall(self._key("rules", stable_id))
+            for name in reference_sets:
+                pipe.hgetall(self._key("reference_sets", name))
+            revision, *hashes = pipe.execute()
+
+        versions = [
+            RuleVersion.model_validate_json(payload)
+            for stored in hashes[: len(stable_ids)]
+            for _, payload in sorted(stored.items(), key=lambda item: int(item[0]))
+        ]
+        sets = [
+            ReferenceSetVersion.model_validate_json(payload)
+            for stored in hashes[len(stable_ids) :]
+            for _, payload in sorted(stored.items(), key=lambda item: int(item[0]))
+        ]
+        return int(revision or 0), versions, sets
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Serialize catalog writers across every instance."""
+
+        with self._client.lock(self._key("lock"), timeout=self._lock_timeout):
+            yield
+
+    def commit(
+        self,
+        revision: int,
+        versions: Sequence[RuleVersion] = (),
+        reference_sets: Sequence[ReferenceSetVersion] = (),
+        reset: bool = False,
+    ) -> None:
+        """Atomically store a write as ``revision`` and announce it.
+
+        Callers hold :meth:`lock` and pass the revision following the current
+        one. ``reset`` drops every stored entry first.
+        """
+
+        message = Invalidation(
+            revision=revision,
+            rules=tuple(sorted({version.stable_id for version in versions})),
+            reference_sets=tuple(sorted({reference_set.name for reference_set in reference_sets})),
+            reset=reset,
+        )
+        stale: List[str] = []
+        if reset:
+            stale = [self._key("rules", stable_id) for stable_id in self._client.smembers(self._key("rule_ids"))]
+            stale += [
+                self._key("reference_sets", name)
+                for name in self._client.smembers(self._key("reference_set_names"))
+            ]
+            stale += [self._key("rule_ids"), self._key("reference_set_names")]
+
+        with self._client.pipeline(transaction=True) as pipe:
+            if stale:
+                pipe.delete(*stale)
+            for version in versions:
+                pipe.hset(self._key("rules", version.stable_id), str(version.version), version.model_dump_json())
+                pipe.sadd(self._key("rule_ids"), version.stable_id)
+            for reference_set in reference_sets:
+                pipe.hset(
+                    self._key("reference_sets", reference_set.name),
+                    str(reference_set.version),
+                    reference_set.model_dump_json(),
+                )
+                pipe.sadd(self._key("reference_set_names"), reference_set.name)
+            pipe.set(self._key("revision"), revision)
+            pipe.publish(self._key("invalidations"), json.dumps(message.__dict__))
+            pipe.execute()
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+    def subscribe(self, callback: Callable[[Invalidation], None]) -> None:
+        """Deliver every invalidation to ``callback`` from a background thread.
+
+        The subscription is active when this method returns, so callers can
+        load the catalog afterwards without missing a concurrent write.
+        """
+
+        with self._listener_lock:
+            if self._listener is not None or self._closed:
+                return
+            pubsub = self._subscribe()
+            self._listener = threading.Thread(
+                target=self._listen, args=(pubsub, callback), name="catalog-invalidations", daemon=True
+            )
+            self._listener.start()
+
+    def close(self) -> None:
+        """Stop delivering invalidations; the client stays open for other stores sharing it."""
+
+        with self._listener_lock:
+            self._closed = True
+            pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            pubsub.close()
+
+    def _subscribe(self) -> Any:
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self._key("invalidations"))
+        self._pubsub = pubsub
+        return pubsub
+
+    def _listen(self, pubsub: Any, callback: Callable[[Invalidation], None]) -> None:
+        while True:
+            try:
+                for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    callback(
+                        Invalidation(
+                            revision=data["revision"],
+                            rules=tuple(data["rules"]),
+                            reference_sets=tuple(data["reference_sets"]),
+                            reset=data["reset"],
+                        )
+                    )
+                return
+            except Exception:  # pragma: no cover - depends on the network
+                if self._closed:
+                    return
+                logger.exception("Catalog invalidation listener failed; resubscribing")
+                time.sleep(1.0)
+                try:
+                    pubsub = self._subscribe()
+                except Exception:
+                    continue
+                # Messages may have been lost while disconnected.
+                callback(Invalidation(revision=0, reset=True))
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self._prefix, *parts))
+
+
+class InMemoryRedis:
+    """In-process stand-in for the subset of ``redis.Redis`` used above.
+
+    Instances sharing one ``InMemoryRedis`` behave like instances sharing a
+    Redis server, which keeps tests and single-process development free of
+    external services. Select it with ``redis_url="memory://"``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._values: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._subscribers: Dict[str, List["queue.Queue[Optional[Dict[str, Any]]]"]] = defaultdict(list)
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            value = self._values.get(name)
+            return None if value is None else str(value)
+
+    def set(self, name: str, value: Any) -> bool:
+        with self._lock:
+            self._values[name] = str(value)
+            return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(self._values.pop(name, None) is not None for name in names)
+
+    def hset(self, name: str, key: str, value: str) -> int:
+        with self._lock:
+            stored = self._values.setdefault(name, {})
+            created = key not in stored
+            stored[key] = value
+            return int(created)
+
+    def hgetall(self, name: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._values.get(name, {}))
+
+    def sadd(self, name: str, *values: str) -> int:
+        with self._lock:
+            stored = self._values.setdefault(name, set())
+            added = set(values) - stored
+            stored.update(values)
+            return len(added)
+
+    def smembers(self, name: str) -> set:
+        with self._lock:
+            return set(self._values.get(name, set()))
+
+    def publish(self, channel: str, message: str) -> int:
+        with self._lock:
+            subscribers = list(self._subscribers[channel])
+        for subscriber in subscribers:
+            subscriber.put({"type": "message", "channel": channel, "data": message})
+        return len(subscribers)
+
+    def lock(self, name: str, timeout: Optional[float] = None) -> threading.Lock:
+        with self._lock:
+            return self._locks[name]
+
+    def pipeline(self, transaction: bool = True) -> "_InMemoryPipeline":
+        return _InMemoryPipeline(self)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> "_InMemoryPubSub":
+        return _InMemoryPubSub(self)
+
+
+class _InMemoryPipeline:
+    """Queue commands and run them atomically on :meth:`execute`."""
+
+    def __init__(self, client: InMemoryRedis) -> None:
+        self._client = client
+        self._commands: List[Tuple[str, tuple]] = []
+
+    def __getattr__(self, command: str) -> Callable[..., "_InMemoryPipeline"]:
+        def queue_command(*args: Any) -> "_InMemoryPipeline":
+            self._commands.append((command, args))
+            return self
+
+        return queue_command
+
+    def execute(self) -> List[Any]:
+        with self._client._lock:
+            results = [getattr(self._client, command)(*args) for command, args in self._commands]
+        self._commands = []
+        return results
+
+    def __enter__(self) -> "_InMemoryPipeline":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._commands = []
+
+
+class _InMemoryPubSub:
+    def __init__(self, client: InMemoryRedis) -> None:
+        self._client = client
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+
+    def subscribe(self, channel: str) -> None:
+        with self._client._lock:
+            self._client._subscribers[channel].append(self._queue)
+
+    def listen(self) -> Iterator[Dict[str, Any]]:
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            yield message
+
+    def close(self) -> None:
+        with self._client._lock:
+            for subscribers in self._client._subscribers.values():
+                if self._queue in subscribers:
+                    subscribers.remove(self._queue)
+        self._queue.put(None)
+
+
+_redis_store: Optional[RedisCatalogStore] = None
+_redis_store_lock = threading.Lock()
+
+
+def get_redis_catalog_store() -> Optional[RedisCatalogStore]:
+    """Return the Redis catalog store configured in ``Settings`` or ``None``."""
+
+    global _redis_store
+    if not settings.redis_url:
+        return None
+    with _redis_store_lock:
+        if _redis_store is None:
+            if settings.redis_url.startswith("memory://"):
+                client: Any = InMemoryRedis()
+            else:
+                try:
+                    import redis
+                except ImportError as exc:  # pragma: no cover - optional dependency
+                    raise RuntimeError("redis_url requires the 'redis' package to be installed") from exc
+                client = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+            _redis_store = RedisCatalogStore(client, prefix=settings.redis_prefix)
+        return _redis_store
@@ -2,16 +2,19 @@
 
 from __future__ import annotations
 
-from typing import List
+import asyncio
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from app.models.schemas import (
     RegressionCase,
-    RegressionCaseResult,
     RegressionRunRequest,
     RegressionRunResponse,
+    RuleVersion,
 )
 from app.services.catalog import RuleCatalogService, get_catalog_service
-from app.services.evaluator import EvaluatorService, get_evaluator_service
+from app.services.evaluator import EvaluatorService, RawEvaluationResult, get_evaluator_service, trace_payload
 from app.services.proofs import EvaluationProofStore, get_evaluation_proof_store
 
 
@@ -29,6 +32,47 @@ class RegressionService:
         self._proof_store = proof_store
 
     def run(self, request: RegressionRunRequest) -> RegressionRunResponse:
+        rule, cases = self._resolve(request)
+        results = [
+            self._case_result(
+                rule, case, self._evaluator.evaluate_raw(rule.definition, case.context, resolver=self._catalog)
+            )
+            for case in cases
+        ]
+        return RegressionRunResponse.model_validate(_summary(rule, results))
+
+    async def run_payload(self, request: RegressionRunRequest) -> Dict[str, Any]:
+        """Run the cases concurrently on the evaluator's backend.
+
+        At most the evaluator's concurrency of cases are in flight at once.
+        Returns the ``RegressionRunResponse`` content as plain data, with
+        traces shaped by :func:`trace_payload`.
+        """
+
+        rule, cases = await self._evaluator.run(self._resolve, request)
+        slots = asyncio.Semaphore(self._evaluator.concurrency)
+
+        async def evaluate(case: RegressionCase) -> RawEvaluationResult:
+            async with slots:
+                return await self._evaluator.evaluate_raw_async(
+                    rule.definition, case.context, resolver=self._catalog, rule=(rule.stable_id, rule.version)
+                )
+
+        evaluations = await asyncio.gather(*(evaluate(case) for case in cases))
+        results = await self._evaluator.run(self._case_results, rule, cases, evaluations)
+        return _summary(rule, results)
+
+    def stream(self, request: RegressionRunRequest) -> "RegressionReport":
+        """Return a report evaluating the cases only while it is iterated.
+
+        The rule and cases are resolved eagerly, so lookup errors surface
+        before anything is written; evaluation errors surface while iterating.
+        """
+
+        rule, cases = self._resolve(request)
+        return RegressionReport(self, rule, cases)
+
+    def _resolve(self, request: RegressionRunRequest) -> Tuple[RuleVersion, List[RegressionCase]]:
         rule = self._catalog.get_rule_version(
             request.stable_id,
             version=request.version,
@@ -37,56 +81,127 @@ class RegressionService:
 
         cases: List[RegressionCase]
         if request.cases:
-            cases = [RegressionCase.model_validate(case.model_dump()) for case in request.cases]
+            # Request cases are private to the request; no defensive copy needed.
+            cases = request.cases
         else:
             cases = rule.regression_tests
 
         if not cases:
             raise ValueError("No regression cases were provided or stored for the rule")
+        return rule, cases
 
-        results: List[RegressionCaseResult] = []
-        passed = 0
-        for case in cases:
-            evaluation = self._evaluator.evaluate(rule.definition, case.context)
-            self._proof_store.record(
-                stable_id=rule.stable_id,
-                version=rule.version,
-                logic=rule.definition,
-                context=case.context,
-                result=evaluation.result,
-                trace=evaluation.trace,
-            )
-            success = evaluation.result == case.expected
-            if success:
-                passed += 1
-            results.append(
-                RegressionCaseResult(
-                    name=case.name,
-                    description=case.description,
-                    success=success,
-                    expected=case.expected,
-                    actual=evaluation.result,
-                    trace=evaluation.trace,
-                )
-            )
+    def _case_results(
+        self, rule: RuleVersion, cases: List[RegressionCase], evaluations: List[RawEvaluationResult]
+    ) -> List[Dict[str, Any]]:
+        return [self._case_result(rule, case, evaluation) for case, evaluation in zip(cases, evaluations)]
+
+    def _case_result(self, rule: RuleVersion, case: RegressionCase, evaluation: RawEvaluationResult) -> Dict[str, Any]:
+        """Record the proof of one case and return its ``RegressionCaseResult`` content."""
 
-        failed = len(results) - passed
-        return RegressionRunResponse(
+        self._proof_store.record(
             stable_id=rule.stable_id,
             version=rule.version,
-            total=len(results),
-            passed=passed,
-            failed=failed,
-            cases=results,
+            logic=rule.definition,
+            context=case.context,
+            result=evaluation.result,
+            trace=evaluation.trace,
+            # Stored cases are immutable catalog data and request cases are private.
+            copy_inputs=False,
+        )
+        return {
+            "name": case.name,
+            "description": case.description,
+            "success": evaluation.result == case.expected,
+            "expected": case.expected,
+            "actual": evaluation.result,
+            "trace": trace_payload(evaluation.trace),
+        }
+
+
+class RegressionReport:
+    """Regression run evaluated case by case while it is iterated asynchronously.
+
+    Iteration yields ``RegressionCaseResult`` shaped dictionaries in case
+    order while keeping up to the evaluator's concurrency of cases in
+    flight. ``passed`` and ``failed`` count the cases yielded so far and
+    are final once iteration completes.
+    """
+
+    def __init__(self, service: RegressionService, rule: RuleVersion, cases: List[RegressionCase]) -> None:
+        self.stable_id = rule.stable_id
+        self.version = rule.version
+        self.total = len(cases)
+        self.passed = 0
+        self.failed = 0
+        self._service = service
+        self._rule = rule
+        self._cases = cases
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        service = self._service
+        evaluator = service._evaluator
+        pending: "deque[Tuple[RegressionCase, asyncio.Future[RawEvaluationResult]]]" = deque()
+        remaining = iter(self._cases)
+        try:
+            for case in remaining:
+                pending.append((case, self._submit(case)))
+                if len(pending) < evaluator.concurrency:
+                    continue
+                yield await self._next(pending)
+            while pending:
+                yield await self._next(pending)
+        finally:
+            # The consumer went away or a case failed: drop the evaluations still queued.
+            for _, future in pending:
+                future.cancel()
+
+    def _submit(self, case: RegressionCase) -> "asyncio.Future[RawEvaluationResult]":
+        evaluator = self._service._evaluator
+        return asyncio.ensure_future(
+            evaluator.evaluate_raw_async(
+                self._rule.definition,
+                case.context,
+                resolver=self._service._catalog,
+                rule=(self._rule.stable_id, self._rule.version),
+            )
         )
 
+    async def _next(
+        self, pending: "deque[Tuple[RegressionCase, asyncio.Future[RawEvaluationResult]]]"
+    ) -> Dict[str, Any]:
+        case, future = pending.popleft()
+        evaluation = await future
+        result = await self._service._evaluator.run(self._service._case_result, self._rule, case, evaluation)
+        if result["success"]:
+            self.passed += 1
+        else:
+            self.failed += 1
+        return result
+
+
+def _summary(rule: RuleVersion, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    passed = sum(1 for result in results if result["success"])
+    return {
+        "stable_id": rule.stable_id,
+        "version": rule.version,
+        "total": len(results),
+        "passed": passed,
+        "failed": len(results) - passed,
+        "cases": results,
+    }
 
-_regression_service = RegressionService(
-    get_catalog_service(), get_evaluator_service(), get_evaluation_proof_store()
-)
+
+_regression_service: Optional[RegressionService] = None
+_regression_service_lock = threading.Lock()
 
 
 def get_regression_service() -> RegressionService:
-    """Return the singleton regression runner service."""
+    """Return the singleton regression runner service, built on first use."""
 
-    return _regression_service
+    global _regression_service
+    with _regression_service_lock:
+        if _regression_service is None:
+            _regression_service = RegressionService(
+                get_catalog_service(), get_evaluator_service(), get_evaluation_proof_store()
+            )
+        return _regression_service
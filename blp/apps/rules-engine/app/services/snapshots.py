@@ -0,0 +1,307 @@
+"""Memory-mapped catalog snapshots shared by every worker process on a host.
+
+A snapshot directory holds one immutable data file per generation plus a
+tiny control file::
+
+    catalog.ctl                      8 byte little endian current generation
+    catalog.lock                     flock() serializing writers across processes
+    catalog.0000000000000007.snap    generation 7
+
+Each data file starts with a fixed header followed by the encoded values and
+a JSON index::
+
+    <8s magic> <u64 generation> <u64 index offset> <u64 index length>
+    <value blobs ...>
+    {"<section>": {"<key>": [offset, length, digest, meta], ...}, ...}
+
+Workers map data files read-only, so the page cache holds a single copy of
+the catalog per host. Values are decoded lazily on first access through
+:class:`MappedSection` and decoded values are carried over to the next
+generation when their digest did not change. Readers detect a new generation
+by reading the control word from a shared mapping, which costs no system
+call.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+from app.core.config import settings
+
+V = TypeVar("V")
+
+_MAGIC = b"BLPCAT01"
+_HEADER = struct.Struct("<8sQQQ")
+_GENERATION = struct.Struct("<Q")
+
+# (offset, length, digest, meta) of a value inside a data file.
+IndexEntry = Tuple[int, int, str, Any]
+# (key, encoded value, digest, meta) produced when writing a section.
+EncodedItem = Tuple[str, bytes, str, Any]
+
+
+def digest(blob: bytes) -> str:
+    """Return the digest recorded for an encoded value."""
+
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+
+class MappedSnapshot:
+    """A single generation mapped read-only into the current process."""
+
+    def __init__(self, generation: int, buffer: mmap.mmap, index: Dict[str, Dict[str, IndexEntry]]) -> None:
+        self.generation = generation
+        self.buffer = buffer
+        self.index = index
+
+    def section(self, name: str) -> Dict[str, IndexEntry]:
+        return self.index.get(name, {})
+
+
+class MappedSection(Mapping[str, V]):
+    """Read-only mapping whose values are decoded lazily from a snapshot.
+
+    ``section | updates`` returns a new mapping with ``updates`` layered on top
+    without decoding anything, mirroring ``dict | dict``. Writers use it to
+    derive the next generation while untouched values stay encoded.
+    """
+
+    def __init__(
+        self,
+        buffer: mmap.mmap,
+        index: Dict[str, IndexEntry],
+        decode: Callable[[bytes], V],
+        previous: Optional[Mapping[str, V]] = None,
+    ) -> None:
+        self._buffer = buffer
+        self._index = index
+        self._decode = decode
+        self._decoded: Dict[str, V] = {}
+        self._overrides: Dict[str, V] = {}
+        if previous is not None:
+            self._carry_over(previous)
+
+    def __getitem__(self, key: str) -> V:
+        if key in self._overrides:
+            return self._overrides[key]
+        value = self._decoded.get(key)
+        if value is None:
+            offset, length, _, _ = self._index[key]
+            value = self._decode(self._buffer[offset : offset + length])
+            # Concurrent decodes of one key are harmless; setdefault keeps one.
+            value = self._decoded.setdefault(key, value)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._overrides or key in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._index
+        for key in self._overrides:
+            if key not in self._index:
+                yield key
+
+    def __len__(self) -> int:
+        return len(self._index) + sum(1 for key in self._overrides if key not in self._index)
+
+    def __or__(self, updates: Mapping[str, V]) -> "MappedSection[V]":
+        layered: MappedSection[V] = MappedSection(self._buffer, self._index, self._decode)
+        layered._decoded = self._decoded
+        layered._overrides = {**self._overrides, **updates}
+        return layered
+
+    def _carry_over(self, previous: Mapping[str, V]) -> None:
+        # Reuse decoded values whose encoding is unchanged so objects keyed by
+        # identity (compiled expressions) stay warm across generations.
+        if not isinstance(previous, MappedSection):
+            # A plain mapping is what the caller just wrote: every value is current.
+            self._decoded.update((key, value) for key, value in previous.items() if key in self._index)
+            return
+        for key, value in previous._decoded.items():
+            entry = self._index.get(key)
+            if entry is not None and key not in previous._overrides and entry[2] == previous._index[key][2]:
+                self._decoded[key] = value
+        # Overrides only exist on a writer's pending snapshot and were just written.
+        for key, value in previous._overrides.items():
+            if key in self._index:
+                self._decoded[key] = value
+
+    def changed_keys(self, previous: Mapping[str, V]) -> Optional[Set[str]]:
+        """Return the keys whose encoding differs from ``previous``.
+
+        Only digests are compared, nothing is decoded. Returns ``None`` when
+        the difference cannot be told from the indexes, for instance because
+        keys were removed.
+        """
+
+        if not isinstance(previous, MappedSection) or previous._overrides or self._overrides:
+            return None
+        if any(key not in self._index for key in previous._index):
+            return None
+        return {
+            key
+            for key, entry in self._index.items()
+            if key not in previous._index or previous._index[key][2] != entry[2]
+        }
+
+    def encoded(
+        self, encode: Callable[[V], bytes], meta: Callable[[V], Any]
+    ) -> Iterator[EncodedItem]:
+        """Yield every item encoded, copying untouched values verbatim."""
+
+        for key, (offset, length, value_digest, value_meta) in self._index.items():
+            if key not in self._overrides:
+                yield key, self._buffer[offset : offset + length], value_digest, value_meta
+        for key, value in self._overrides.items():
+            blob = encode(value)
+            yield key, blob, digest(blob), meta(value)
+
+
+def encode_section(
+    mapping: Mapping[str, V], encode: Callable[[V], bytes], meta: Callable[[V], Any]
+) -> Iterable[EncodedItem]:
+    """Encode ``mapping`` for :meth:`SnapshotStore.write`."""
+
+    if isinstance(mapping, MappedSection):
+        return mapping.encoded(encode, meta)
+    return _encode_items(mapping, encode, meta)
+
+
+def _encode_items(
+    mapping: Mapping[str, V], encode: Callable[[V], bytes], meta: Callable[[V], Any]
+) -> Iterator[EncodedItem]:
+    for key, value in mapping.items():
+        blob = encode(value)
+        yield key, blob, digest(blob), meta(value)
+
+
+class SnapshotStore:
+    """Directory of generation files shared between worker processes."""
+
+    def __init__(self, directory: str, keep: int = 2) -> None:
+        self._directory = Path(directory)
+        self._keep = keep
+        self._control: Optional[mmap.mmap] = None
+        self._thread_lock = threading.Lock()
+
+    def namespace(self, name: str) -> "SnapshotStore":
+        """Return a store sharing generations of the separate catalog ``name`` in ``tenants/<name>``."""
+
+        return SnapshotStore(str(self._directory / "tenants" / name), keep=self._keep)
+
+    @property
+    def generation(self) -> int:
+        """Return the most recently published generation, ``0`` if none."""
+
+        return _GENERATION.unpack_from(self._control_map(), 0)[0]
+
+    def open(self, generation: int) -> MappedSnapshot:
+        """Map the data file of ``generation`` read-only."""
+
+        with open(self._data_path(generation), "rb") as handle:
+            buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, stored, index_offset, index_length = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC or stored != generation:
+            buffer.close()
+            raise ValueError(f"Corrupt catalog snapshot for generation {generation}")
+        index = json.loads(buffer[index_offset : index_offset + index_length])
+        return MappedSnapshot(generation, buffer, index)
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Serialize writers across threads and processes."""
+
+        with self._thread_lock:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            with open(self._directory / "catalog.lock", "a") as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def write(self, generation: int, sections: Mapping[str, Iterable[EncodedItem]]) -> None:
+        """Write and publish ``generation``; callers must hold :meth:`lock`."""
+
+        path = self._data_path(generation)
+        temporary = path.with_suffix(".tmp")
+        index: Dict[str, Dict[str, List[Any]]] = {}
+        with open(temporary, "wb") as handle:
+            handle.write(b"\0" * _HEADER.size)
+            offset = _HEADER.size
+            for name, items in sections.items():
+                entries = index[name] = {}
+                for key, blob, value_digest, meta in items:
+                    handle.write(blob)
+                    entries[key] = [offset, len(blob), value_digest, meta]
+                    offset += len(blob)
+            encoded_index = json.dumps(index, separators=(",", ":")).encode("utf-8")
+            handle.write(encoded_index)
+            handle.seek(0)
+            handle.write(_HEADER.pack(_MAGIC, generation, offset, len(encoded_index)))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, path)
+        # Only flip the control word once the data file is complete.
+        _GENERATION.pack_into(self._control_map(), 0, generation)
+        self._prune(generation)
+
+    def _control_map(self) -> mmap.mmap:
+        if self._control is None:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self._directory / "catalog.ctl", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < _GENERATION.size:
+                    os.ftruncate(fd, _GENERATION.size)
+                self._control = mmap.mmap(fd, _GENERATION.size, access=mmap.ACCESS_WRITE)
+            finally:
+                os.close(fd)
+        return self._control
+
+    def _data_path(self, generation: int) -> Path:
+        return self._directory / f"catalog.{generation:016d}.snap"
+
+    def _prune(self, generation: int) -> None:
+        # Mapped files stay readable after unlinking, so readers still on an
+        # older generation are unaffected.
+        for path in self._directory.glob("catalog.*.snap"):
+            stored = int(path.suffixes[0].lstrip("."))
+            if stored <= generation - self._keep:
+                path.unlink(missing_ok=True)
+
+
+_snapshot_store: Optional[SnapshotStore] = None
+_snapshot_store_lock = threading.Lock()
+
+
+def get_snapshot_store() -> Optional[SnapshotStore]:
+    """Return the snapshot store configured in ``Settings`` or ``None``."""
+
+    global _snapshot_store
+    if not settings.catalog_snapshot_dir:
+        return None
+    with _snapshot_store_lock:
+        if _snapshot_store is None:
+            _snapshot_store = SnapshotStore(settings.catalog_snapshot_dir)
+        return _snapshot_store
@@ -0,0 +1,338 @@
+"""Durable storage backends for the rule catalog and evaluation proofs."""
+
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterable, List, Optional, Protocol
+
+from app.core.config import settings
+from app.models.schemas import ReferenceSetVersion, RuleVersion
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rule_versions (
+    stable_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (stable_id, version)
+);
+CREATE TABLE IF NOT EXISTS reference_sets (
+    name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (name, version)
+);
+CREATE TABLE IF NOT EXISTS proofs (
+    id TEXT PRIMARY KEY,
+    stable_id TEXT,
+    created_at TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS proofs_by_rule ON proofs (stable_id, created_at);
+CREATE TABLE IF NOT EXISTS catalog_revision (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    revision INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO catalog_revision (id, revision) VALUES (0, 0);
+"""
+
+
+class StorageConflictError(Exception):
+    """Raised when a new version was already stored, by another worker sharing the storage."""
+
+
+class CatalogStorage(Protocol):
+    """Persistence interface used by the catalog and proof store."""
+
+    def transaction(self) -> ContextManager[None]:
+        """Hold the catalog write lock shared by every worker; writes inside commit together."""
+
+    def revision(self) -> int:
+        """Return a counter bumped by every catalog write, whichever worker made it."""
+
+    def load_rule_versions(self) -> List[RuleVersion]:
+        """Return every stored rule version ordered by stable id and version."""
+
+    def latest_rule_version(self, stable_id: str) -> int:
+        """Return the highest stored version of a rule, or 0."""
+
+    def save_rule_versions(self, created: Iterable[RuleVersion], updated: Iterable[RuleVersion] = ()) -> None:
+        """Insert new and update existing rule versions in a single transaction.
+
+        Raises :class:`StorageConflictError` when a created version is already stored.
+        """
+
+    def load_reference_sets(self) -> List[ReferenceSetVersion]:
+        """Return every stored reference set version ordered by name and version."""
+
+    def latest_reference_set_version(self, name: str) -> int:
+        """Return the highest stored version of a reference set, or 0."""
+
+    def save_reference_set(self, reference_set: ReferenceSetVersion) -> None:
+        """Insert a new reference set version; :class:`StorageConflictError` when already stored."""
+
+    def add_proof(self, record: Dict[str, Any]) -> None:
+        """Queue a proof record for the next batched write."""
+
+    def load_proof(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        """Return a stored proof record or ``None``."""
+
+    def list_proofs(self, stable_id: str) -> List[Dict[str, Any]]:
+        """Return proof records for a rule in creation order."""
+
+    def flush(self) -> None:
+        """Write any buffered proofs."""
+
+    def clear_catalog(self) -> None:
+        """Remove every stored rule and reference set version."""
+
+    def clear_proofs(self) -> None:
+        """Remove every stored and buffered proof."""
+
+    def close(self) -> None:
+        """Flush pending writes and release resources."""
+
+    def namespace(self, name: str) -> "CatalogStorage":
+        """Return a storage of the same kind holding the separate catalog ``name``, safe in file names."""
+
+
+class SQLiteStorage:
+    """Catalog and proof storage on a local SQLite database in WAL mode.
+
+    Catalog writes are committed immediately. Several workers may share the
+    database: writers serialize on :meth:`transaction` (``BEGIN IMMEDIATE``)
+    and :meth:`revision` tells them whether another worker wrote since they
+    last loaded the catalog. New versions are inserted, never replaced, so a
+    version number picked twice fails instead of overwriting the first.
+
+    Proofs are buffered and written with one ``executemany`` transaction once
+    ``batch_size`` records are queued or the oldest buffered record is older
+    than ``flush_interval`` seconds, checked by a background thread; reads
+    flush the buffer first so they always observe every recorded proof.
+    """
+
+    def __init__(self, path: str, batch_size: int = 100, flush_interval: float = 1.0) -> None:
+        self._path = path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[tuple] = []
+        self._pending_since = 0.0
+        self._flusher: Optional[threading.Thread] = None
+        self._stop_flusher = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Catalog
+    # ------------------------------------------------------------------
+    def transaction(self) -> "_Transaction":
+        with self._lock:
+            return _Transaction(self._connection(), self._lock)
+
+    def revision(self) -> int:
+        return self._query("SELECT revision FROM catalog_revision")[0][0]
+
+    def load_rule_versions(self) -> List[RuleVersion]:
+        rows = self._query("SELECT payload FROM rule_versions ORDER BY stable_id, version")
+        return [RuleVersion.model_validate_json(payload) for (payload,) in rows]
+
+    def latest_rule_version(self, stable_id: str) -> int:
+        rows = self._query("SELECT MAX(version) FROM rule_versions WHERE stable_id = ?", (stable_id,))
+        return rows[0][0] or 0
+
+    def save_rule_versions(self, created: Iterable[RuleVersion], updated: Iterable[RuleVersion] = ()) -> None:
+        inserted = [(version.stable_id, version.version, version.model_dump_json()) for version in created]
+        replaced = [(version.model_dump_json(), version.stable_id, version.version) for version in updated]
+        with self.transaction() as conn:
+            try:
+                conn.executemany("INSERT INTO rule_versions (stable_id, version, payload) VALUES (?, ?, ?)", inserted)
+            except sqlite3.IntegrityError as exc:
+                raise StorageConflictError(f"A created rule version is already stored: {exc}") from exc
+            conn.executemany("UPDATE rule_versions SET payload = ? WHERE stable_id = ? AND version = ?", replaced)
+            _bump_revision(conn)
+
+    def load_reference_sets(self) -> List[ReferenceSetVersion]:
+        rows = self._query("SELECT payload FROM reference_sets ORDER BY name, version")
+        return [ReferenceSetVersion.model_validate_json(payload) for (payload,) in rows]
+
+    def latest_reference_set_version(self, name: str) -> int:
+        rows = self._query("SELECT MAX(version) FROM reference_sets WHERE name = ?", (name,))
+        return rows[0][0] or 0
+
+    def save_reference_set(self, reference_set: ReferenceSetVersion) -> None:
+        with self.transaction() as conn:
+            try:
+                conn.execute(
+                    "INSERT INTO reference_sets (name, version, payload) VALUES (?, ?, ?)",
+                    (reference_set.name, reference_set.version, reference_set.model_dump_json()),
+                )
+            except sqlite3.IntegrityError as exc:
+                raise StorageConflictError(
+                    f"Reference set '{reference_set.name}' v{reference_set.version} is already stored"
+                ) from exc
+            _bump_revision(conn)
+
+    # ------------------------------------------------------------------
+    # Proofs
+    # ------------------------------------------------------------------
+    def add_proof(self, record: Dict[str, Any]) -> None:
+        row = (record["id"], record.get("stable_id"), record["created_at"], json.dumps(record, default=str))
+        with self._lock:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append(row)
+            overdue = time.monotonic() - self._pending_since >= self._flush_interval
+            if len(self._pending) >= self._batch_size or overdue:
+                self.flush()
+            elif self._flusher is None:
+                # Started with the first buffered proof, so idle storage runs no thread.
+                self._stop_flusher.clear()
+                self._flusher = threading.Thread(target=self._flush_periodically, name="proof-flush", daemon=True)
+                self._flusher.start()
+
+    def load_proof(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        self.flush()
+        rows = self._query("SELECT payload FROM proofs WHERE id = ?", (artifact_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def list_proofs(self, stable_id: str) -> List[Dict[str, Any]]:
+        self.flush()
+        rows = self._query(
+            "SELECT payload FROM proofs WHERE stable_id = ? ORDER BY created_at, rowid",
+            (stable_id,),
+        )
+        return [json.loads(payload) for (payload,) in rows]
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            with self.transaction() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO proofs (id, stable_id, created_at, payload) VALUES (?, ?, ?, ?)",
+                    pending,
+                )
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def clear_catalog(self) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM rule_versions")
+            conn.execute("DELETE FROM reference_sets")
+            _bump_revision(conn)
+
+    def clear_proofs(self) -> None:
+        with self.transaction() as conn:
+            self._pending.clear()
+            conn.execute("DELETE FROM proofs")
+
+    def namespace(self, name: str) -> "SQLiteStorage":
+        """Return a storage on the database ``<stem>.<name><suffix>`` next to this one."""
+
+        if self._path == ":memory:":
+            return SQLiteStorage(self._path, self._batch_size, self._flush_interval)
+        path = Path(self._path)
+        return SQLiteStorage(
+            str(path.with_name(f"{path.stem}.{name}{path.suffix}")), self._batch_size, self._flush_interval
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            flusher, self._flusher = self._flusher, None
+            self._stop_flusher.set()
+        if flusher is not None:
+            flusher.join()
+        with self._lock:
+            if self._conn is None:
+                return
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+    def _flush_periodically(self) -> None:
+        """Write buffered proofs every ``flush_interval`` seconds until closed."""
+
+        while not self._stop_flusher.wait(self._flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logger.exception("Writing buffered proofs to %s failed", self._path)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connect lazily so importing the service never touches the disk.
+        if self._conn is None:
+            conn = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._connection().execute(sql, params).fetchall()
+
+
+class _Transaction:
+    """Context manager wrapping statements in ``BEGIN IMMEDIATE``/``COMMIT``.
+
+    Holds ``lock`` throughout. Transactions opened inside another one on the
+    same thread join it and commit or roll back with it.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.RLock) -> None:
+        self._conn = conn
+        self._lock = lock
+        self._outer = False
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._lock.acquire()
+        try:
+            self._outer = not self._conn.in_transaction
+            if self._outer:
+                self._conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self._lock.release()
+            raise
+        return self._conn
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        try:
+            if self._outer:
+                self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._lock.release()
+
+
+def _bump_revision(conn: sqlite3.Connection) -> None:
+    conn.execute("UPDATE catalog_revision SET revision = revision + 1")
+
+
+_storage: Optional[CatalogStorage] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> Optional[CatalogStorage]:
+    """Return the storage backend selected in ``Settings`` or ``None`` for memory."""
+
+    global _storage
+    if settings.storage_backend == "memory":
+        return None
+    with _storage_lock:
+        if _storage is None:
+            if settings.storage_backend != "sqlite":
+                raise ValueError(f"Unsupported storage backend '{settings.storage_backend}'")
+            _storage = SQLiteStorage(
+                settings.sqlite_path,
+                batch_size=settings.proof_batch_size,
+                flush_interval=settings.proof_flush_interval,
+            )
+        return _storage
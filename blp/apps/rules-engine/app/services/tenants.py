@@ -0,0 +1,169 @@
+"""Per-tenant namespaces of the rule catalog and proof store."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+from urllib.parse import quote
+
+from app.core.config import settings
+from app.services.catalog import RuleCatalogService, get_catalog_service
+from app.services.evaluator import EvaluatorService, get_evaluator_service
+from app.services.profiling import ProfileStore, get_profile_store
+from app.services.proofs import EvaluationProofStore, get_evaluation_proof_store
+from app.services.redis_catalog import RedisCatalogStore, get_redis_catalog_store
+from app.services.regression import RegressionService, get_regression_service
+from app.services.snapshots import SnapshotStore, get_snapshot_store
+from app.services.storage import CatalogStorage, get_storage
+
+
+@dataclass(frozen=True)
+class TenantNamespace:
+    """Catalog, proof store, regression runner and evaluation profiles of one tenant."""
+
+    catalog: RuleCatalogService
+    proof_store: EvaluationProofStore
+    regressions: RegressionService
+    profiles: ProfileStore
+
+
+class TenantRegistry:
+    """Tenant namespaces layered over a shared base namespace.
+
+    Each tenant gets its own :class:`RuleCatalogService`, created on first
+    use with the base catalog as its ``base``, so global rules and reference
+    sets are inherited without being copied and tenant writes never touch the
+    base or other tenants. Tenant catalogs are kept in the ``storage``,
+    ``snapshots`` or ``redis`` backend of the base catalog, in a separate
+    database, directory or key prefix named after the tenant. Every tenant
+    holds at most ``max_rule_versions`` rule versions of its own (unbounded
+    when 0), its ``max_proofs`` most recent proofs and the evaluation
+    profiles of ``max_profiled_rules`` rule versions.
+
+    At most ``max_namespaces`` tenants are loaded (unbounded when 0); the
+    least recently used one is dropped first and reloaded from its backend
+    on next use. Without a backend, a dropped tenant starts over empty.
+
+    Requests without a tenant use the base namespace itself.
+    """
+
+    def __init__(
+        self,
+        base: TenantNamespace,
+        evaluator: EvaluatorService,
+        max_rule_versions: int = 0,
+        max_proofs: int = 10000,
+        max_profiled_rules: int = 256,
+        max_profile_stacks: int = 1024,
+        max_namespaces: int = 0,
+        storage: Optional[CatalogStorage] = None,
+        snapshots: Optional[SnapshotStore] = None,
+        redis: Optional[RedisCatalogStore] = None,
+    ) -> None:
+        self._base = base
+        self._evaluator = evaluator
+        self._max_rule_versions = max_rule_versions
+        self._max_proofs = max_proofs
+        self._max_profiled_rules = max_profiled_rules
+        self._max_profile_stacks = max_profile_stacks
+        self._max_namespaces = max_namespaces
+        self._storage = storage
+        self._snapshots = snapshots
+        self._redis = redis
+        self._tenants: "OrderedDict[str, TenantNamespace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def base(self) -> TenantNamespace:
+        return self._base
+
+    def namespace(self, tenant: Optional[str]) -> TenantNamespace:
+        """Return the namespace of ``tenant``, loading it on first use."""
+
+        if not tenant:
+            return self._base
+        evicted: List[TenantNamespace] = []
+        with self._lock:
+            namespace = self._tenants.get(tenant)
+            if namespace is not None:
+                self._tenants.move_to_end(tenant)
+                return namespace
+            namespace = self._tenants[tenant] = self._create(tenant)
+            while self._max_namespaces and len(self._tenants) > self._max_namespaces:
+                evicted.append(self._tenants.popitem(last=False)[1])
+        for dropped in evicted:
+            dropped.catalog.close()
+        return namespace
+
+    def _create(self, tenant: str) -> TenantNamespace:
+        # Escaped so tenant ids are safe as file names and Redis key parts.
+        key = quote(tenant, safe="").replace(".", "%2E")
+        catalog = RuleCatalogService(
+            storage=self._storage.namespace(key) if self._storage is not None else None,
+            snapshots=self._snapshots.namespace(key) if self._snapshots is not None else None,
+            redis=self._redis.namespace(key) if self._redis is not None else None,
+            base=self._base.catalog,
+            max_rule_versions=self._max_rule_versions,
+        )
+        proof_store = EvaluationProofStore(max_artifacts=self._max_proofs)
+        return TenantNamespace(
+            catalog=catalog,
+            proof_store=proof_store,
+            regressions=RegressionService(catalog, self._evaluator, proof_store),
+            profiles=ProfileStore(max_rules=self._max_profiled_rules, max_stacks=self._max_profile_stacks),
+        )
+
+    def tenants(self) -> List[str]:
+        """Return the tenants with a loaded namespace, sorted."""
+
+        with self._lock:
+            return sorted(self._tenants)
+
+    def namespaces(self) -> List[TenantNamespace]:
+        """Return the loaded tenant namespaces, excluding the base namespace."""
+
+        with self._lock:
+            return list(self._tenants.values())
+
+    def clear(self) -> None:
+        """Clear and drop every loaded tenant namespace; the base namespace is left as is."""
+
+        with self._lock:
+            namespaces = list(self._tenants.values())
+            self._tenants.clear()
+        for namespace in namespaces:
+            namespace.catalog.clear()
+            namespace.catalog.close()
+
+
+_tenant_registry: Optional[TenantRegistry] = None
+_tenant_registry_lock = threading.Lock()
+
+
+def get_tenant_registry() -> TenantRegistry:
+    """Return the singleton tenant registry over the configured services, built on first use."""
+
+    global _tenant_registry
+    with _tenant_registry_lock:
+        if _tenant_registry is None:
+            base = TenantNamespace(
+                catalog=get_catalog_service(),
+                proof_store=get_evaluation_proof_store(),
+                regressions=get_regression_service(),
+                profiles=get_profile_store(),
+            )
+            _tenant_registry = TenantRegistry(
+                base,
+                get_evaluator_service(),
+                max_rule_versions=settings.tenant_max_rule_versions,
+                max_proofs=settings.tenant_max_proofs,
+                max_profiled_rules=settings.profile_max_rules,
+                max_profile_stacks=settings.profile_max_stacks,
+                max_namespaces=settings.tenant_max_namespaces,
+                storage=get_storage(),
+                snapshots=get_snapshot_store(),
+                redis=get_redis_catalog_store(),
+            )
+        return _tenant_registry
@@ -0,0 +1,72 @@
+"""Tests covering per-tenant admission control."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient
+
+from app.api.admission import AdmissionController, AdmissionMiddleware, AdmissionRejected
+from app.main import create_app
+
+
+def test_concurrency_limits_queue_and_shed_per_tenant() -> None:
+    async def scenario(controller: AdmissionController) -> None:
+        await controller.acquire("tenant-a")
+        waiting = asyncio.ensure_future(controller.acquire("tenant-a"))
+        await asyncio.sleep(0)
+        assert controller.queue_depth == 1
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("tenant-a")
+        assert rejected.value.reason == "queue_full"
+
+        # Other tenants are unaffected, and a released slot goes to the waiter.
+        await controller.acquire("tenant-b")
+        controller.release("tenant-a")
+        await waiting
+        assert (controller.active, controller.queue_depth) == (2, 0)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("tenant-a")
+        assert rejected.value.reason == "queue_timeout"
+        assert controller.queue_depth == 0
+
+        # A waiter that goes away leaves the queue.
+        cancelled = asyncio.ensure_future(controller.acquire("tenant-a"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        controller.release("tenant-a")
+        controller.release("tenant-b")
+        assert (controller.active, controller.queue_depth) == (0, 0)
+
+    controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.05)
+    asyncio.run(scenario(controller))
+    assert controller.shed == {"rate_limited": 0, "queue_full": 1, "queue_timeout": 1}
+
+
+def test_rate_limited_requests_get_fast_429() -> None:
+    now = [0.0]
+    controller = AdmissionController(rate=2.0, burst=2, clock=lambda: now[0])
+    client = TestClient(AdmissionMiddleware(create_app(), controller))
+    payload = {"logic": {"var": "a"}, "context": {"a": 1}}
+    headers = {"x-tenant-id": "backfill"}
+
+    assert [client.post("/eval", json=payload, headers=headers).status_code for _ in range(2)] == [200, 200]
+    shed = client.post("/eval", json=payload, headers=headers)
+    assert shed.status_code == 429
+    assert shed.headers["retry-after"] == "1"
+    # Other tenants and routes outside /eval are not limited.
+    assert client.post("/eval", json=payload, headers={"x-tenant-id": "online"}).status_code == 200
+    assert client.get("/rules", headers=headers).status_code == 200
+
+    now[0] += 0.5
+    assert client.post("/eval", json=payload, headers=headers).status_code == 200
+    assert controller.shed["rate_limited"] == 1
+    assert controller.active == 0
@@ -0,0 +1,320 @@
+"""Tests covering the rule catalog service."""
+
+from __future__ import annotations
+
+import asyncio
+import gc
+import sys
+import threading
+import time
+from copy import deepcopy
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.dsl.operators import EvaluationError, get_json_logic
+from app.models.schemas import ReferenceSetCreateRequest, RuleCreateRequest
+from app.services import exports
+from app.services.bulk import check_definitions
+from app.services.catalog import RuleCatalogService
+from app.services.evaluator import EvaluatorService, _CatalogExports
+from app.services.redis_catalog import InMemoryRedis, RedisCatalogStore
+from app.services.snapshots import SnapshotStore
+
+
+def _create(catalog: RuleCatalogService, stable_id: str, value: int) -> None:
+    catalog.create_rule_version(
+        RuleCreateRequest(stable_id=stable_id, name=stable_id, definition={"==": [{"var": "x"}, value]})
+    )
+
+
+def test_readers_never_observe_partial_publication() -> None:
+    catalog = RuleCatalogService()
+    for value in range(3):
+        _create(catalog, "toggle", value)
+
+    held = catalog.get_rule_version("toggle", 1)
+    stop = threading.Event()
+    failures = []
+
+    def read() -> None:
+        while not stop.is_set():
+            snapshot = catalog.list_rules()
+            published = catalog.get_rule_version("toggle")
+            if published.status != "published" or published.published_at is None:
+                failures.append(published)
+            if snapshot.rules[0].published_version not in (1, 2, 3):
+                failures.append(snapshot.rules[0])
+
+    catalog.publish_rule_version("toggle", 1)
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for round_ in range(300):
+        catalog.publish_rule_version("toggle", round_ % 3 + 1)
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert failures == []
+    statuses = [catalog.get_rule_version("toggle", version).status for version in (1, 2, 3)]
+    assert statuses.count("published") == 1
+    # Versions handed out earlier are immutable and keep their original state.
+    assert held.status == "draft"
+
+
+def test_concurrent_writers_are_serialized() -> None:
+    catalog = RuleCatalogService()
+    threads = [
+        threading.Thread(target=lambda idx=idx: [_create(catalog, f"rule-{idx}", value) for value in range(20)])
+        for idx in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    listing = catalog.list_rules()
+    assert listing.total == 4
+    assert all(summary.latest_version == 20 for summary in listing.rules)
+    assert catalog.revision == 80
+
+
+def test_workers_share_memory_mapped_generations(tmp_path: Path) -> None:
+    writer = RuleCatalogService(snapshots=SnapshotStore(str(tmp_path)))
+    reader = RuleCatalogService(snapshots=SnapshotStore(str(tmp_path)))
+
+    _create(writer, "shared", 1)
+    _create(reader, "shared", 2)
+    _create(writer, "other", 3)
+    writer.publish_rule_version("shared", 2)
+
+    assert reader.revision == writer.revision == 4
+    # Generations written elsewhere are diffed by digest for the change feed.
+    assert [summary.stable_id for summary in reader.changes_since(2).rules] == ["other", "shared"]
+    assert reader.get_rule_version("shared").version == 2
+    assert reader.get_rule_version("shared", 1).status == "draft"
+    assert [summary.stable_id for summary in reader.list_rules().rules] == ["other", "shared"]
+
+    # Untouched entries keep their decoded objects across generations.
+    other = reader.get_rule_version("other")
+    writer.create_reference_set_version(ReferenceSetCreateRequest(name="states", values=["CA"]))
+    assert reader.resolve_reference_set("states") == (1, frozenset({"CA"}))
+    assert reader.get_rule_version("other") is other
+
+    # A worker started later maps the current generation instead of starting empty.
+    late = RuleCatalogService(snapshots=SnapshotStore(str(tmp_path)))
+    assert late.get_rule_version("shared", prefer_latest=True).version == 2
+    assert sorted(path.name for path in tmp_path.glob("*.snap")) == [
+        "catalog.0000000000000004.snap",
+        "catalog.0000000000000005.snap",
+    ]
+
+
+def _wait_for(condition) -> None:
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for invalidation"
+        time.sleep(0.01)
+
+
+def test_redis_catalog_keeps_instances_consistent() -> None:
+    server = InMemoryRedis()
+    first = RuleCatalogService(redis=RedisCatalogStore(server))
+    second = RuleCatalogService(redis=RedisCatalogStore(server))
+
+    _create(first, "shared", 1)
+    assert second.get_rule_version("shared").version == 1
+    # Writers catch up before allocating versions even if a message is still in flight.
+    _create(second, "shared", 2)
+    first_definition = second.get_rule_version("shared", 1).definition
+
+    first.publish_rule_version("shared", 2)
+    first.create_reference_set_version(ReferenceSetCreateRequest(name="states", values=["CA"]))
+    _wait_for(lambda: second.revision == first.revision == 4)
+    assert second.get_rule_version("shared").version == 2
+    assert second.get_rule_version("shared", 1).status == "draft"
+    assert second.resolve_reference_set("states") == (1, frozenset({"CA"}))
+    # Reloaded definitions are interned, so cached compiled forms stay valid.
+    assert second.get_rule_version("shared", 1).definition is first_definition
+
+    # A new instance loads the shared state; clearing propagates everywhere.
+    third = RuleCatalogService(redis=RedisCatalogStore(server))
+    assert third.list_rules().total == 1
+    third.clear()
+    _wait_for(lambda: first.list_rules().total == second.list_rules().total == 0)
+
+
+def test_bulk_definition_checks_run_in_parallel() -> None:
+    definitions = [{"==": [{"var": "x"}, idx]} for idx in range(300)]
+    definitions[7] = {"bogus": []}
+    definitions[9] = {"bl_rule": "other"}
+
+    checks = check_definitions(definitions, workers=2)
+
+    assert len(checks) == 300
+    assert checks[7][0] == "Unsupported operator 'bogus'"
+    assert checks[9] == (None, True)
+    assert checks[0] == (None, False)
+
+
+def test_created_versions_share_interned_subtrees() -> None:
+    catalog = RuleCatalogService()
+    fee = catalog.create_rule_version(
+        RuleCreateRequest(stable_id="fee", name="Fee", definition={"*": [{"var": "amount"}, 0.01]})
+    )
+    cap = catalog.create_rule_version(
+        RuleCreateRequest(stable_id="cap", name="Cap", definition={"min": [{"var": "amount"}, 500]})
+    )
+    assert fee.definition["*"][0] is cap.definition["min"][0]
+
+
+def test_bulk_import_interns_only_stored_definitions() -> None:
+    catalog = RuleCatalogService()
+    items = [
+        RuleCreateRequest(stable_id="fee", name="Fee", definition={"*": [{"var": "amount"}, 0.01]}),
+        RuleCreateRequest(stable_id="bad", name="Bad", definition={"+": [{"bl_rule": "unknown"}, {"var": "z"}]}),
+    ]
+    response = catalog.import_rules(items)
+    assert [result.status for result in response.results] == ["created", "failed"]
+    interned = catalog._interner._nodes.values()
+    assert {"var": "amount"} in interned
+    assert {"var": "z"} not in interned and {"bl_rule": "unknown"} not in interned
+
+
+def test_catalog_exports_round_trip_with_compiled_tables(tmp_path: Path) -> None:
+    shared = {"inputs": [{"var": "score"}], "rules": [{"when": [{">=": 700}], "then": "prime"}], "default": "sub"}
+    source = RuleCatalogService()
+    source.create_rule_version(RuleCreateRequest(stable_id="tier", name="tier", definition={"bl_table": shared}))
+    source.create_rule_version(
+        RuleCreateRequest(stable_id="tier-copy", name="copy", definition={"bl_table": deepcopy(shared)})
+    )
+    source.publish_rule_version("tier", 1)
+    source.create_reference_set_version(ReferenceSetCreateRequest(name="states", values=["CA", "NY"]))
+    path = tmp_path / "catalog.blcat"
+    assert source.export_snapshot(str(path), include_compiled=True) == 2
+
+    target = RuleCatalogService()
+    assert target.import_snapshot(str(path)) == 2
+    rule = target.get_rule_version("tier")
+    assert rule.status == "published" and rule.created_at == source.get_rule_version("tier").created_at
+    assert target.resolve_reference_set("states") == (1, frozenset({"CA", "NY"}))
+    # Interned subtrees stay shared and their compiled tables are preloaded.
+    table = rule.definition["bl_table"]
+    assert target.get_rule_version("tier-copy").definition["bl_table"] is table
+    logic = get_json_logic()
+    assert logic._compiled[("bl_table", id(table))][0] is table
+    assert logic.evaluate(rule.definition, {"score": 720}, resolver=target)[0] == "prime"
+
+    # Files written by another Python or application version are treated the same way.
+    content = bytearray(path.read_bytes())
+    magic, flags, marshal_version, major, minor, app, *rest = exports._HEADER.unpack_from(content)
+    exports._HEADER.pack_into(content, 0, magic, flags, marshal_version, major, minor + 1, app, *rest)
+    foreign = tmp_path / "foreign.blcat"
+    foreign.write_bytes(bytes(content))
+    read = exports.read_catalog_export(str(foreign))
+    assert not read.verified and read.compiled is None
+    assert RuleCatalogService().import_snapshot(str(foreign)) == 2
+
+    # A corrupted file is validated in full and its compiled section is ignored.
+    content = bytearray(path.read_bytes())
+    content[-1] ^= 0xFF
+    path.write_bytes(bytes(content))
+    other = RuleCatalogService()
+    assert other.import_snapshot(str(path)) == 2
+    assert other.get_rule_version("tier").definition == rule.definition
+    path.write_bytes(b"garbage")
+    with pytest.raises(ValueError):
+        other.import_snapshot(str(path))
+
+
+def test_incremental_exports_merge_only_changed_entries(tmp_path: Path) -> None:
+    base = RuleCatalogService()
+    _create(base, "fee", 1)
+    namespace = RuleCatalogService(base=base)
+    _create(namespace, "limit", 1)
+    namespace.create_reference_set_version(ReferenceSetCreateRequest(name="states", values=["CA"]))
+    mark = namespace.export_changes(str(tmp_path / "full.blcat"))
+    assert mark.complete
+    target = RuleCatalogService()
+    target.import_snapshot(str(tmp_path / "full.blcat"))
+
+    # The namespace shadows the inherited rule: its entry replaces the merged one.
+    namespace.create_rule_version(
+        RuleCreateRequest(stable_id="fee", name="fee", definition={"+": [1]}, labels={"team": "risk"})
+    )
+    namespace.create_reference_set_version(ReferenceSetCreateRequest(name="states", values=["NY"]))
+    _create(base, "bonus", 3)
+    mark = namespace.export_changes(str(tmp_path / "delta.blcat"), since=mark)
+    assert not mark.complete
+    assert target.import_snapshot(str(tmp_path / "delta.blcat"), merge=True) == 2
+    assert target.list_rules() == namespace.list_rules()
+    assert target.list_rules(labels={"team": "risk"}).total == 1
+    assert target.resolve_reference_set("states") == namespace.resolve_reference_set("states")
+    assert target.get_rule_version("fee") == namespace.get_rule_version("fee")
+    assert target.get_rule_version("fee").definition == {"+": [1]}
+
+    namespace.clear()
+    assert namespace.export_changes(str(tmp_path / "reset.blcat"), since=mark).complete
+
+
+def test_catalog_exports_are_released_with_their_catalog() -> None:
+    exports = _CatalogExports()
+    catalog = RuleCatalogService()
+    _create(catalog, "fee", 1)
+    try:
+        first, _ = exports.current(catalog)
+        _create(catalog, "limit", 2)
+        base, deltas = exports.current(catalog)
+        assert base == first and len(deltas) == 1
+        assert exports.current(catalog) == (base, deltas)
+        assert Path(base).exists() and Path(deltas[0]).exists()
+
+        # Dropping the catalog, as when a tenant is evicted, removes its exports.
+        del catalog
+        gc.collect()
+        assert not Path(base).exists() and not Path(deltas[0]).exists()
+        assert len(exports._chains) == 0
+    finally:
+        exports.close()
+
+
+@pytest.mark.parametrize("executor", ["inline", "thread", "process"])
+def test_evaluator_backends_resolve_the_current_catalog(executor: str) -> None:
+    catalog = RuleCatalogService()
+    table = {"inputs": [{"var": "score"}], "rules": [{"when": [{">=": 700}], "then": "prime"}], "default": "sub"}
+    catalog.create_rule_version(RuleCreateRequest(stable_id="tier", name="tier", definition={"bl_table": table}))
+    catalog.create_reference_set_version(ReferenceSetCreateRequest(name="states", values=["CA", "NY"]))
+    logic = {"if": [{"bl_in_set": [{"var": "state"}, "states"]}, {"bl_rule": "tier"}, "out of state"]}
+    evaluator = EvaluatorService(executor=executor, workers=2)
+    evaluator.start(catalog)
+
+    async def evaluate(context):
+        return await evaluator.evaluate_raw_async(logic, context, resolver=catalog)
+
+    try:
+        first = asyncio.run(evaluate({"score": 720, "state": "CA"}))
+        assert first.result == "prime"
+        assert first.trace == EvaluatorService().evaluate_raw(logic, {"score": 720, "state": "CA"}, catalog).trace
+        assert asyncio.run(evaluate({"score": 600, "state": "TX"})).result == "out of state"
+        # Workers pick up catalog changes.
+        catalog.create_reference_set_version(ReferenceSetCreateRequest(name="states", values=["TX"]))
+        assert asyncio.run(evaluate({"score": 600, "state": "TX"})).result == "sub"
+        gold = {**table, "rules": [{"when": [{">=": 700}], "then": "gold"}]}
+        catalog.create_rule_version(RuleCreateRequest(stable_id="tier", name="tier", definition={"bl_table": gold}))
+        assert asyncio.run(evaluate({"score": 720, "state": "TX"})).result == "gold"
+        with pytest.raises(EvaluationError):
+            asyncio.run(evaluator.evaluate_raw_async({"bl_rule": "missing-rule"}, {}, resolver=catalog))
+
+        # Catalog rules are named, not shipped: workers evaluate their own copy.
+        definition = catalog.get_rule_version("tier", 1, prefer_latest=True).definition
+        shipped = definition if executor != "process" else {"bogus": []}
+        rule = asyncio.run(evaluator.evaluate_raw_async(shipped, {"score": 720}, resolver=catalog, rule=("tier", 1)))
+        assert rule.result == "prime"
+        if executor == "process":
+            with pytest.raises(EvaluationError):
+                asyncio.run(evaluator.evaluate_raw_async({}, {}, resolver=catalog, rule=("tier", 9)))
+    finally:
+        evaluator.close()
@@ -0,0 +1,84 @@
+"""Tests covering the in-process rules engine client."""
+
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient
+
+from app.client import RulesEngineClient
+from app.dsl.operators import EvaluationError
+from app.main import create_app
+from app.services.catalog import RuleNotFoundError, RuleVersionNotFoundError, get_catalog_service
+from app.services.proofs import get_evaluation_proof_store
+
+_DEFINITION = {"if": [{">=": [{"var": "applicant.credit_score"}, 700]}, "approve", "manual-review"]}
+
+
+def test_import_has_no_side_effects() -> None:
+    script = (
+        "import sys, app.client\n"
+        "import app.services.catalog as catalog, app.services.proofs as proofs\n"
+        "loaded = [m for m in sys.modules if m.split('.')[0] in ('fastapi', 'opentelemetry') or m == 'app.main']\n"
+        "assert not loaded, loaded\n"
+        "assert catalog._catalog_service is None and proofs._proof_store is None\n"
+    )
+    subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).resolve().parents[1], check=True)
+
+
+def test_client_matches_http_semantics(tmp_path: Path) -> None:
+    (tmp_path / "loan-decision.json").write_text(json.dumps({"name": "Loan", "definition": _DEFINITION}))
+    (tmp_path / "broken.json").write_text("{not json")
+    context = {"applicant": {"credit_score": 720}}
+
+    with RulesEngineClient.from_directory(str(tmp_path)) as engine:
+        assert list(engine.directory_report.failed) == [str(tmp_path / "broken.json")]
+        response = engine.evaluate("loan-decision", context)
+        context["applicant"]["credit_score"] = 0
+        assert engine.get_proof(response.proof.id).context == {"applicant": {"credit_score": 720}}
+
+        get_catalog_service().clear()
+        get_evaluation_proof_store().clear()
+        http = TestClient(create_app())
+        http.post("/rules", json={"stable_id": "loan-decision", "name": "Loan", "definition": _DEFINITION})
+        http.post("/rules/loan-decision/publish", json={"version": 1})
+        expected = http.post(
+            "/eval", json={"stable_id": "loan-decision", "context": {"applicant": {"credit_score": 720}}}
+        ).json()
+        actual = response.model_dump(mode="json")
+        for body in (actual, expected):
+            body["proof"].pop("id")
+            body["proof"].pop("created_at")
+        assert actual == expected
+
+        # Errors are the exceptions the routes translate into status codes.
+        with pytest.raises(RuleNotFoundError):
+            engine.evaluate("missing-rule")
+        with pytest.raises(RuleVersionNotFoundError):
+            engine.evaluate("loan-decision", version=5)
+        with pytest.raises(ValidationError):
+            engine.evaluate(context={})
+        with pytest.raises(EvaluationError):
+            engine.evaluate(logic={"/": [1, 0]})
+
+        engine.create_rule({"stable_id": "loan-decision", "name": "Loan", "definition": {"var": "applicant.credit_score"}})
+        assert engine.evaluate("loan-decision", context).result == "manual-review"
+        assert engine.evaluate("loan-decision", context, prefer_latest=True).result == 0
+        report = engine.run_regressions("loan-decision", [{"name": "prime", "context": context, "expected": "approve"}])
+        assert (report.passed, report.failed) == (0, 1)
+
+        export = tmp_path / "catalog.blcat"
+        engine.catalog.export_snapshot(str(export))
+    restored = RulesEngineClient.from_snapshot(str(export))
+    assert [rule.stable_id for rule in restored.list_rules().rules] == ["loan-decision"]
+    assert restored.evaluate("loan-decision", {"applicant": {"credit_score": 705}}).result == "approve"
+    get_catalog_service().clear()
+    get_evaluation_proof_store().clear()
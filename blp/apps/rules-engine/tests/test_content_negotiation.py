@@ -0,0 +1,139 @@
+"""Round-trip tests asserting MessagePack and JSON requests behave identically."""
+
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient
+
+from app.api.negotiation import MSGPACK_MEDIA_TYPE
+from app.main import create_app
+from app.services.catalog import get_catalog_service
+from app.services.proofs import get_evaluation_proof_store
+
+msgpack = pytest.importorskip("msgpack")
+
+# Values that legitimately differ between two runs of the same scenario.
+_VOLATILE_KEYS = {"id", "created_at", "updated_at", "published_at"}
+
+_DEFINITION = {"if": [{">=": [{"var": "applicant.credit_score"}, 700]}, "approve", "manual-review"]}
+
+# (method, url, payload) executed in order against a fresh catalog.
+_SCENARIO: List[Tuple[str, str, Optional[Any]]] = [
+    ("POST", "/rules", {"stable_id": "loan-decision", "name": "Loan", "definition": _DEFINITION}),
+    ("POST", "/rules", {"stable_id": "broken-rule", "name": "Broken", "definition": {"bogus": []}}),
+    ("POST", "/rules", {"stable_id": "x", "name": "Too short", "definition": _DEFINITION}),
+    ("POST", "/rules/loan-decision/publish", {"version": 1, "notes": "go live"}),
+    ("GET", "/rules/loan-decision", None),
+    ("GET", "/rules/missing-rule", None),
+    ("GET", "/rules?labels=product", None),
+    ("GET", "/rules", None),
+    (
+        "PUT",
+        "/rules/loan-decision/regressions",
+        {
+            "version": 1,
+            "cases": [
+                {"name": "prime", "context": {"applicant": {"credit_score": 720}}, "expected": "approve"},
+                {"name": "thin", "context": {"applicant": {"credit_score": 610}}, "expected": "approve"},
+            ],
+        },
+    ),
+    ("POST", "/eval", {"stable_id": "loan-decision", "context": {"applicant": {"credit_score": 705.5}}}),
+    ("POST", "/eval", {"logic": {"/": [{"var": "a"}, 0]}, "context": {"a": 1}}),
+    ("POST", "/eval", {"context": {"applicant": {}}}),
+    ("POST", "/eval/regressions", {"stable_id": "loan-decision"}),
+    (
+        "POST",
+        "/rules/bulk",
+        [
+            {"stable_id": "bulk-one", "name": "One", "definition": {"==": [{"var": "x"}, 1]}},
+            {"stable_id": "bulk-two", "name": "Two", "definition": {"bl_rule": "bulk-one"}},
+            {"stable_id": "bulk-bad", "name": "Bad", "definition": {"bl_rule": "unknown-rule"}},
+        ],
+    ),
+]
+
+
+@pytest.fixture(autouse=True)
+def reset_state() -> None:
+    get_catalog_service().clear()
+    get_evaluation_proof_store().clear()
+    yield
+    get_catalog_service().clear()
+    get_evaluation_proof_store().clear()
+
+
+@pytest.fixture
+def client() -> TestClient:
+    return TestClient(create_app())
+
+
+def _call(client: TestClient, encoding: str, method: str, url: str, payload: Any) -> Tuple[int, Any]:
+    headers = {}
+    content = None
+    if encoding == "msgpack":
+        headers["accept"] = MSGPACK_MEDIA_TYPE
+        if payload is not None:
+            headers["content-type"] = MSGPACK_MEDIA_TYPE
+            content = msgpack.packb(payload)
+    elif payload is not None:
+        headers["content-type"] = "application/json"
+        content = json.dumps(payload).encode("utf-8")
+    response = client.request(method, url, content=content, headers=headers)
+    expected_type = MSGPACK_MEDIA_TYPE if encoding == "msgpack" else "application/json"
+    assert response.headers["content-type"] == expected_type, (method, url)
+    body = msgpack.unpackb(response.content) if encoding == "msgpack" else response.json()
+    return response.status_code, _normalise(body)
+
+
+def _normalise(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: "<volatile>" if key in _VOLATILE_KEYS else _normalise(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalise(item) for item in value]
+    return value
+
+
+def _run(client: TestClient, encoding: str) -> List[Tuple[int, Any]]:
+    get_catalog_service().clear()
+    get_evaluation_proof_store().clear()
+    return [_call(client, encoding, method, url, payload) for method, url, payload in _SCENARIO]
+
+
+def test_msgpack_round_trips_match_json(client: TestClient) -> None:
+    via_json = _run(client, "json")
+    via_msgpack = _run(client, "msgpack")
+
+    assert [status for status, _ in via_json] == [201, 400, 422, 200, 200, 404, 400, 200, 200, 200, 400, 422, 200, 200]
+    for (method, url, _), expected, actual in zip(_SCENARIO, via_json, via_msgpack):
+        assert actual == expected, (method, url)
+
+
+def test_msgpack_negotiation_edge_cases(client: TestClient) -> None:
+    payload = {"logic": {"var": "a"}, "context": {"a": 1}}
+    # JSON requests may ask for MessagePack responses and vice versa.
+    response = client.post("/eval", json=payload, headers={"accept": MSGPACK_MEDIA_TYPE})
+    assert msgpack.unpackb(response.content)["result"] == 1
+    response = client.post(
+        "/eval", content=msgpack.packb(payload), headers={"content-type": MSGPACK_MEDIA_TYPE, "accept": "*/*"}
+    )
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["result"] == 1
+    # JSON stays preferred when ranked higher.
+    response = client.post("/eval", json=payload, headers={"accept": f"application/json, {MSGPACK_MEDIA_TYPE};q=0.5"})
+    assert response.headers["content-type"] == "application/json"
+
+    broken = client.post("/eval", content=b"\xc1", headers={"content-type": MSGPACK_MEDIA_TYPE})
+    assert broken.status_code == 422
+    assert broken.json()["detail"][0]["type"] == "json_invalid"
+    # Routes outside /eval and /rules keep answering JSON.
+    response = client.get("/reference-sets", headers={"accept": MSGPACK_MEDIA_TYPE})
+    assert response.headers["content-type"] == "application/json"
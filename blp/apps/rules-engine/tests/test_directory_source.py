@@ -0,0 +1,63 @@
+"""Tests covering the directory backed rule source."""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services.catalog import RuleCatalogService
+from app.services.directory_source import DirectoryRuleSource
+
+
+def _write(path: Path, payload: object) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(payload if isinstance(payload, str) else json.dumps(payload))
+    # Make every rewrite visible even on filesystems with coarse timestamps.
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_directory_changes_are_hot_swapped(tmp_path: Path) -> None:
+    catalog = RuleCatalogService()
+    _write(tmp_path / "credit" / "min-score.json", {"name": "Min score", "definition": {">=": [{"var": "s"}, 600]}})
+    _write(
+        tmp_path / "composite.json",
+        {"stable_id": "composite", "name": "Composite", "definition": {"bl_rule": "min-score"}},
+    )
+    source = DirectoryRuleSource(str(tmp_path), catalog=catalog)
+
+    report = source.scan()
+    assert sorted(report.loaded) == ["composite", "min-score"]
+    assert catalog.get_rule_version("min-score").status == "published"
+    revision = catalog.revision
+
+    # Nothing changed: no catalog write and no new versions.
+    assert source.scan().loaded == []
+    assert catalog.revision == revision
+
+    # A broken edit is reported and the published version keeps serving.
+    _write(tmp_path / "credit" / "min-score.json", "{not json")
+    report = source.scan()
+    assert list(report.failed) == [str(tmp_path / "credit" / "min-score.json")]
+    assert catalog.get_rule_version("min-score").version == 1
+
+    _write(tmp_path / "credit" / "min-score.json", {"name": "Min score", "definition": {">=": [{"var": "s"}, 640]}})
+    report = source.scan()
+    assert report.loaded == ["min-score"]
+    published = catalog.get_rule_version("min-score")
+    assert (published.version, published.definition) == (2, {">=": [{"var": "s"}, 640]})
+    assert catalog.get_rule_version("composite").version == 1
+
+
+def test_rejected_files_are_retried_when_dependencies_appear(tmp_path: Path) -> None:
+    catalog = RuleCatalogService()
+    _write(tmp_path / "rule-a.json", {"name": "A", "definition": {"bl_rule": "rule-b"}})
+    source = DirectoryRuleSource(str(tmp_path), catalog=catalog)
+    assert "Unknown rule 'rule-b'" in source.scan().failed[str(tmp_path / "rule-a.json")]
+
+    _write(tmp_path / "rule-b.json", {"name": "B", "definition": {"==": [1, 1]}})
+    assert sorted(source.scan().loaded) == ["rule-a", "rule-b"]
@@ -2,19 +2,37 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
 import sys
+import threading
 from pathlib import Path
 from typing import Dict
 
 import pytest
 
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 from fastapi.testclient import TestClient
 
+from app.api.fastjson import dumps
+from app.cli import import_rules
 from app.main import create_app
+from app.models.schemas import EvaluationResponse, RegressionRunRequest, RuleCreateRequest
 from app.services.catalog import get_catalog_service
+from app.services.evaluator import EvaluatorService
 from app.services.proofs import get_evaluation_proof_store
+from app.services.regression import RegressionService
 
 
 @pytest.fixture(autouse=True)
@@ -89,6 +107,7 @@ def test_rule_lifecycle_and_evaluation(client: TestClient) -> None:
     assert response.status_code == 201
     body = response.json()
     assert body["rule"]["version"] == 2
+    assert body["rule"]["definition_hash"]
 
     response = client.post("/rules/loan-decision/publish", json={"version": 2})
     assert response.status_code == 200
@@ -176,6 +195,32 @@ def test_regression_runner_detects_failures(client: TestClient) -> None:
     assert failing_case["actual"] is False
 
 
+def test_regression_runs_bound_cases_in_flight() -> None:
+    class CountingEvaluator(EvaluatorService):
+        in_flight = peak = 0
+
+        async def evaluate_raw_async(self, *args, **kwargs):
+            CountingEvaluator.in_flight += 1
+            CountingEvaluator.peak = max(CountingEvaluator.peak, CountingEvaluator.in_flight)
+            await asyncio.sleep(0)
+            CountingEvaluator.in_flight -= 1
+            return await super().evaluate_raw_async(*args, **kwargs)
+
+    catalog = get_catalog_service()
+    definition = {"*": [{"var": "x"}, 2]}
+    catalog.create_rule_version(RuleCreateRequest(stable_id="double", name="Double", definition=definition))
+    evaluator = CountingEvaluator(executor="thread", workers=3)
+    service = RegressionService(catalog, evaluator, get_evaluation_proof_store())
+    cases = [{"name": f"case-{idx}", "context": {"x": idx}, "expected": idx * 2} for idx in range(20)]
+    request = RegressionRunRequest(stable_id="double", prefer_latest=True, cases=cases)
+    try:
+        report = asyncio.run(service.run_payload(request))
+    finally:
+        evaluator.close()
+    assert report["passed"] == 20
+    assert CountingEvaluator.peak == 3
+
+
 def test_invalid_rule_definition_returns_400(client: TestClient) -> None:
     response = client.post(
         "/rules",
@@ -186,3 +231,283 @@ def test_invalid_rule_definition_returns_400(client: TestClient) -> None:
         },
     )
     assert response.status_code == 400
+
+
+def test_reference_sets_are_versioned_and_used_by_rules(client: TestClient) -> None:
+    response = client.post(
+        "/reference-sets",
+        json={"name": "high-cost-states", "values": ["CA", "NY", "HI", "CA"]},
+    )
+    assert response.status_code == 201
+    assert response.json()["reference_set"]["size"] == 3
+
+    response = client.post("/reference-sets", json={"name": "high-cost-states", "values": ["CA", "NY"]})
+    assert response.json()["reference_set"]["version"] == 2
+
+    response = client.get("/reference-sets")
+    assert response.json()["sets"][0]["latest_version"] == 2
+    first_version = client.get("/reference-sets/high-cost-states", params={"version": 1}).json()
+    assert first_version["reference_set"]["values"] == ["CA", "NY", "HI"]
+    assert client.get("/reference-sets/unknown").status_code == 404
+
+    rule = {
+        "stable_id": "high-cost",
+        "name": "High cost area",
+        "definition": {"bl_in_set": [{"var": "property.state"}, "high-cost-states"]},
+    }
+    assert client.post("/rules", json=rule).status_code == 201
+    pinned = {**rule, "definition": {"bl_in_set": [{"var": "property.state"}, "high-cost-states", 1]}}
+    assert client.post("/rules", json=pinned).status_code == 201
+
+    context = {"property": {"state": "HI"}}
+    latest = client.post("/eval", json={"stable_id": "high-cost", "version": 1, "context": context}).json()
+    assert latest["result"] is False
+    assert latest["trace"][0]["arguments"] == {"needle": "HI", "set": "high-cost-states", "version": 2, "size": 2}
+    pinned_eval = client.post("/eval", json={"stable_id": "high-cost", "version": 2, "context": context})
+    assert pinned_eval.json()["result"] is True
+
+    unknown = {**rule, "definition": {"bl_in_set": [{"var": "property.state"}, "missing-set"]}}
+    assert client.post("/rules", json=unknown).status_code == 400
+
+
+def test_sub_rules_are_memoized_and_cycles_rejected(client: TestClient) -> None:
+    base = {
+        "stable_id": "base-eligibility",
+        "name": "Base eligibility",
+        "definition": {">=": [{"var": "applicant.credit_score"}, 620]},
+    }
+    assert client.post("/rules", json=base).status_code == 201
+    composite = {
+        "stable_id": "jumbo-eligibility",
+        "name": "Jumbo eligibility",
+        "definition": {
+            "and": [
+                {"bl_rule": "base-eligibility"},
+                {"<=": [{"var": "loan.ltv"}, 80]},
+                {"bl_rule": ["base-eligibility", 1]},
+            ]
+        },
+    }
+    assert client.post("/rules", json=composite).status_code == 201
+
+    response = client.post(
+        "/eval",
+        json={"stable_id": "jumbo-eligibility", "context": {"applicant": {"credit_score": 700}, "loan": {"ltv": 75}}},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["result"] is True
+    references = [step for step in body["trace"][0]["children"] if step["operator"] == "bl_rule"]
+    assert [step["arguments"]["memoized"] for step in references] == [False, True]
+
+    cyclic = {**base, "definition": {"bl_rule": "jumbo-eligibility"}}
+    response = client.post("/rules", json=cyclic)
+    assert response.status_code == 400
+    assert "Cyclic rule reference" in response.json()["detail"]
+
+    unknown = {**composite, "definition": {"bl_rule": "does-not-exist"}}
+    assert client.post("/rules", json=unknown).status_code == 400
+
+
+def test_list_rules_supports_label_selectors_and_cursor_pagination(client: TestClient) -> None:
+    for idx in range(5):
+        payload = {
+            "stable_id": f"rule-{idx}",
+            "name": f"Rule {idx}",
+            "definition": _sample_rule_definition(600 + idx),
+            "labels": {"product": "heloc" if idx % 2 else "jumbo", "channel": "retail"},
+        }
+        assert client.post("/rules", json=payload).status_code == 201
+    relabelled = {
+        "stable_id": "rule-0",
+        "name": "Rule 0",
+        "definition": _sample_rule_definition(),
+        "labels": {"product": "heloc", "channel": "wholesale"},
+    }
+    assert client.post("/rules", json=relabelled).status_code == 201
+
+    first_page = client.get("/rules", params={"limit": 2}).json()
+    assert first_page["total"] == 5
+    assert [rule["stable_id"] for rule in first_page["rules"]] == ["rule-0", "rule-1"]
+    second_page = client.get("/rules", params={"limit": 2, "cursor": first_page["next_cursor"]}).json()
+    assert [rule["stable_id"] for rule in second_page["rules"]] == ["rule-2", "rule-3"]
+    last_page = client.get("/rules", params={"limit": 2, "cursor": second_page["next_cursor"]}).json()
+    assert [rule["stable_id"] for rule in last_page["rules"]] == ["rule-4"]
+    assert last_page["next_cursor"] is None
+
+    heloc_retail = client.get("/rules", params={"labels": "product=heloc,channel=retail"}).json()
+    assert [rule["stable_id"] for rule in heloc_retail["rules"]] == ["rule-1", "rule-3"]
+    wholesale = client.get("/rules", params={"labels": "channel=wholesale"}).json()
+    assert wholesale["total"] == 1
+    assert wholesale["rules"][0]["latest_version"] == 2
+    assert client.get("/rules", params={"labels": "product"}).status_code == 400
+
+
+def test_bulk_import_validates_items_and_publishes_in_one_write(client: TestClient) -> None:
+    existing = {"stable_id": "existing", "name": "Existing", "definition": _sample_rule_definition()}
+    assert client.post("/rules", json=existing).status_code == 201
+    client.post("/rules/existing/publish", json={"version": 1})
+    revision = get_catalog_service().revision
+
+    payloads = [
+        {"stable_id": "composite", "name": "Composite", "definition": {"bl_rule": "base"}},
+        {"stable_id": "base", "name": "Base", "definition": _sample_rule_definition(600)},
+        {"stable_id": "broken", "name": "Broken", "definition": {"unknown_op": []}},
+        {"stable_id": "dangling", "name": "Dangling", "definition": {"bl_rule": "missing"}},
+        {"stable_id": "existing", "name": "Existing", "definition": _sample_rule_definition(700)},
+        {"name": "No id", "definition": {}},
+    ]
+    body = "\n".join(json.dumps(payload) for payload in payloads) + "\n\nnot json\n"
+    response = client.post(
+        "/rules/bulk",
+        params={"publish": "true"},
+        content=body,
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["total"], report["created"], report["failed"]) == (7, 3, 4)
+    assert [result["status"] for result in report["results"]] == [
+        "published",
+        "published",
+        "failed",
+        "failed",
+        "published",
+        "failed",
+        "failed",
+    ]
+    assert "Unsupported operator" in report["results"][2]["error"]
+    assert "Unknown rule 'missing'" in report["results"][3]["error"]
+    assert report["results"][5]["error"].startswith("stable_id: Field required")
+    assert report["results"][6]["error"].startswith("line 8:")
+    assert get_catalog_service().revision == revision + 1
+
+    existing_rule = client.get("/rules/existing").json()["rule"]
+    assert (existing_rule["version"], existing_rule["status"]) == (2, "published")
+    assert client.get("/rules/existing", params={"version": 1}).json()["rule"]["status"] == "draft"
+
+    array = client.post("/rules/bulk", json=[{"stable_id": "base", "name": "Base", "definition": {"var": "x"}}])
+    assert array.json()["results"][0] == {
+        "index": 0,
+        "stable_id": "base",
+        "status": "created",
+        "version": 2,
+        "error": None,
+    }
+    assert client.post("/rules/bulk", json={"stable_id": "base"}).status_code == 400
+
+
+def test_cli_imports_rule_files_in_batches(client: TestClient, tmp_path: Path, capsys) -> None:
+    path = tmp_path / "rules.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"stable_id": f"cli-{idx}", "name": f"CLI {idx}", "definition": _sample_rule_definition()}
+                for idx in range(3)
+            ]
+            + [{"stable_id": "cli-bad", "name": "Bad", "definition": {"nope": 1}}]
+        )
+    )
+
+    failed = import_rules(path, url="", publish=True, batch_size=2, client=client)
+
+    assert failed == 1
+    assert "imported 3 of 4 rules, 1 failed" in capsys.readouterr().out
+    assert client.get("/rules/cli-2").json()["rule"]["status"] == "published"
+
+
+def test_conditional_gets_and_change_feed(client: TestClient) -> None:
+    for stable_id in ("feed-a", "feed-b"):
+        response = client.post(
+            "/rules", json={"stable_id": stable_id, "name": stable_id, "definition": _sample_rule_definition()}
+        )
+        assert response.status_code == 201
+
+    listing = client.get("/rules")
+    revision = int(listing.headers["x-catalog-revision"])
+    assert client.get("/rules", headers={"If-None-Match": listing.headers["etag"]}).status_code == 304
+    rule = client.get("/rules/feed-a")
+    assert client.get("/rules/feed-a", headers={"If-None-Match": rule.headers["etag"]}).status_code == 304
+
+    assert client.get("/rules/changes", params={"since": revision}).json() == {
+        "revision": revision,
+        "reset": False,
+        "rules": [],
+    }
+    publisher = threading.Timer(0.2, lambda: get_catalog_service().publish_rule_version("feed-a", 1))
+    publisher.start()
+    changes = client.get("/rules/changes", params={"since": revision, "timeout": 5}).json()
+    publisher.join()
+    assert changes["revision"] == revision + 1 and not changes["reset"]
+    assert [(item["stable_id"], item["published_version"]) for item in changes["rules"]] == [("feed-a", 1)]
+
+    # Publishing changes the representation, so the old ETags no longer match.
+    assert client.get("/rules", headers={"If-None-Match": listing.headers["etag"]}).status_code == 200
+    assert client.get("/rules/feed-a", headers={"If-None-Match": rule.headers["etag"]}).status_code == 200
+    # Revisions the change log cannot answer require a full reload.
+    assert client.get("/rules/changes", params={"since": revision + 5}).json()["reset"] is True
+
+
+def test_fast_evaluation_response_matches_pydantic_serialization(client: TestClient) -> None:
+    logic = {"and": [{">=": [{"var": "loan.amount"}, 100]}, {"in": [{"var": "loan.state"}, ["CA", "NY"]]}]}
+    context = {"loan": {"amount": 120.5, "state": "NY"}}
+    response = client.post("/eval", json={"logic": logic, "context": context})
+    assert response.status_code == 200
+
+    body = response.json()
+    expected = EvaluationResponse.model_validate(body).model_dump(mode="json")
+    assert body == expected
+    assert body["result"] is True
+    assert all({"arguments", "children"} <= set(step) for step in body["trace"])
+    # The stdlib fallback encodes exactly like orjson.
+    assert json.loads(json.dumps(body)) == json.loads(dumps(body))
+
+
+def test_eval_routes_decode_bodies_on_the_fast_path(client: TestClient) -> None:
+    context = {"applicant": {"credit_score": 720}, "history": [{"id": idx, "memo": "x" * 20} for idx in range(2000)]}
+    response = client.post("/eval", json={"logic": _sample_rule_definition(), "context": context})
+    assert response.status_code == 200
+    assert response.json()["result"] == "approve"
+    proof = get_evaluation_proof_store().get(response.json()["proof"]["id"])
+    assert proof.context == context
+
+    # Malformed bodies and envelopes are still rejected like before.
+    broken = client.post("/eval", content=b'{"logic": ', headers={"content-type": "application/json"})
+    assert broken.status_code == 422
+    assert broken.json()["detail"][0]["type"] == "json_invalid"
+    assert client.post("/eval", json={"context": {}, "version": 0}).status_code == 422
+
+
+def test_regression_reports_stream_and_compress(client: TestClient) -> None:
+    client.post("/rules", json={"stable_id": "loan-decision", "name": "Loan", "definition": _sample_rule_definition()})
+    cases = [
+        {"name": f"case-{idx}", "context": {"applicant": {"credit_score": 650 + idx}}, "expected": "approve"}
+        for idx in range(100)
+    ]
+    payload = {"stable_id": "loan-decision", "prefer_latest": True, "cases": cases}
+    expected = client.post("/eval/regressions", json=payload).json()
+    assert (expected["passed"], expected["failed"]) == (50, 50)
+
+    streamed = client.post("/eval/regressions?stream=true", json=payload, headers={"accept-encoding": "gzip"})
+    assert streamed.status_code == 200
+    assert streamed.headers["content-encoding"] == "gzip"
+    assert json.loads(streamed.content) == expected
+    if msgpack is not None:
+        streamed = client.post("/eval/regressions?stream=true", json=payload, headers={"accept": "application/msgpack"})
+        assert msgpack.unpackb(streamed.content) == expected
+
+    # zstd is preferred when available; small bodies are left uncompressed.
+    response = client.post("/eval/regressions", json=payload, headers={"accept-encoding": "gzip, zstd"})
+    assert response.headers["content-encoding"] == ("zstd" if zstandard is not None else "gzip")
+    assert "accept-encoding" in response.headers["vary"].lower()
+    small = client.get("/rules/missing-rule", headers={"accept-encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    identity = client.post("/eval/regressions", json=payload, headers={"accept-encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+
+    # Errors raised before the first case is written keep their status.
+    missing = client.post("/eval/regressions?stream=true", json={"stable_id": "missing-rule", "cases": cases})
+    assert missing.status_code == 404
+    client.post("/rules", json={"stable_id": "bad-divide", "name": "Div", "definition": {"/": [1, 0]}})
+    failing = {"stable_id": "bad-divide", "prefer_latest": True, "cases": cases}
+    assert client.post("/eval/regressions?stream=true", json=failing).status_code == 400
@@ -0,0 +1,84 @@
+"""Tests covering the OpenTelemetry metrics of the rules engine."""
+
+from __future__ import annotations
+
+import pickle
+import sys
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+from app.api.metrics import EvaluationMetrics, get_evaluation_metrics, register_store_metrics
+from app.dsl.errors import EvaluationError
+from app.main import create_app
+from app.services.catalog import get_catalog_service
+from app.services.proofs import get_evaluation_proof_store
+from app.services.tenants import get_tenant_registry
+
+
+@pytest.fixture(autouse=True)
+def reset_state() -> None:
+    resets = (get_tenant_registry().clear, get_catalog_service().clear, get_evaluation_proof_store().clear)
+    for reset in resets:
+        reset()
+    yield
+    for reset in resets:
+        reset()
+
+
+def _points(reader: InMemoryMetricReader) -> Dict[str, Dict[Tuple[Tuple[str, Any], ...], Any]]:
+    """Return metric points by name and sorted attributes: histogram counts or values."""
+
+    points: Dict[str, Dict[Tuple[Tuple[str, Any], ...], Any]] = {}
+    for resource_metrics in reader.get_metrics_data().resource_metrics:
+        for scope_metrics in resource_metrics.scope_metrics:
+            for metric in scope_metrics.metrics:
+                for point in metric.data.data_points:
+                    value = point.count if hasattr(point, "count") else point.value
+                    points.setdefault(metric.name, {})[tuple(sorted(point.attributes.items()))] = value
+    return points
+
+
+def test_evaluation_metrics_have_bounded_attributes() -> None:
+    reader = InMemoryMetricReader()
+    meter = MeterProvider(metric_readers=[reader]).get_meter("test")
+    instruments = EvaluationMetrics(meter, max_rule_series=2)
+    app = create_app()
+    app.dependency_overrides[get_evaluation_metrics] = lambda: instruments
+    register_store_metrics(get_tenant_registry(), meter)
+    client = TestClient(app)
+
+    for stable_id in ("fee", "limit", "bonus"):
+        client.post("/rules", json={"stable_id": stable_id, "name": stable_id, "definition": {"+": [1, 2]}})
+        assert client.post("/eval", json={"stable_id": stable_id, "prefer_latest": True}).status_code == 200
+    assert client.post("/eval", json={"logic": {"/": [1, 0]}, "context": {}}).status_code == 400
+    tenant_rule = {"stable_id": "fee", "name": "fee", "definition": {"+": [1]}}
+    client.post("/rules", json=tenant_rule, headers={"x-tenant-id": "acme"})
+    regression = {"stable_id": "fee", "prefer_latest": True, "cases": [{"name": "sum", "context": {}, "expected": 3}]}
+    assert client.post("/eval/regressions", json=regression).status_code == 200
+
+    points = _points(reader)
+    fee = (("rule.stable_id", "fee"), ("rule.version", 1))
+    limit = (("rule.stable_id", "limit"), ("rule.version", 1))
+    other = (("rule.stable_id", "_other"), ("rule.version", 0))
+    # Series past the limit, including inline logic, share the _other series.
+    assert points["rules_engine.evaluation.duration"] == {fee: 1, limit: 1, other: 1}
+    assert points["rules_engine.evaluation.trace_steps"][fee] == 1
+    assert points["rules_engine.evaluation.errors"] == {(("error.kind", "division_by_zero"), *other): 1}
+    assert points["rules_engine.regression.duration"] == {fee: 1}
+    assert points["rules_engine.catalog.rules"] == {(("namespace", "base"),): 3, (("namespace", "tenants"),): 1}
+    assert points["rules_engine.proof_store.entries"] == {(("namespace", "base"),): 4, (("namespace", "tenants"),): 0}
+    assert points["rules_engine.proof_store.bytes"][(("namespace", "base"),)] > 0
+
+
+def test_evaluation_error_kinds_survive_pickling() -> None:
+    error = pickle.loads(pickle.dumps(EvaluationError("Division by zero is not allowed", kind="division_by_zero")))
+    assert (str(error), error.kind) == ("Division by zero is not allowed", "division_by_zero")
+    assert EvaluationError("bad").kind == "invalid_expression"
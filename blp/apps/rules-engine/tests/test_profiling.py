@@ -0,0 +1,108 @@
+"""Tests covering per-operator evaluation profiles."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient
+
+from app.dsl.operators import ExtendedJsonLogic
+from app.dsl.profiling import EvaluationProfile
+from app.main import create_app
+from app.services.catalog import get_catalog_service
+from app.services.profiling import ProfileStore, get_profile_store
+from app.services.tenants import get_tenant_registry
+
+_LOGIC = {"if": [{">=": [{"var": "score"}, 700]}, {"bl_sum": [{"var": "fees"}]}, 0]}
+
+
+@pytest.fixture(autouse=True)
+def reset_state() -> None:
+    resets = (get_tenant_registry().clear, get_catalog_service().clear, get_profile_store().clear)
+    for reset in resets:
+        reset()
+    yield
+    for reset in resets:
+        reset()
+
+
+def test_profiles_record_every_node_without_changing_results() -> None:
+    evaluator = ExtendedJsonLogic()
+    profile = EvaluationProfile()
+    context = {"score": 720, "fees": [1, 2, 3]}
+    assert evaluator.evaluate(_LOGIC, context, profile=profile) == evaluator.evaluate(_LOGIC, context)
+    evaluator.evaluate(_LOGIC, {"score": 600, "fees": []}, profile=profile)
+
+    calls = {stack: sample[0] for stack, sample in profile.samples.items()}
+    root = "if@$"
+    condition, fees = ">=@$.condition[0]", "bl_sum@$.result[0]"
+    assert calls == {
+        (root,): 2,
+        (root, condition): 2,
+        (root, condition, "var@$.condition[0].args[0]"): 2,
+        (root, fees): 1,
+        (root, fees, "var@$.result[0].sequence"): 1,
+    }
+    for stack, (_, self_ns, total_ns) in profile.samples.items():
+        children = sum(sample[2] for other, sample in profile.samples.items() if other[:-1] == stack)
+        assert 0 <= self_ns <= total_ns and self_ns + children == total_ns
+
+    store = ProfileStore(max_rules=2, max_stacks=2)
+    store.record("tier", 1, profile)
+    # Nodes are recorded as they complete, so the innermost stacks come first.
+    assert store.collapsed("tier", weight="calls").splitlines() == [
+        "[other] 4",
+        "if@$;>=@$.condition[0] 2",
+        "if@$;>=@$.condition[0];var@$.condition[0].args[0] 2",
+    ]
+    # Versions are profiled apart; the highest one is served by default.
+    store.record("tier", 2, EvaluationProfile({("var@$",): [1, 0, 0]}))
+    assert store.collapsed("tier", weight="calls") == "var@$ 1\n"
+    assert store.collapsed("tier", 1, weight="calls").startswith("[other] 4")
+    store.record("limit", 1, profile)
+    assert store.rules() == [("tier", 2), ("limit", 1)]
+    with pytest.raises(KeyError):
+        store.collapsed("tier", 1)
+
+
+def test_profile_endpoint_serves_collapsed_stacks(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = TestClient(create_app())
+    client.post("/rules", json={"stable_id": "pricing", "name": "Pricing", "definition": _LOGIC})
+    evaluation = {"stable_id": "pricing", "prefer_latest": True, "context": {"score": 720, "fees": [1, 2]}}
+
+    client.post("/eval", json=evaluation)
+    assert client.get("/eval/profile/pricing").status_code == 404
+    for _ in range(3):
+        assert client.post("/eval", params={"profile": "true"}, json=evaluation).json()["result"] == 3
+    response = client.get("/eval/profile/pricing", params={"by": "operator", "weight": "calls"})
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text.splitlines() == ["if 3", "if;>= 3", "if;>=;var 3", "if;bl_sum 3", "if;bl_sum;var 3"]
+    lines = client.get("/eval/profile/pricing").text.splitlines()
+    assert [line.rpartition(" ")[0] for line in lines][0] == "if@$"
+    assert all(line.rpartition(" ")[2].isdigit() for line in lines)
+
+    # Inline logic is not profiled, even when it names a rule.
+    inline = {"stable_id": "pricing", "logic": {"+": [1, 2]}, "context": {}}
+    assert client.post("/eval", params={"profile": "true"}, json=inline).json()["result"] == 3
+    assert "+" not in client.get("/eval/profile/pricing", params={"by": "operator"}).text
+
+    # Profiling every evaluation through Settings; tenants keep their own profiles.
+    monkeypatch.setattr("app.api.routes_eval.settings.profiling_enabled", True)
+    client.post("/eval", json=evaluation, headers={"x-tenant-id": "acme"})
+    tenant_profile = client.get("/eval/profile/pricing", params={"weight": "calls"}, headers={"x-tenant-id": "acme"})
+    assert tenant_profile.text.splitlines()[0] == "if@$ 1"
+    assert client.get("/eval/profile/pricing", params={"by": "frames"}).status_code == 422
+
+    # A new version gets its own profile, served by default once profiled.
+    client.post("/rules", json={"stable_id": "pricing", "name": "Pricing", "definition": {"bl_sum": [[1]]}})
+    client.post("/eval", params={"profile": "true"}, json=evaluation)
+    latest = client.get("/eval/profile/pricing", params={"by": "operator", "weight": "calls"})
+    assert latest.text.splitlines() == ["bl_sum 1"]
+    first = client.get("/eval/profile/pricing", params={"version": 1, "by": "operator", "weight": "calls"})
+    assert first.text.splitlines()[0] == "if 3"
+    assert client.get("/eval/profile/pricing", params={"version": 3}).status_code == 404
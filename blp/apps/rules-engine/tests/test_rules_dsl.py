@@ -9,7 +9,9 @@ import pytest
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
+from app.dsl.hashing import DefinitionInterner, structural_hash
 from app.dsl.operators import EvaluationError, ExtendedJsonLogic
+from app.dsl.validator import LogicValidator
 
 
 @pytest.fixture
@@ -99,3 +101,264 @@ def test_missing_operators_report_keys(evaluator: ExtendedJsonLogic) -> None:
 def test_unknown_operator_raises_error(evaluator: ExtendedJsonLogic) -> None:
     with pytest.raises(EvaluationError):
         evaluator.evaluate({"unknown": []}, {})
+
+
+def test_structural_hash_ignores_key_order_and_interns_subtrees() -> None:
+    first = {"and": [{">=": [{"var": "score"}, 700]}, {"<": [{"var": "ltv"}, 80]}]}
+    reordered = {"and": [{">=": [{"var": "score"}, 700]}, {"<": [{"var": "ltv"}, 80]}]}
+    changed = {"and": [{">=": [{"var": "score"}, 720]}, {"<": [{"var": "ltv"}, 80]}]}
+    assert structural_hash(first) == structural_hash(reordered)
+    assert structural_hash(first) != structural_hash(changed)
+    assert structural_hash([1]) != structural_hash([1.0]) != structural_hash([True])
+
+    interner = DefinitionInterner()
+    node_a, hash_a = interner.intern(first)
+    node_b, _ = interner.intern(changed)
+    assert hash_a == structural_hash(first)
+    assert node_a["and"][1] is node_b["and"][1]
+    assert node_a["and"][0] is not node_b["and"][0]
+
+    # Sharing never changes the key order the author wrote.
+    table = {"bl_table": {"rules": [], "hit_policy": "first"}}
+    swapped = {"bl_table": {"hit_policy": "first", "rules": []}}
+    assert list(interner.intern(swapped)[0]["bl_table"]) == ["hit_policy", "rules"]
+    assert list(interner.intern(table)[0]["bl_table"]) == ["rules", "hit_policy"]
+
+    # Nothing is kept for definitions whose commit fails, and the table is bounded.
+    size = len(interner)
+
+    def reject(node: object, digest: str) -> None:
+        raise EvaluationError("rejected")
+
+    with pytest.raises(EvaluationError):
+        interner.intern({"max": [{"var": "a"}, {"var": "b"}]}, before_commit=reject)
+    assert len(interner) == size
+    bounded = DefinitionInterner(max_nodes=2)
+    bounded.intern(first)
+    assert len(bounded) == 2
+
+
+def _llpa_table(hit_policy: str = "first") -> dict:
+    return {
+        "bl_table": {
+            "inputs": [{"var": "credit_score"}, {"var": "ltv"}],
+            "hit_policy": hit_policy,
+            "rules": [
+                {"when": [{">=": 740}, {"<=": 80}], "then": 0.0},
+                {"when": [{">=": 700, "<": 740}, {"<=": 80}], "then": 0.25},
+                {"when": [{">=": 700}, {">": 80, "<=": 95}], "then": 0.75},
+                {"when": [{"in": [620, 640]}, None], "then": 1.5},
+                {"when": [None, 97], "then": {"+": [1, 1]}},
+            ],
+            "default": "ineligible",
+        }
+    }
+
+
+def test_decision_table_lookup_and_hit_policies(evaluator: ExtendedJsonLogic) -> None:
+    logic = _llpa_table()
+    assert evaluator.evaluate(logic, {"credit_score": 760, "ltv": 80})[0] == 0.0
+    assert evaluator.evaluate(logic, {"credit_score": 740, "ltv": 60})[0] == 0.0
+    assert evaluator.evaluate(logic, {"credit_score": 739.5, "ltv": 80})[0] == 0.25
+    assert evaluator.evaluate(logic, {"credit_score": 700, "ltv": 80.5})[0] == 0.75
+    assert evaluator.evaluate(logic, {"credit_score": 640, "ltv": 99})[0] == 1.5
+    assert evaluator.evaluate(logic, {"credit_score": 600, "ltv": 97})[0] == 2.0
+    assert evaluator.evaluate(logic, {"credit_score": 600, "ltv": 50})[0] == "ineligible"
+
+    result, trace = evaluator.evaluate(logic, {"credit_score": 720, "ltv": 75})
+    assert result == 0.25
+    assert trace[0]["arguments"] == {"hit_policy": "first", "inputs": [720, 75], "matched": [1]}
+    assert [child["path"] for child in trace[0]["children"]] == ["$.inputs[0]", "$.inputs[1]"]
+
+    _, trace = evaluator.evaluate(logic, {"credit_score": 600, "ltv": 97})
+    assert trace[0]["arguments"]["matched"] == [4]
+    assert trace[0]["children"][-1]["path"] == "$.rules[4].then"
+
+    result, _ = evaluator.evaluate(_llpa_table("collect"), {"credit_score": 750, "ltv": 97})
+    assert result == [2.0]
+    result, _ = evaluator.evaluate(_llpa_table("collect"), {"credit_score": 640, "ltv": 97})
+    assert result == [1.5, 2.0]
+    with pytest.raises(EvaluationError) as error:
+        evaluator.evaluate(_llpa_table("unique"), {"credit_score": 640, "ltv": 97})
+    assert error.value.kind == "hit_policy_violation"
+
+
+def test_transient_logic_is_not_cached(evaluator: ExtendedJsonLogic) -> None:
+    class Rules:
+        revision = 1
+
+        def resolve_rule(self, stable_id, version=None):
+            return (1, catalog_table)
+
+    catalog_table = _llpa_table()
+    inline = _llpa_table()
+    context = {"credit_score": 600, "ltv": 97}
+    assert evaluator.evaluate(inline, context, transient=True)[0] == 2.0
+    assert not evaluator._compiled
+
+    # Rules referenced from transient logic are catalog definitions and stay cached.
+    logic = {"+": [{"bl_rule": "llpa"}, inline]}
+    assert evaluator.evaluate(logic, context, resolver=Rules(), transient=True)[0] == 4.0
+    assert ("bl_table", id(catalog_table["bl_table"])) in evaluator._compiled
+    assert ("bl_table", id(inline["bl_table"])) not in evaluator._compiled
+
+
+def test_validator_checks_decision_tables() -> None:
+    validator = LogicValidator(ExtendedJsonLogic())
+    validator.validate(_llpa_table())
+
+    malformed = _llpa_table()
+    malformed["bl_table"]["rules"][0]["when"] = [{">=": 740}]
+    with pytest.raises(EvaluationError):
+        validator.validate(malformed)
+
+    bad_output = _llpa_table()
+    bad_output["bl_table"]["rules"][0]["then"] = {"unknown": []}
+    with pytest.raises(EvaluationError):
+        validator.validate(bad_output)
+
+
+def test_in_operator_and_reference_sets(evaluator: ExtendedJsonLogic) -> None:
+    counties = [f"{code:05d}" for code in range(100)]
+    logic = {"bl_any": [{"var": "properties"}, {"in": [{"var": "item.county"}, {"var": "counties"}]}]}
+    context = {"counties": counties, "properties": [{"county": "99999"}, {"county": "00042"}]}
+    result, _ = evaluator.evaluate(logic, context)
+    assert result is True
+    assert evaluator.evaluate({"in": [[1], [[1], [2]] * 20]}, {})[0] is True
+
+    # Literal arrays are converted once, when the definition is validated.
+    literal = {"in": [{"var": "county"}, counties]}
+    LogicValidator(evaluator).validate(literal)
+    assert evaluator._compiled[("in", id(counties))][1] == frozenset(counties)
+    assert evaluator.evaluate(literal, {"county": "00042"})[0] is True
+
+    # Context arrays are only converted when looked up again in the evaluation.
+    class Counties(list):
+        scans = 0
+
+        def __iter__(self):
+            Counties.scans += 1
+            return super().__iter__()
+
+    lookup = {"in": [{"var": "county"}, {"var": "counties"}]}
+    assert evaluator.evaluate(lookup, {"county": "00042", "counties": Counties(counties)})[0] is True
+    assert Counties.scans == 0
+    repeated = {"bl_count": [{"var": "properties"}, {"in": [{"var": "item.county"}, {"var": "counties"}]}]}
+    context = {"counties": Counties(counties), "properties": [{"county": "00001"}, {"county": "x"}] * 2}
+    assert evaluator.evaluate(repeated, context)[0] == 2
+    assert Counties.scans == 1
+
+    class Sets:
+        def resolve_reference_set(self, name, version=None):
+            return (3, frozenset({"CA", "NY"})) if name == "states" else None
+
+    logic = {"bl_in_set": [{"var": "state"}, "states"]}
+    result, trace = evaluator.evaluate(logic, {"state": "NY"}, resolver=Sets())
+    assert result is True
+    assert trace[0]["arguments"]["version"] == 3
+    with pytest.raises(EvaluationError):
+        evaluator.evaluate({"bl_in_set": [{"var": "state"}, "unknown"]}, {"state": "NY"}, resolver=Sets())
+    with pytest.raises(EvaluationError):
+        evaluator.evaluate(logic, {"state": "NY"})
+
+
+def test_aggregation_operators(evaluator: ExtendedJsonLogic) -> None:
+    context = {
+        "income": {"monthly": 10000},
+        "liabilities": [
+            {"type": "revolving", "monthly_payment": 250},
+            {"type": "installment", "monthly_payment": 400},
+            {"type": "revolving", "monthly_payment": 150},
+        ],
+    }
+    revolving = {"bl_filter": [{"var": "liabilities"}, {"==": [{"var": "item.type"}, "revolving"]}]}
+    dti = {"/": [{"bl_sum": [revolving, {"var": "item.monthly_payment"}]}, {"var": "income.monthly"}]}
+    result, trace = evaluator.evaluate(dti, context)
+    assert result == pytest.approx(0.04)
+    sum_step = trace[0]["children"][0]
+    assert sum_step["operator"] == "bl_sum"
+    assert sum_step["arguments"] == {"size": 2}
+    assert sum_step["children"][0]["arguments"] == {"size": 3, "matched": 2}
+
+    assert evaluator.evaluate({"bl_count": [{"var": "liabilities"}]}, context)[0] == 3
+    count_large = {"bl_count": [{"var": "liabilities"}, {">": [{"var": "item.monthly_payment"}, 200]}]}
+    assert evaluator.evaluate(count_large, context)[0] == 2
+    mapped = {"bl_map": [{"var": "liabilities"}, {"*": [{"var": "item.monthly_payment"}, {"var": "index"}]}]}
+    assert evaluator.evaluate(mapped, context)[0] == [0.0, 400.0, 300.0]
+    largest = {
+        "bl_reduce": [
+            {"var": "liabilities"},
+            {"max": [{"var": "accumulator"}, {"var": "item.monthly_payment"}]},
+            0,
+        ]
+    }
+    assert evaluator.evaluate(largest, context)[0] == 400.0
+    scoped = {"bl_map": [{"var": "liabilities"}, {"/": [{"var": "item.monthly_payment"}, {"var": "income.monthly"}]}]}
+    assert evaluator.evaluate(scoped, context)[0] == [0.025, 0.04, 0.015]
+
+    with pytest.raises(EvaluationError, match="index 1"):
+        evaluator.evaluate({"bl_sum": [{"var": "items"}]}, {"items": [1, "x"]})
+    with pytest.raises(EvaluationError, match="index 0"):
+        evaluator.evaluate({"bl_map": [{"var": "items"}, {"+": [{"var": "item"}, "x"]}]}, {"items": [1]})
+    with pytest.raises(EvaluationError):
+        LogicValidator(evaluator).validate({"bl_reduce": [{"var": "items"}, {"var": "item"}]})
+
+
+def test_let_bindings_are_evaluated_once(evaluator: ExtendedJsonLogic) -> None:
+    logic = {
+        "let": [
+            {
+                "dti": {"/": [{"var": "debts.total"}, {"var": "income.monthly"}]},
+                "limit": {"if": [{"var": "jumbo"}, 0.43, 0.5]},
+            },
+            {
+                "and": [
+                    {"<=": [{"let_var": "dti"}, {"let_var": "limit"}]},
+                    {"bl_all": [{"var": "ratios"}, {"<=": [{"let_var": "dti"}, {"var": "item"}]}]},
+                ]
+            },
+        ]
+    }
+    context = {"debts": {"total": 2000}, "income": {"monthly": 5000}, "jumbo": True, "ratios": [0.5, 0.6]}
+    result, trace = evaluator.evaluate(logic, context)
+    assert result is True
+    assert trace[0]["arguments"] == {"bindings": {"dti": 0.4, "limit": 0.43}}
+    binding_steps = [child for child in trace[0]["children"] if ".bindings." in child["path"]]
+    assert [step["path"] for step in binding_steps] == ["$.bindings.dti", "$.bindings.limit"]
+
+    nested = {"let": [{"applicant": {"var": "applicant"}}, {"let_var": ["applicant.score", 600]}]}
+    assert evaluator.evaluate(nested, {"applicant": {"score": 710}})[0] == 710
+    assert evaluator.evaluate(nested, {"applicant": {}})[0] == 600
+
+
+def test_validator_rejects_undefined_let_bindings() -> None:
+    validator = LogicValidator(ExtendedJsonLogic())
+    validator.validate({"let": [{"a": 1, "b": {"+": [{"let_var": "a"}, 1]}}, {"let_var": "b"}]})
+    with pytest.raises(EvaluationError, match="Undefined let binding 'b'"):
+        validator.validate({"let": [{"a": {"let_var": "b"}, "b": 1}, {"let_var": "a"}]})
+    with pytest.raises(EvaluationError):
+        validator.validate({"==": [{"let_var": "dti"}, 1]})
+
+
+def test_sub_rule_resolution_is_cached_until_catalog_changes(evaluator: ExtendedJsonLogic) -> None:
+    class Rules:
+        revision = 1
+
+        def __init__(self) -> None:
+            self.definitions = {"a": {"bl_rule": "b"}, "b": {"var": "x"}}
+            self.calls = 0
+
+        def resolve_rule(self, stable_id, version=None):
+            self.calls += 1
+            definition = self.definitions.get(stable_id)
+            return None if definition is None else (1, definition)
+
+    rules = Rules()
+    for _ in range(3):
+        assert evaluator.evaluate({"bl_rule": "a"}, {"x": 5}, resolver=rules)[0] == 5
+    assert rules.calls == 2
+
+    rules.definitions["b"] = {"bl_rule": "a"}
+    rules.revision += 1
+    with pytest.raises(EvaluationError, match="a -> b -> a"):
+        evaluator.evaluate({"bl_rule": "a"}, {"x": 5}, resolver=rules)
@@ -0,0 +1,155 @@
+"""Tests covering the SQLite storage backend."""
+
+from __future__ import annotations
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.models.schemas import (
+    ReferenceSetCreateRequest,
+    RegressionCase,
+    RegressionUpsertRequest,
+    RuleCreateRequest,
+    TraceStep,
+)
+from app.services.catalog import RuleCatalogService
+from app.services.proofs import EvaluationProofStore
+from app.services.storage import SQLiteStorage, StorageConflictError
+
+
+@pytest.fixture
+def database(tmp_path: Path) -> str:
+    return str(tmp_path / "rules.db")
+
+
+def test_catalog_is_rebuilt_from_storage(database: str) -> None:
+    storage = SQLiteStorage(database)
+    catalog = RuleCatalogService(storage=storage)
+    catalog.create_reference_set_version(ReferenceSetCreateRequest(name="states", values=["CA", "NY"]))
+    for threshold in (600, 620):
+        catalog.create_rule_version(
+            RuleCreateRequest(
+                stable_id="min-score",
+                name="Minimum score",
+                definition={
+                    "and": [
+                        {">=": [{"var": "score"}, threshold]},
+                        {"bl_in_set": [{"var": "state"}, "states"]},
+                    ]
+                },
+                labels={"team": "credit"},
+            )
+        )
+    catalog.publish_rule_version("min-score", 1)
+    catalog.upsert_regression_cases(
+        "min-score",
+        RegressionUpsertRequest(version=1, cases=[RegressionCase(name="ok", context={"score": 700}, expected=True)]),
+    )
+    storage.close()
+
+    reloaded = RuleCatalogService(storage=SQLiteStorage(database))
+    published = reloaded.get_rule_version("min-score")
+    assert published.version == 1
+    assert published.status == "published"
+    assert [case.name for case in published.regression_tests] == ["ok"]
+    assert reloaded.get_rule_version("min-score", prefer_latest=True).version == 2
+    assert reloaded.list_rules(labels={"team": "credit"}).total == 1
+    assert reloaded.resolve_reference_set("states", None) == (1, frozenset({"CA", "NY"}))
+
+    # New versions continue numbering from the stored state.
+    third = reloaded.create_rule_version(
+        RuleCreateRequest(stable_id="min-score", name="Minimum score", definition={"var": "ok"})
+    )
+    assert third.version == 3
+
+
+def test_proofs_are_batched_and_read_through(database: str) -> None:
+    storage = SQLiteStorage(database, batch_size=10, flush_interval=60)
+    store = EvaluationProofStore(storage=storage, cache_size=1)
+    recorded = [
+        store.record(
+            stable_id="min-score",
+            version=1,
+            logic={"var": "score"},
+            context={"score": score},
+            result=score,
+            trace=[TraceStep(operator="var", arguments=["score"], result=score, path="$")],
+        )
+        for score in (600, 700)
+    ]
+
+    # The first artefact was evicted from memory and is loaded from storage.
+    loaded = store.get(recorded[0].id)
+    assert loaded.context == {"score": 600}
+    assert loaded.trace[0].result == 600
+    assert loaded.created_at == recorded[0].created_at
+
+    # Raw evaluator steps are kept as recorded; their models are only built when read.
+    step = {"path": "", "operator": "var", "result": 650}
+    artifact = store.record(
+        stable_id="min-score", version=1, logic={}, context={}, result=650, trace=[step], copy_inputs=False
+    )
+    assert artifact.steps[0] is step and "trace" not in vars(artifact)
+    assert artifact.trace == [TraceStep(path="", operator="var", result=650)]
+    assert artifact.to_record()["trace"] == [artifact.trace[0].model_dump()]
+    storage.close()
+
+    reopened = EvaluationProofStore(storage=SQLiteStorage(database))
+    assert [artifact.id for artifact in reopened.list_for_rule("min-score")] == [a.id for a in recorded] + [artifact.id]
+    with pytest.raises(KeyError):
+        reopened.get("missing")
+
+
+def test_workers_sharing_storage_never_reuse_version_numbers(database: str) -> None:
+    first = RuleCatalogService(storage=SQLiteStorage(database))
+    second = RuleCatalogService(storage=SQLiteStorage(database))
+    rule = RuleCreateRequest(stable_id="min-score", name="Minimum score", definition={"var": "score"})
+    assert first.create_rule_version(rule).version == 1
+    assert second.create_rule_version(rule).version == 2
+    assert first.create_rule_version(rule).version == 3
+    # The write reloaded the first worker's cache, so it sees the second worker's version.
+    assert first.get_rule_version("min-score", version=2).version == 2
+    with pytest.raises(StorageConflictError):
+        SQLiteStorage(database).save_rule_versions([first.get_rule_version("min-score", version=1)])
+
+    states = ReferenceSetCreateRequest(name="states", values=["CA"])
+    assert first.create_reference_set_version(states).version == 1
+    assert second.create_reference_set_version(states).version == 2
+
+    # Revisions come from the database, so every worker and restart names the same content alike.
+    time.sleep(0.6)
+    revision = second.revision
+    assert first.revision == revision
+    assert RuleCatalogService(storage=SQLiteStorage(database)).revision == revision
+    first.create_rule_version(RuleCreateRequest(stable_id="max-score", name="Maximum", definition={"var": "score"}))
+    assert first.revision == revision + 1
+    time.sleep(0.6)
+    assert second.revision == revision + 1 and second.list_rules().total == 2
+    assert second.changes_since(revision).reset
+
+    # Readers pick up other workers' writes without waiting for the storage write lock.
+    first.create_rule_version(rule)
+    writer = SQLiteStorage(database)
+    with writer.transaction():
+        time.sleep(0.6)
+        assert second.get_rule_version("min-score", prefer_latest=True).version == 4
+        assert second.revision == revision + 2
+    writer.close()
+
+
+def test_buffered_proofs_are_flushed_in_the_background(database: str) -> None:
+    storage = SQLiteStorage(database, batch_size=100, flush_interval=0.05)
+    record = {"id": "p1", "stable_id": "min-score", "created_at": "2024-01-01T00:00:00"}
+    storage.add_proof(record)
+    reader = SQLiteStorage(database)
+    deadline = time.monotonic() + 5
+    while not reader.list_proofs("min-score") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [proof["id"] for proof in reader.list_proofs("min-score")] == ["p1"]
+    storage.close()
+    reader.close()
@@ -0,0 +1,168 @@
+"""Tests covering tenant namespaces of the catalog and proof store."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.models.schemas import ReferenceSetCreateRequest, RuleCreateRequest
+from app.services.catalog import (
+    CatalogQuotaExceededError,
+    RuleCatalogService,
+    RuleNotFoundError,
+    get_catalog_service,
+)
+from app.services.evaluator import EvaluatorService
+from app.services.profiling import ProfileStore
+from app.services.proofs import EvaluationProofStore, get_evaluation_proof_store
+from app.services.redis_catalog import InMemoryRedis, RedisCatalogStore
+from app.services.regression import RegressionService
+from app.services.snapshots import SnapshotStore
+from app.services.storage import SQLiteStorage
+from app.services.tenants import TenantNamespace, TenantRegistry, get_tenant_registry
+
+
+@pytest.fixture(autouse=True)
+def reset_tenants() -> None:
+    resets = (get_tenant_registry().clear, get_catalog_service().clear, get_evaluation_proof_store().clear)
+    for reset in resets:
+        reset()
+    yield
+    for reset in resets:
+        reset()
+
+
+def _rule(stable_id: str, definition: object) -> RuleCreateRequest:
+    return RuleCreateRequest(stable_id=stable_id, name=stable_id, definition=definition)
+
+
+def test_namespaces_inherit_and_shadow_the_base_catalog(tmp_path: Path) -> None:
+    base = RuleCatalogService()
+    base.create_rule_version(_rule("fee", {"+": [10]}))
+    base.create_rule_version(_rule("limit", {"+": [1000]}))
+    base.create_reference_set_version(ReferenceSetCreateRequest(name="states", values=["CA"]))
+    tenant = RuleCatalogService(base=base, max_rule_versions=2)
+    other = RuleCatalogService(base=base)
+
+    # Tenant rules shadow base rules and may reference inherited ones.
+    tenant.create_rule_version(_rule("fee", {"+": [{"bl_rule": "limit"}, 5]}))
+    tenant.create_rule_version(_rule("bonus", {"if": [{"bl_in_set": ["CA", "states"]}, 1, 0]}))
+    assert [rule.stable_id for rule in tenant.list_rules().rules] == ["bonus", "fee", "limit"]
+    assert [rule.stable_id for rule in tenant.list_rules(limit=1, cursor="bonus").rules] == ["fee"]
+    assert EvaluatorService().evaluate_raw({"bl_rule": "fee"}, {}, tenant).result == 1005
+    assert other.get_rule_version("fee").definition == {"+": [10]}
+    with pytest.raises(RuleNotFoundError):
+        other.get_rule_version("bonus")
+    with pytest.raises(CatalogQuotaExceededError):
+        tenant.create_rule_version(_rule("extra", {"+": [1]}))
+
+    # Base writes change the tenant's revision and reset its change feed.
+    since = tenant.revision
+    assert tenant.changes_since(since).rules == []
+    base.create_rule_version(_rule("limit", {"+": [2000]}))
+    assert tenant.revision == since + 1
+    assert tenant.changes_since(since).reset
+    asyncio.run(tenant.wait_for_change(since, timeout=5))
+    assert EvaluatorService().evaluate_raw({"bl_rule": "fee"}, {}, tenant).result == 2005
+    assert tenant.get_rule_version("limit", prefer_latest=True).definition == {"+": [2000]}
+
+    # Exports include inherited entries, so process workers resolve them too.
+    export = tmp_path / "tenant.blcat"
+    tenant.export_snapshot(str(export))
+    restored = RuleCatalogService()
+    restored.import_snapshot(str(export))
+    assert [rule.stable_id for rule in restored.list_rules().rules] == ["bonus", "fee", "limit"]
+    assert restored.get_rule_version("fee").definition == {"+": [{"bl_rule": "limit"}, 5]}
+
+    # Base writes between two tenant writes leave a gap in the tenant's log.
+    since = other.revision
+    other.create_rule_version(_rule("ten-1", {"+": [1]}))
+    base.create_rule_version(_rule("base-1", {"+": [1]}))
+    base.publish_rule_version("base-1", 1)
+    other.create_rule_version(_rule("ten-2", {"+": [2]}))
+    changes = other.changes_since(since)
+    assert changes.reset and changes.revision == other.revision
+    assert [rule.stable_id for rule in other.changes_since(other.revision - 1).rules] == ["ten-2"]
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "snapshots", "redis"])
+def test_tenant_namespaces_persist_per_tenant_and_evict(backend: str, tmp_path: Path) -> None:
+    backends = {
+        "sqlite": lambda: {"storage": SQLiteStorage(str(tmp_path / "rules.db"))},
+        "snapshots": lambda: {"snapshots": SnapshotStore(str(tmp_path / "snapshots"))},
+        "redis": lambda server=InMemoryRedis(): {"redis": RedisCatalogStore(server)},
+    }
+
+    def registry() -> TenantRegistry:
+        stores = backends[backend]()
+        catalog = RuleCatalogService(**stores)
+        proofs = EvaluationProofStore()
+        evaluator = EvaluatorService()
+        base = TenantNamespace(catalog, proofs, RegressionService(catalog, evaluator, proofs), ProfileStore())
+        return TenantRegistry(base, evaluator, max_namespaces=2, **stores)
+
+    first = registry()
+    first.base.catalog.create_rule_version(_rule("fee", {"+": [10]}))
+    for tenant, value in (("acme", 25), ("a.b/../c", 30)):
+        first.namespace(tenant).catalog.create_rule_version(_rule("fee", {"+": [value]}))
+    first.namespace("globex")
+    # The least recently used tenant is dropped and reloaded from its backend.
+    assert first.tenants() == ["a.b/../c", "globex"]
+    assert first.namespace("acme").catalog.get_rule_version("fee", prefer_latest=True).definition == {"+": [25]}
+    assert first.tenants() == ["acme", "globex"]
+
+    # Another instance on the same backends sees every tenant's own rules.
+    second = registry()
+    for tenant, value in (("acme", 25), ("a.b/../c", 30), ("globex", 10)):
+        catalog = second.namespace(tenant).catalog
+        assert catalog.get_rule_version("fee", prefer_latest=True).definition == {"+": [value]}
+    if backend == "sqlite":
+        databases = sorted(path.name for path in tmp_path.glob("*.db"))
+        assert databases == ["rules.a%2Eb%2F%2E%2E%2Fc.db", "rules.acme.db", "rules.db", "rules.globex.db"]
+
+
+def test_proof_stores_evict_past_their_cap() -> None:
+    store = EvaluationProofStore(max_artifacts=2)
+    ids = [
+        store.record(stable_id=stable_id, version=1, logic={}, context={}, result=None, trace=[]).id
+        for stable_id in ("a", "b", "a")
+    ]
+    assert store.size == 2
+    with pytest.raises(KeyError):
+        store.get(ids[0])
+    assert [artifact.id for artifact in store.list_for_rule("a")] == [ids[2]]
+    assert [artifact.id for artifact in store.list_for_rule("b")] == [ids[1]]
+
+
+def test_tenant_header_selects_isolated_namespaces(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = TestClient(create_app())
+    acme, globex = {"x-tenant-id": "acme"}, {"x-tenant-id": "globex"}
+    client.post("/rules", json={"stable_id": "fee", "name": "Fee", "definition": {"+": [10]}})
+    client.post("/rules", json={"stable_id": "fee", "name": "Fee", "definition": {"+": [25]}}, headers=acme)
+
+    evaluation = {"stable_id": "fee", "prefer_latest": True}
+    assert client.post("/eval", json=evaluation).json()["result"] == 10
+    assert client.post("/eval", json=evaluation, headers=acme).json()["result"] == 25
+    assert client.post("/eval", json=evaluation, headers=globex).json()["result"] == 10
+    # Tenants cannot change base rules, only shadow them.
+    assert client.post("/rules/fee/publish", json={"version": 1}, headers=globex).status_code == 404
+    assert get_tenant_registry().tenants() == ["acme", "globex"]
+    assert len(get_evaluation_proof_store().list_for_rule("fee")) == 1
+    assert len(get_tenant_registry().namespace("acme").proof_store.list_for_rule("fee")) == 1
+
+    registry = get_tenant_registry()
+    monkeypatch.setattr(registry, "_max_rule_versions", 1)
+    limited = {"x-tenant-id": "initech"}
+    payloads = [{"stable_id": stable_id, "name": "Rule", "definition": {"+": [1]}} for stable_id in ("one", "two")]
+    assert client.post("/rules", json=payloads[0], headers=limited).status_code == 201
+    assert client.post("/rules", json=payloads[1], headers=limited).status_code == 409
+    assert client.post("/rules/bulk", json=payloads[1:], headers=limited).status_code == 409
+    assert client.post("/rules", json=payloads[1]).status_code == 201